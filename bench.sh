@@ -0,0 +1,6 @@
+#!/bin/bash
+
+# exit when any command fails
+set -e
+
+QT_QPA_PLATFORM=offscreen python -m benchmarks.suite "$@"
@@ -0,0 +1,56 @@
+import random
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtCore import QEventLoop
+from qtpy.QtGui import QTextDocument
+from qtpy.QtWidgets import QApplication
+
+from qttextedit.analysis import WordFrequencyAnalyzer, count_ngrams, document_snapshot
+
+WORDS = ['the', 'quiet', 'river', 'ran', 'through', 'old', 'town', 'and', 'she', 'looked', 'back', 'at', 'morning',
+         'light', 'over', 'hills', 'never', 'again', 'said', 'nothing', 'while', 'rain', 'fell', 'slowly']
+
+
+def manuscript(megabytes: float) -> str:
+    rnd = random.Random(1)
+    paragraphs = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        sentences = [' '.join(rnd.choices(WORDS, k=rnd.randint(6, 18))).capitalize() + '.' for _ in range(5)]
+        paragraph = ' '.join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 1
+    return '\n'.join(paragraphs)
+
+
+def run(megabytes: float = 8):
+    document = QTextDocument()
+    document.setPlainText(manuscript(megabytes))
+    start = timer()
+    text = document_snapshot(document)
+    print(f'snapshot: {(timer() - start) * 1000:.1f} ms ({len(text) / 1024 / 1024:.1f} MB)')
+
+    start = timer()
+    count_ngrams(text)
+    elapsed = timer() - start
+    print(f'sequential: {elapsed:.2f} s ({megabytes / elapsed:.2f} MB/s)')
+
+    analyzer = WordFrequencyAnalyzer()
+    loop = QEventLoop()
+    partials = []
+    analyzer.partialResult.connect(lambda requestId, result: partials.append(timer()))
+    analyzer.analysisFinished.connect(lambda requestId, result: loop.quit())
+    start = timer()
+    analyzer.analyze(document)
+    submitted = timer()
+    loop.exec()
+    elapsed = timer() - start
+    print(f'process pool: {elapsed:.2f} s ({megabytes / elapsed:.2f} MB/s), GUI thread blocked {(submitted - start) * 1000:.1f} ms '
+          f'to submit, {len(partials)} partial results')
+    analyzer.shutdown()
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
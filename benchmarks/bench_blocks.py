@@ -0,0 +1,30 @@
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtGui import QTextCursor, QTextListFormat
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import EnhancedTextEdit
+
+
+def run(items: int = 10000):
+    textedit = EnhancedTextEdit()
+    textedit.setPlainText('\n'.join(f'Item {i}' for i in range(items)))
+    cursor = QTextCursor(textedit.document())
+    cursor.select(QTextCursor.SelectionType.Document)
+    cursor.createList(QTextListFormat.Style.ListDecimal)
+
+    middle = items // 2
+    for name, op in [('move down', lambda: textedit.moveBlocksDown(middle, middle)),
+                     ('move up', lambda: textedit.moveBlocksUp(middle, middle)),
+                     ('move 100 blocks', lambda: textedit.moveBlocks(100, 199, items - 100)),
+                     ('duplicate', lambda: textedit.duplicateBlocks(middle, middle)),
+                     ('duplicate 100 blocks', lambda: textedit.duplicateBlocks(100, 199))]:
+        start = timer()
+        op()
+        print(f'{name}: {(timer() - start) * 1000:.1f} ms ({items} list items)')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
@@ -0,0 +1,52 @@
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtGui import QTextCursor, QTextBlockFormat
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import EnhancedTextEdit
+
+
+def run(sections: int = 5000, paragraphs: int = 10, keystrokes: int = 500, jumps: int = 10000):
+    textedit = EnhancedTextEdit()
+    textedit.setPlainText('\n'.join(f'Section {i // paragraphs}' if i % paragraphs == 0 else f'Paragraph {i}'
+                                    for i in range(sections * paragraphs)))
+    cursor = QTextCursor(textedit.document())
+    cursor.beginEditBlock()
+    blockFormat = QTextBlockFormat()
+    for section in range(sections):
+        blockFormat.setHeadingLevel(1 + section % 3)
+        cursor.setPosition(textedit.document().findBlockByNumber(section * paragraphs).position())
+        cursor.mergeBlockFormat(blockFormat)
+    cursor.endEditBlock()
+
+    start = timer()
+    outline = textedit.outline()
+    print(f'index {outline.count()} headings: {(timer() - start) * 1000:.1f} ms')
+
+    cursor = QTextCursor(textedit.document().findBlockByNumber(paragraphs // 2))
+    start = timer()
+    for _ in range(keystrokes):
+        cursor.insertText('a')
+    print(f'keystroke: {(timer() - start) / keystrokes * 1000:.3f} ms')
+
+    start = timer()
+    for _ in range(keystrokes // 10):
+        cursor.insertText('\n')
+    print(f'new paragraph: {(timer() - start) / (keystrokes // 10) * 1000:.3f} ms')
+
+    blocks = textedit.document().blockCount()
+    start = timer()
+    for i in range(jumps):
+        outline.headingAt(textedit.document().findBlockByNumber(i * 7919 % blocks).position())
+    print(f'heading at position: {(timer() - start) / jumps * 1000000:.1f} us')
+
+    start = timer()
+    for i in range(jumps // 10):
+        textedit.goToHeading(i * 7919 % outline.count())
+    print(f'go to heading: {(timer() - start) / (jumps // 10) * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
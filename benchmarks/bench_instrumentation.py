@@ -0,0 +1,33 @@
+import sys
+
+from qtpy.QtWidgets import QApplication
+
+from benchmarks.bench_keystroke import KEYSTROKES, generate_document, measure_keystroke
+from qttextedit import EnhancedTextEdit, DashInsertionMode, MemorySink
+from qttextedit import instrumentation
+
+
+def run(blocks: int = 10000, repeat: int = 500):
+    textedit = EnhancedTextEdit()
+    textedit.setDashInsertionMode(DashInsertionMode.INSERT_EM_DASH)
+    generate_document(textedit, blocks)
+    sink = MemorySink()
+    instrumentation.add_sink(sink)
+
+    for name, (key, text) in KEYSTROKES.items():
+        instrumentation.set_enabled(False)
+        disabled = measure_keystroke(textedit, key, text, repeat)
+        instrumentation.set_enabled(True)
+        enabled = measure_keystroke(textedit, key, text, repeat)
+        print(f'{name:<12} disabled {disabled * 1_000_000:8.1f} us, enabled {enabled * 1_000_000:8.1f} us/keystroke')
+
+    instrumentation.set_enabled(False)
+    instrumentation.remove_sink(sink)
+    histogram = sink.histogram('EnhancedTextEdit.keyPressEvent')
+    print(f'keyPressEvent p50 {histogram.percentile(50) * 1_000_000:.1f} us, p95 {histogram.percentile(95) * 1_000_000:.1f} us, '
+          f'p99 {histogram.percentile(99) * 1_000_000:.1f} us')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
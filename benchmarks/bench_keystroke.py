@@ -0,0 +1,51 @@
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtCore import Qt, QEvent
+from qtpy.QtGui import QKeyEvent, QTextCursor
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import EnhancedTextEdit, DashInsertionMode, AutoCapitalizationMode, EllipsisInsertionMode
+
+KEYSTROKES = {
+    'letter': (Qt.Key_A, 'a'),
+    'space': (Qt.Key_Space, ' '),
+    'period': (Qt.Key_Period, '.'),
+    'minus': (Qt.Key_Minus, '-'),
+    'greater': (Qt.Key_Greater, '>'),
+    'apostrophe': (Qt.Key_Apostrophe, "'"),
+    'digit': (Qt.Key_1, '1'),
+}
+
+
+def generate_document(textedit: EnhancedTextEdit, blocks: int):
+    paragraph = 'Lorem ipsum dolor sit amet. Consectetur adipiscing elit, sed do eiusmod tempor.'
+    textedit.setPlainText('\n'.join(paragraph for _ in range(blocks)))
+
+
+def measure_keystroke(textedit: EnhancedTextEdit, key: int, text: str, repeat: int) -> float:
+    cursor = QTextCursor(textedit.document().findBlockByNumber(textedit.document().blockCount() // 2))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    textedit.setTextCursor(cursor)
+
+    start = timer()
+    for _ in range(repeat):
+        textedit.keyPressEvent(QKeyEvent(QEvent.Type.KeyPress, key, Qt.KeyboardModifier.NoModifier, text))
+    return (timer() - start) / repeat
+
+
+def run(blocks: int = 10000, repeat: int = 200):
+    textedit = EnhancedTextEdit()
+    textedit.setAutoCapitalizationMode(AutoCapitalizationMode.SENTENCE)
+    textedit.setDashInsertionMode(DashInsertionMode.INSERT_EM_DASH)
+    textedit.setEllipsisInsertionMode(EllipsisInsertionMode.INSERT_ELLIPSIS)
+    generate_document(textedit, blocks)
+
+    for name, (key, text) in KEYSTROKES.items():
+        elapsed = measure_keystroke(textedit, key, text, repeat)
+        print(f'{name:<12} {elapsed * 1_000_000:10.1f} us/keystroke ({blocks} blocks)')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,29 @@
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtGui import QTextCursor, QTextListFormat
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import EnhancedTextEdit
+
+
+def run(items: int = 2000, selection: int = 200):
+    textedit = EnhancedTextEdit()
+    textedit.setPlainText('\n'.join(f'Item {i}' for i in range(items)))
+    cursor = QTextCursor(textedit.document())
+    cursor.select(QTextCursor.SelectionType.Document)
+    cursor.createList(QTextListFormat.Style.ListDecimal)
+
+    for name, op in [(f'indent {selection} items', lambda: textedit.indentListItems(1, selection)),
+                     (f'indent {selection} items again', lambda: textedit.indentListItems(1, selection)),
+                     (f'outdent {selection} items', lambda: textedit.outdentListItems(1, selection)),
+                     ('indent every other item', lambda: [textedit.indentListItems(i, i) for i in range(1, items, 2)]),
+                     (f'outdent all {items} items', lambda: textedit.outdentListItems(0, items - 1))]:
+        start = timer()
+        op()
+        print(f'{name}: {(timer() - start) * 1000:.1f} ms ({items} item outline)')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
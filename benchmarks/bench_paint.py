@@ -0,0 +1,47 @@
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtCore import QObject, QEvent
+from qtpy.QtGui import QTextCursor
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import EnhancedTextEdit
+
+
+class PaintCounter(QObject):
+    def __init__(self, parent=None):
+        super(PaintCounter, self).__init__(parent)
+        self.count = 0
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            self.count += 1
+        return super(PaintCounter, self).eventFilter(watched, event)
+
+
+def run(blocks: int = 1000, moves: int = 200):
+    app = QApplication.instance()
+    textedit = EnhancedTextEdit()
+    textedit.setBlockPlaceholderEnabled(True)
+    textedit.setPlainText('\n'.join('' if i % 2 else 'Lorem ipsum dolor sit amet.' for i in range(blocks)))
+    textedit.resize(800, 600)
+    textedit.show()
+    app.processEvents()
+
+    counter = PaintCounter(textedit)
+    textedit.viewport().installEventFilter(counter)
+    start = timer()
+    for _ in range(moves):
+        textedit.moveCursor(QTextCursor.MoveOperation.NextBlock)
+        for _ in range(3):
+            app.processEvents()
+
+    elapsed = timer() - start
+
+    print(f'{counter.count / moves:.2f} paints, {elapsed / moves * 1000:.2f} ms per cursor move '
+          f'({moves} moves, {blocks} blocks)')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
@@ -0,0 +1,35 @@
+import sys
+from timeit import default_timer as timer
+
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import RichTextEditor
+
+
+def generate_text(matches: int = 10000, size: int = 1_000_000) -> str:
+    filler = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. '
+    line_length = size // matches
+    line = (filler * (line_length // len(filler) + 1))[:line_length - len('needle ')]
+    return '\n'.join(f'needle {line}' for _ in range(matches))
+
+
+def run(matches: int = 10000):
+    editor = RichTextEditor()
+    editor.textEdit.setPlainText(generate_text(matches))
+    size = editor.textEdit.document().characterCount()
+
+    start = timer()
+    count = editor.replaceAll('needle', 'thread')
+    elapsed = timer() - start
+
+    start = timer()
+    editor.textEdit.document().undo()
+    undo_elapsed = timer() - start
+
+    print(f'replace all: {count} matches in {elapsed * 1000:.1f} ms, undo in {undo_elapsed * 1000:.1f} ms '
+          f'({size} characters)')
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication(sys.argv)
+    run()
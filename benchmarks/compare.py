@@ -0,0 +1,139 @@
+import argparse
+import json
+import math
+import statistics
+import sys
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_ALPHA = 0.05
+
+
+@dataclass
+class Comparison:
+    name: str
+    blocks: int
+    baseline: float
+    current: float
+    change: float
+    pValue: float
+    status: str
+
+
+def load_results(path: str) -> Dict[Tuple[str, int], List[float]]:
+    # samples are expressed in units of the run's calibration workload, the median of the calibrations taken
+    # next to every result, which is steadier than any single one of them
+    with open(path) as f:
+        report = json.load(f)
+    calibration = report.get('calibration') or 1.0
+    return {(result['name'], result['blocks']): [sample / calibration for sample in result['samples']]
+            for result in report['results']}
+
+
+def load_raw_results(path: str) -> Dict[Tuple[str, int], List[float]]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(result['name'], result['blocks']): result['samples'] for result in report['results']}
+
+
+def rank(values: List[float]) -> Tuple[List[float], float]:
+    order = sorted(range(len(values)), key=values.__getitem__)
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        count = j - i + 1
+        ties += count ** 3 - count
+        i = j + 1
+    return ranks, ties
+
+
+def mann_whitney_greater(baseline: List[float], current: List[float]) -> float:
+    # one-sided p-value for current samples being larger than the baseline, normal approximation with
+    # tie and continuity corrections
+    n1, n2 = len(baseline), len(current)
+    if not n1 or not n2:
+        return 1.0
+    ranks, ties = rank(baseline + current)
+    n = n1 + n2
+    u = sum(ranks[n1:]) - n2 * (n2 + 1) / 2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(baselinePath: str, currentPath: str, threshold: float = DEFAULT_THRESHOLD, alpha: float = DEFAULT_ALPHA,
+            patterns: Sequence[str] = ('*',), calibrate: bool = True) -> List[Comparison]:
+    load = load_results if calibrate else load_raw_results
+    baseline, current = load(baselinePath), load(currentPath)
+    baselineRaw, currentRaw = load_raw_results(baselinePath), load_raw_results(currentPath)
+
+    comparisons = []
+    for key in sorted(set(baseline) | set(current)):
+        name, blocks = key
+        if not any(fnmatch(name, pattern) for pattern in patterns):
+            continue
+        if key not in baseline or key not in current:
+            status = 'new' if key in current else 'missing'
+            samples = currentRaw.get(key) or baselineRaw.get(key)
+            comparisons.append(Comparison(name, blocks, 0.0, statistics.median(samples), 0.0, 1.0, status))
+            continue
+
+        old, new = baseline[key], current[key]
+        change = statistics.median(new) / statistics.median(old) - 1
+        slower = mann_whitney_greater(old, new)
+        faster = mann_whitney_greater(new, old)
+        if change > threshold and slower < alpha:
+            status, pValue = 'REGRESSION', slower
+        elif change < -threshold and faster < alpha:
+            status, pValue = 'improved', faster
+        else:
+            status, pValue = 'ok', min(slower, faster)
+        comparisons.append(Comparison(name, blocks, statistics.median(baselineRaw[key]),
+                                      statistics.median(currentRaw[key]), change, pValue, status))
+    return comparisons
+
+
+def format_report(comparisons: List[Comparison], threshold: float) -> str:
+    lines = [f'{"benchmark":<32} {"blocks":>7} {"baseline":>12} {"current":>12} {"change":>8} {"p-value":>8}  status']
+    for comparison in comparisons:
+        baseline = f'{comparison.baseline * 1000:.3f} ms' if comparison.baseline else '-'
+        lines.append(f'{comparison.name:<32} {comparison.blocks:>7} {baseline:>12} {comparison.current * 1000:>9.3f} ms '
+                     f'{comparison.change:>+8.1%} {comparison.pValue:>8.3f}  {comparison.status}')
+    regressions = [comparison for comparison in comparisons if comparison.status == 'REGRESSION']
+    if regressions:
+        lines.append(f'{len(regressions)} regression(s) beyond {threshold:.0%}: ' +
+                     ', '.join(f'{comparison.name} ({comparison.blocks} blocks) {comparison.change:+.1%}'
+                               for comparison in regressions))
+    else:
+        lines.append(f'No regressions beyond {threshold:.0%}')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs and fail on regressions')
+    parser.add_argument('baseline', help='JSON results of the reference run')
+    parser.add_argument('current', help='JSON results of the run under test')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown of the median that counts as a regression, e.g. 0.1 for 10%%')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='significance level of the rank test')
+    parser.add_argument('--filter', nargs='+', default=['*'], help='benchmark name patterns to gate on')
+    parser.add_argument('--no-calibration', action='store_true', help='compare raw timings')
+    args = parser.parse_args(argv)
+
+    comparisons = compare(args.baseline, args.current, args.threshold, args.alpha, args.filter, not args.no_calibration)
+    print(format_report(comparisons, args.threshold))
+    return 1 if any(comparison.status == 'REGRESSION' for comparison in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from timeit import default_timer as timer
+from typing import Callable, Dict, List, Optional, Sequence
+
+from qtpy import QT_VERSION, API_NAME
+from qtpy.QtCore import Qt, QEvent, QMimeData
+from qtpy.QtGui import QKeyEvent, QTextCursor, QTextDocument
+from qtpy.QtWidgets import QApplication
+
+from qttextedit import EnhancedTextEdit, RichTextEditor, DashInsertionMode, AutoCapitalizationMode, \
+    EllipsisInsertionMode
+
+DOCUMENT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_REPEAT = 50
+# whole-document operations are sampled fewer times
+DOCUMENT_REPEAT = 5
+DEFAULT_OUTPUT = 'benchmark.json'
+CALIBRATION_REPEAT = 3
+
+PARAGRAPH = 'Lorem ipsum dolor sit amet. Consectetur adipiscing elit, sed do eiusmod tempor.'
+PASTE_HTML = ''.join(f'<p>Pasted <b>paragraph</b> {i} with <i>some</i> formatting.</p>' for i in range(20))
+PASTE_TEXT = '\n'.join(f'Pasted paragraph {i}.' for i in range(20))
+
+# autocorrect path: (text typed before the measured keystroke, key, key text)
+KEYSTROKE_CASES = {
+    'letter': (' x', Qt.Key_A, 'a'),
+    'auto_capitalization': ('. ', Qt.Key_A, 'a'),
+    'period_insertion': (' word ', Qt.Key_Space, ' '),
+    'ellipsis': (' ..', Qt.Key_Period, '.'),
+    'dash': (' -', Qt.Key_Minus, '-'),
+    'arrow': (' -', Qt.Key_Greater, '>'),
+    'smart_quotes': (' ', Qt.Key_Apostrophe, "'"),
+}
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    blocks: int
+    samples: List[float] = field(default_factory=list)
+    calibration: float = 0.0
+
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+    def toJson(self) -> Dict:
+        return {
+            'name': self.name,
+            'blocks': self.blocks,
+            'samples': self.samples,
+            'min': min(self.samples),
+            'median': self.median(),
+            'mean': statistics.mean(self.samples),
+            'stdev': statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0,
+            'calibration': self.calibration,
+        }
+
+
+@dataclass
+class Benchmark:
+    name: str
+    function: Callable[[int, int], List[float]]
+    sized: bool = True
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, sized: bool = True):
+    def register(function: Callable[[int, int], List[float]]):
+        BENCHMARKS[name] = Benchmark(name, function, sized)
+        return function
+
+    return register
+
+
+def generate_textedit(blocks: int) -> EnhancedTextEdit:
+    textedit = EnhancedTextEdit()
+    textedit.setAutoCapitalizationMode(AutoCapitalizationMode.SENTENCE)
+    textedit.setDashInsertionMode(DashInsertionMode.INSERT_EM_DASH)
+    textedit.setEllipsisInsertionMode(EllipsisInsertionMode.INSERT_ELLIPSIS)
+    textedit.setPlainText('\n'.join(PARAGRAPH for _ in range(blocks)))
+    return textedit
+
+
+def generate_editor(blocks: int) -> RichTextEditor:
+    editor = RichTextEditor()
+    editor.textEdit.setPlainText('\n'.join(PARAGRAPH for _ in range(blocks)))
+    return editor
+
+
+def move_to_block(textedit: EnhancedTextEdit, number: int, end: bool = False):
+    cursor = QTextCursor(textedit.document().findBlockByNumber(number))
+    if end:
+        cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    textedit.setTextCursor(cursor)
+
+
+def measure(operation: Callable[[int], None], repeat: int, prepare: Optional[Callable[[int], None]] = None,
+            cleanup: Optional[Callable[[int], None]] = None) -> List[float]:
+    samples = []
+    for i in range(repeat):
+        if prepare is not None:
+            prepare(i)
+        start = timer()
+        operation(i)
+        samples.append(timer() - start)
+        if cleanup is not None:
+            cleanup(i)
+    return samples
+
+
+def _keystroke_benchmark(prefix: str, key: int, text: str):
+    def run_keystroke(blocks: int, repeat: int) -> List[float]:
+        textedit = generate_textedit(blocks)
+        middle = blocks // 2
+
+        def prepare(i: int):
+            move_to_block(textedit, (middle + i) % blocks, end=True)
+            textedit.textCursor().insertText(prefix)
+
+        def press(i: int):
+            textedit.keyPressEvent(QKeyEvent(QEvent.Type.KeyPress, key, Qt.KeyboardModifier.NoModifier, text))
+
+        return measure(press, repeat, prepare)
+
+    return run_keystroke
+
+
+for _name, (_prefix, _key, _text) in KEYSTROKE_CASES.items():
+    benchmark(f'keystroke.{_name}')(_keystroke_benchmark(_prefix, _key, _text))
+
+
+def _paste_benchmark(html: bool):
+    def run_paste(blocks: int, repeat: int) -> List[float]:
+        textedit = generate_textedit(blocks)
+        source = QMimeData()
+        if html:
+            source.setHtml(PASTE_HTML)
+        else:
+            source.setText(PASTE_TEXT)
+        return measure(lambda i: textedit.insertFromMimeData(source), repeat,
+                       lambda i: move_to_block(textedit, blocks // 2), lambda i: textedit.document().undo())
+
+    return run_paste
+
+
+benchmark('paste.html')(_paste_benchmark(True))
+benchmark('paste.text')(_paste_benchmark(False))
+
+
+@benchmark('find')
+def run_find(blocks: int, repeat: int) -> List[float]:
+    editor = generate_editor(blocks)
+    editor.setSearchAsyncThreshold(sys.maxsize)
+    editor._wdgFind.setVisible(True)
+    terms = ['dolor', 'tempor']
+    return measure(lambda i: editor._find(terms[i % 2]), min(repeat, DOCUMENT_REPEAT))
+
+
+@benchmark('replace_all')
+def run_replace_all(blocks: int, repeat: int) -> List[float]:
+    editor = generate_editor(blocks)
+    terms = [('dolor', 'color'), ('color', 'dolor')]
+    return measure(lambda i: editor.replaceAll(*terms[i % 2]), min(repeat, DOCUMENT_REPEAT))
+
+
+@benchmark('apply_block_format')
+def run_apply_block_format(blocks: int, repeat: int) -> List[float]:
+    textedit = generate_textedit(blocks)
+    return measure(lambda i: textedit.applyBlockFormat(), min(repeat, DOCUMENT_REPEAT),
+                   cleanup=lambda i: textedit.document().undo())
+
+
+@benchmark('set_heading')
+def run_set_heading(blocks: int, repeat: int) -> List[float]:
+    textedit = generate_textedit(blocks)
+    move_to_block(textedit, blocks // 2)
+    return measure(lambda i: textedit.setHeading(1 + i % 3), repeat)
+
+
+@benchmark('set_heading.selection')
+def run_set_heading_selection(blocks: int, repeat: int) -> List[float]:
+    textedit = generate_textedit(blocks)
+    cursor = QTextCursor(textedit.document().findBlockByNumber(blocks // 2))
+    cursor.movePosition(QTextCursor.MoveOperation.NextBlock, QTextCursor.MoveMode.KeepAnchor, min(100, blocks // 2 - 1))
+    textedit.setTextCursor(cursor)
+    return measure(lambda i: textedit.setHeading(1 + i % 3), repeat)
+
+
+@benchmark('toolbar.update_format')
+def run_update_format(blocks: int, repeat: int) -> List[float]:
+    editor = generate_editor(blocks)
+    textedit = editor.textEdit
+    move_to_block(textedit, blocks // 2)
+    textedit.setHeading(1)
+    # alternate between a heading and a paragraph so that every update sees a new format state
+    return measure(lambda i: editor.toolbar().updateFormat(textedit), repeat,
+                   lambda i: move_to_block(textedit, blocks // 2 + i % 2))
+
+
+@benchmark('construction', sized=False)
+def run_construction(blocks: int, repeat: int) -> List[float]:
+    editors = []
+    samples = measure(lambda i: editors.append(RichTextEditor()), repeat)
+    for editor in editors:
+        editor.deleteLater()
+    return samples
+
+
+def calibrate(repeat: int = CALIBRATION_REPEAT) -> float:
+    # a fixed Python and QTextDocument workload used to normalize results across machines
+    def workload(i: int):
+        document = QTextDocument()
+        document.setPlainText('\n'.join(PARAGRAPH for _ in range(2000)))
+        cursor = QTextCursor(document)
+        for _ in range(500):
+            cursor.insertText('a')
+        sorted(word.lower() for word in PARAGRAPH.split() * 5000)
+
+    return min(measure(workload, repeat))
+
+
+def run(sizes: Sequence[int] = DOCUMENT_SIZES, repeat: int = DEFAULT_REPEAT, patterns: Sequence[str] = ('*',),
+        calibrated: bool = True) -> List[BenchmarkResult]:
+    app = QApplication.instance()
+    results = []
+    for bench in BENCHMARKS.values():
+        if not any(fnmatch(bench.name, pattern) for pattern in patterns):
+            continue
+        for blocks in (sizes if bench.sized else [0]):
+            # machine speed drifts during a run, so every result carries its own calibration
+            calibration = calibrate() if calibrated else 0.0
+            result = BenchmarkResult(bench.name, blocks, bench.function(blocks, repeat), calibration)
+            results.append(result)
+            print(f'{result.name:<32} {blocks:>7} blocks {result.median() * 1000:10.3f} ms median '
+                  f'({len(result.samples)} samples)', file=sys.stderr)
+            app.processEvents()
+    return results
+
+
+def write_results(results: List[BenchmarkResult], path: str):
+    calibrations = [result.calibration for result in results if result.calibration]
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': os.environ.get('QT_QPA_PLATFORM', ''),
+        'python': platform.python_version(),
+        'qt': QT_VERSION,
+        'binding': API_NAME,
+        'calibration': statistics.median(calibrations) if calibrations else 0.0,
+        'results': [result.toJson() for result in results],
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Measure the latency of the editor hot paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DOCUMENT_SIZES), help='document sizes in blocks')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='samples per benchmark')
+    parser.add_argument('--filter', nargs='+', default=['*'], help='benchmark name patterns, e.g. keystroke.*')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON results file')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.filter)
+    write_results(results, args.output)
+    print(f'{len(results)} results written to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    main()
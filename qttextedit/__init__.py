@@ -2,3 +2,11 @@ from .api import RichTextEditor, EnhancedTextEdit, DashInsertionMode, AutoCapita
     TextBlockState, \
     TextEditorToolbar, StandardTextEditorToolbar, TextEditorSettingsButton
 from .util import remove_font, OBJECT_REPLACEMENT_CHARACTER
+from .rules import KeystrokeRule, KeystrokeContext, KeystrokeRuleRegistry
+from .search import DocumentSearchIndex, SearchResult
+from .stats import DocumentStatistics, TextStatistics, SectionStatistics
+from .outline import HeadingIndex, HeadingOutlineModel, OutlineHeading
+from .analysis import WordFrequencyAnalyzer, AnalysisResult, PhraseFrequency
+from .instrumentation import MemorySink, LoggingSink, JsonFileSink, LatencyHistogram
+from .trace import TraceRecorder
+from .profiler import LayoutPaintProfiler, FrameProfile
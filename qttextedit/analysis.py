@@ -0,0 +1,239 @@
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List, Tuple, Dict, Optional, Iterable, FrozenSet, Union
+
+from qtpy.QtCore import QObject, Signal
+from qtpy.QtGui import QTextDocument
+
+from qttextedit.search import utf16_spans
+
+ANALYSIS_CHUNK_SIZE = 256 * 1024
+ANALYSIS_NGRAM_SIZES = (1, 2, 3)
+
+DEFAULT_STOPWORDS: FrozenSet[str] = frozenset((
+    'a', 'about', 'after', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'can',
+    'could', 'did', 'do', 'for', 'from', 'had', 'has', 'have', 'he', 'her', 'him', 'his', 'how', 'i', 'if', 'in',
+    'into', 'is', 'it', 'its', 'me', 'my', 'no', 'not', 'of', 'on', 'one', 'or', 'our', 'out', 'she', 'so', 'than',
+    'that', 'the', 'their', 'them', 'then', 'there', 'they', 'this', 'to', 'up', 'us', 'was', 'we', 'were', 'what',
+    'when', 'which', 'who', 'will', 'with', 'would', 'you', 'your'))
+
+# words are captured; punctuation and line breaks match as empty tokens so that n-grams never span them
+_TOKEN_PATTERN = re.compile(r"(\w+(?:['’-]\w+)*)|[^\w\s]|\n")
+
+
+def document_snapshot(document: QTextDocument) -> str:
+    return document.toRawText().replace('\u2029', '\n').replace('\u2028', '\n')
+
+
+def split_chunks(text: str, size: int = ANALYSIS_CHUNK_SIZE) -> List[str]:
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            newline = text.find('\n', end)
+            end = len(text) if newline < 0 else newline + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def count_ngrams(text: str, sizes: Tuple[int, ...] = ANALYSIS_NGRAM_SIZES,
+                 stopwords: FrozenSet[str] = DEFAULT_STOPWORDS) -> Tuple[int, Dict[int, Counter]]:
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    words = len(tokens) - tokens.count('')
+    counts: Dict[int, Counter] = {}
+    for size in sizes:
+        if size == 1:
+            counts[size] = Counter({token: count for token, count in Counter(tokens).items()
+                                    if token and token not in stopwords})
+        else:
+            grams = Counter(zip(*(tokens[i:] for i in range(size))))
+            counts[size] = Counter({' '.join(gram): count for gram, count in grams.items()
+                                    if '' not in gram and not stopwords.issuperset(gram)})
+    return words, counts
+
+
+def phrase_pattern(phrase: str) -> re.Pattern:
+    tokens = phrase.split()
+    return re.compile(r'(?<![\w’\'-])' + r'\s+'.join(re.escape(token) for token in tokens) + r'(?![\w’\'-])',
+                      re.IGNORECASE)
+
+
+def phrase_occurrences(document: QTextDocument, phrase: str) -> List[Tuple[int, int]]:
+    if not phrase.split():
+        return []
+    text = document.toRawText()
+    return utf16_spans(text, [match.span() for match in phrase_pattern(phrase).finditer(text)])
+
+
+@dataclass
+class PhraseFrequency:
+    phrase: str
+    size: int
+    count: int
+
+
+@dataclass
+class AnalysisResult:
+    words: int = 0
+    chunks: int = 0
+    totalChunks: int = 0
+    counts: Dict[int, Counter] = field(default_factory=dict)
+
+    def isComplete(self) -> bool:
+        return self.chunks == self.totalChunks
+
+    def mostCommon(self, size: int = 1, limit: int = 20, minimum: int = 2) -> List[PhraseFrequency]:
+        counts = self.counts.get(size)
+        if not counts:
+            return []
+        return [PhraseFrequency(phrase, size, count) for phrase, count in counts.most_common(limit) if count >= minimum]
+
+    def count(self, phrase: str) -> int:
+        tokens = phrase.lower().split()
+        counts = self.counts.get(len(tokens))
+        return counts.get(' '.join(tokens), 0) if counts else 0
+
+    def merge(self, words: int, counts: Dict[int, Counter]):
+        self.words += words
+        self.chunks += 1
+        for size, chunkCounts in counts.items():
+            self.counts.setdefault(size, Counter()).update(chunkCounts)
+
+
+class _AnalysisRequest:
+    def __init__(self, requestId: int, totalChunks: int):
+        self.requestId = requestId
+        self.result = AnalysisResult(totalChunks=totalChunks)
+        self.futures: List[Future] = []
+
+
+class AnalysisSignals(QObject):
+    chunkFinished = Signal(int, object)
+
+
+class WordFrequencyAnalyzer(QObject):
+    analysisStarted = Signal(int)
+    partialResult = Signal(int, object)
+    analysisFinished = Signal(int, object)
+    analysisCancelled = Signal(int)
+    analysisFailed = Signal(int, str)
+
+    def __init__(self, parent=None, maxWorkers: Optional[int] = None, mpContext=None):
+        super(WordFrequencyAnalyzer, self).__init__(parent)
+        self._maxWorkers = maxWorkers
+        self._mpContext = mpContext
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._chunkSize: int = ANALYSIS_CHUNK_SIZE
+        self._sizes: Tuple[int, ...] = ANALYSIS_NGRAM_SIZES
+        self._stopwords: FrozenSet[str] = DEFAULT_STOPWORDS
+        self._requests: Dict[int, _AnalysisRequest] = {}
+        self._lastRequestId: int = 0
+        self._signals = AnalysisSignals()
+        self._signals.chunkFinished.connect(self._chunkFinished)
+
+    def chunkSize(self) -> int:
+        return self._chunkSize
+
+    def setChunkSize(self, size: int):
+        self._chunkSize = size
+
+    def ngramSizes(self) -> Tuple[int, ...]:
+        return self._sizes
+
+    def setNgramSizes(self, sizes: Iterable[int]):
+        self._sizes = tuple(sorted(set(sizes)))
+
+    def stopwords(self) -> FrozenSet[str]:
+        return self._stopwords
+
+    def setStopwords(self, stopwords: Iterable[str]):
+        self._stopwords = frozenset(word.lower() for word in stopwords)
+
+    def analyze(self, documents: Union[QTextDocument, Iterable[QTextDocument]]) -> int:
+        if isinstance(documents, QTextDocument):
+            documents = [documents]
+        chunks = []
+        for document in documents:
+            chunks.extend(split_chunks(document_snapshot(document), self._chunkSize))
+        return self.analyzeText(chunks)
+
+    def analyzeText(self, chunks: Union[str, List[str]]) -> int:
+        if isinstance(chunks, str):
+            chunks = split_chunks(chunks, self._chunkSize)
+        self._lastRequestId += 1
+        request = _AnalysisRequest(self._lastRequestId, len(chunks))
+        self._requests[request.requestId] = request
+        self.analysisStarted.emit(request.requestId)
+        if not chunks:
+            self._finish(request)
+            return request.requestId
+
+        executor = self._executorInstance()
+        for chunk in chunks:
+            future = executor.submit(count_ngrams, chunk, self._sizes, self._stopwords)
+            future.add_done_callback(partial(self._futureDone, request.requestId))
+            request.futures.append(future)
+        return request.requestId
+
+    def isAnalyzing(self) -> bool:
+        return len(self._requests) > 0
+
+    def activeAnalyses(self) -> List[int]:
+        return list(self._requests.keys())
+
+    def cancel(self, requestId: int):
+        request = self._requests.pop(requestId, None)
+        if request is None:
+            return
+        for future in request.futures:
+            future.cancel()
+        self.analysisCancelled.emit(requestId)
+
+    def cancelAll(self):
+        for requestId in list(self._requests.keys()):
+            self.cancel(requestId)
+
+    def shutdown(self, wait: bool = True):
+        # cancelling every request drops its queued chunks, as shutdown(cancel_futures=True) would on Python 3.9+
+        self.cancelAll()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _executorInstance(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._maxWorkers, mp_context=self._mpContext)
+        return self._executor
+
+    def _futureDone(self, requestId: int, future: Future):
+        # called from the executor's management thread; the signal is delivered on the GUI thread
+        if not future.cancelled():
+            self._signals.chunkFinished.emit(requestId, future)
+
+    def _chunkFinished(self, requestId: int, future: Future):
+        request = self._requests.get(requestId)
+        if request is None:
+            return
+        error = future.exception()
+        if error is not None:
+            self._requests.pop(requestId, None)
+            for pending in request.futures:
+                pending.cancel()
+            self.analysisFailed.emit(requestId, str(error))
+            return
+
+        words, counts = future.result()
+        request.result.merge(words, counts)
+        if request.result.isComplete():
+            self._finish(request)
+        else:
+            self.partialResult.emit(requestId, request.result)
+
+    def _finish(self, request: _AnalysisRequest):
+        self._requests.pop(request.requestId, None)
+        self.analysisFinished.emit(request.requestId, request.result)
@@ -1,5 +1,7 @@
+from bisect import bisect_left
 from enum import Enum
-from typing import Dict, Optional, Any, Type, List
+from functools import partial
+from typing import Dict, Optional, Any, Type, List, Tuple, Set
 
 import qtanim
 import qtawesome
@@ -8,13 +10,17 @@ from qthandy import vbox, hbox, spacer, vline, btn_popup_menu, margins, transluc
 from qthandy.filter import DisabledClickEventFilter, OpacityEventFilter
 from qtmenu import MenuWidget
 from qtpy import QtGui
-from qtpy.QtCore import Qt, QMimeData, QSize, QUrl, QBuffer, QIODevice, QPoint, QEvent, Signal, QMargins, QRect
+from qtpy.QtCore import Qt, QMimeData, QSize, QUrl, QBuffer, QIODevice, QPoint, QEvent, Signal, QMargins, QRect, \
+    QTimer, QThreadPool, QObject
 from qtpy.QtGui import QContextMenuEvent, QDesktopServices, QFont, QTextBlockFormat, QTextCursor, QTextList, \
     QTextCharFormat, QTextFormat, QTextBlock, QTextTable, QTextTableCell, QTextLength, QTextTableFormat, QKeyEvent, \
-    QColor, QWheelEvent, QTextDocument, QFocusEvent, QKeySequence
+    QColor, QWheelEvent, QTextDocument, QTextListFormat, QFocusEvent, QKeySequence, QStaticText, QHideEvent
 from qtpy.QtWidgets import QMenu, QWidget, QApplication, QFrame, QButtonGroup, QTextEdit, \
-    QInputDialog, QToolButton, QLineEdit, QPushButton
+    QInputDialog, QToolButton, QLineEdit, QPushButton, QLabel
 
+from qttextedit.analysis import phrase_occurrences
+from qttextedit.index import BlockStateIndex
+from qttextedit.instrumentation import instrumented
 from qttextedit.ops import TextEditorOperation, InsertListOperation, InsertNumberedListOperation, \
     TextEditorOperationAction, TextEditorOperationMenu, \
     TextEditorOperationWidgetAction, TextEditingSettingsOperation, TextEditorSettingsWidget, TextOperation, \
@@ -22,28 +28,17 @@ from qttextedit.ops import TextEditorOperation, InsertListOperation, InsertNumbe
     InsertBlueBannerOperation, InsertGreenBannerOperation, InsertYellowBannerOperation, InsertPurpleBannerOperation, \
     InsertGrayBannerOperation, AlignmentOperation, FormatOperation, BoldOperation, \
     ItalicOperation, UnderlineOperation, StrikethroughOperation, ColorOperation, AlignLeftOperation, \
-    AlignCenterOperation, AlignRightOperation, InsertLinkOperation, ExportPdfOperation, PrintOperation
-from qttextedit.util import select_anchor, select_previous_character, select_next_character, EN_DASH, EM_DASH, \
-    is_open_quotation, is_ending_punctuation, has_character_left, LEFT_SINGLE_QUOTATION, RIGHT_SINGLE_QUOTATION, \
-    has_character_right, RIGHT_DOUBLE_QUOTATION, LEFT_DOUBLE_QUOTATION, LONG_ARROW_LEFT_RIGHT, HEAVY_ARROW_RIGHT, \
-    SHORT_ARROW_LEFT_RIGHT, qta_icon, q_action, CloseButton, ELLIPSIS
-
-
-class DashInsertionMode(Enum):
-    NONE = 'none'
-    INSERT_EN_DASH = 'en'
-    INSERT_EM_DASH = 'em'
-
-
-class EllipsisInsertionMode(Enum):
-    NONE = 'none'
-    INSERT_ELLIPSIS = 'ellipsis'
-
-
-class AutoCapitalizationMode(Enum):
-    NONE = 'none'
-    PARAGRAPH = 'paragraph'
-    SENTENCE = 'sentence'
+    AlignCenterOperation, AlignRightOperation, InsertLinkOperation, ExportPdfOperation, PrintOperation, TextFormatState
+from qttextedit.paste import ASYNC_PASTE_THRESHOLD, PasteConversionTask, html_to_markdown, document_to_markdown
+from qttextedit.rules import DashInsertionMode, EllipsisInsertionMode, AutoCapitalizationMode, KeystrokeRule, \
+    KeystrokeRuleRegistry, default_keystroke_rules
+from qttextedit.search import find_all, find_all_in_document, refine_matches, utf16_spans, SearchTask, \
+    SEARCH_ASYNC_THRESHOLD
+from qttextedit.outline import HeadingIndex
+from qttextedit.profiler import LayoutPaintProfiler
+from qttextedit.stats import DocumentStatistics
+from qttextedit.util import select_anchor, qta_icon, q_action, CloseButton, CoalescingTimer, font_metrics, \
+    character_width
 
 
 class TextBlockState(Enum):
@@ -87,6 +82,27 @@ class _SideBarButton(QToolButton):
         self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
 
 
+BLOCK_FORMAT_PROGRESS_STEP = 1000
+FIND_DEBOUNCE_DELAY = 150
+# marks the extra selections that highlight find matches, to tell them from the host application's
+FIND_MATCH_PROPERTY = QTextFormat.Property.UserProperty + 1
+RELAYOUT_DELAY = 50
+
+_LINK_ICON_DATA_URI: Optional[str] = None
+
+
+def _linkIconDataUri() -> str:
+    global _LINK_ICON_DATA_URI
+    if _LINK_ICON_DATA_URI is None:
+        icon = qtawesome.icon('fa5s.external-link-alt')
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        pixmap = icon.pixmap(QSize(8, 8))
+        pixmap.save(buffer, "PNG", quality=100)
+        _LINK_ICON_DATA_URI = f'data:image/png;base64, {bytes(buffer.data().toBase64()).decode()}'
+    return _LINK_ICON_DATA_URI
+
+
 class PopupBase(QFrame):
 
     def freeze(self):
@@ -106,6 +122,11 @@ class PopupBase(QFrame):
 
 
 class EnhancedTextEdit(QTextEdit):
+    blockFormatProgress = Signal(int, int)
+    pasteStarted = Signal()
+    pasteFinished = Signal(bool)
+    blockFormatsChanged = Signal(int, int)
+    zoomChanged = Signal(int)
 
     def __init__(self, parent=None):
         super(EnhancedTextEdit, self).__init__(parent)
@@ -114,9 +135,10 @@ class EnhancedTextEdit(QTextEdit):
         self._pasteAsOriginalEnabled: bool = True
 
         self._textIsBeingPasted: bool = False
-
-        self._blockAutoCapitalization: bool = False
-        self._sentenceAutoCapitalization: bool = False
+        self._asyncPasteThreshold: int = ASYNC_PASTE_THRESHOLD
+        self._pasteTask: Optional[PasteConversionTask] = None
+        self._pasteCursor: Optional[QTextCursor] = None
+        self._pasteRequestId: int = 0
 
         self._uneditableBlocksEnabled: bool = False
         self._sidebarEnabled: bool = True
@@ -132,10 +154,23 @@ class EnhancedTextEdit(QTextEdit):
         self._defaultBlockFormat = QTextBlockFormat()
         self._currentHoveredTable: Optional[QTextTable] = None
         self._currentHoveredTableCell: Optional[QTextTableCell] = None
-        self._lastPaintedCursorRect = QRect(0, 0, 0, 0)
+        self._hoveredBlockNumber: int = -1
+        self._hoveredBlockRect = QRect()
+        self._hoveredBlockHasAnchors: bool = False
+        self._hoveredAnchor: str = ''
+        self._placeholderCursorRect = QRect(0, 0, 0, 0)
+        self._placeholderCacheKey = None
+        self._placeholderStaticText: Optional[QStaticText] = None
         self._placeholderColor = QColor("#5E6C84")
         self._blockPlaceholderEnabled: bool = False
         self._defaultPlaceholder = "Begin writing, or type '/' for commands"
+        self._uneditableBlocks = BlockStateIndex(self.document(), TextBlockState.UNEDITABLE.value)
+        self._statistics: Optional[DocumentStatistics] = None
+        self._outline: Optional[HeadingIndex] = None
+        self._profiler: Optional[LayoutPaintProfiler] = None
+        self._keystrokeRules = KeystrokeRuleRegistry()
+        for rule in default_keystroke_rules():
+            self._keystrokeRules.addRule(rule)
 
         # self._btnTablePlusAbove = _SideBarButton('fa5s.plus', 'Insert a new row above', parent=self)
         # self._btnTablePlusAbove.setHidden(True)
@@ -158,6 +193,11 @@ class EnhancedTextEdit(QTextEdit):
 
         self._blockFormatMenu = MenuWidget(self._btnBlockFormat)
         self._blockFormatMenu.aboutToShow.connect(self._showFormatMenu)
+        self._blockDragOrigin: Optional[QPoint] = None
+        self._blockDragRange: Optional[Tuple[int, int]] = None
+        self._blockDropTarget: int = -1
+        self._blockDropColor = QColor('#4B9CD3')
+        self._btnBlockFormat.installEventFilter(self)
 
         self._commandActions = [Heading1Operation, Heading2Operation, Heading3Operation, InsertListOperation,
                                 InsertNumberedListOperation, InsertDividerOperation,
@@ -169,26 +209,26 @@ class EnhancedTextEdit(QTextEdit):
 
         self.document().setDocumentMargin(40)
 
+        self._pendingZoom: int = 0
+        self._zoomTimer = CoalescingTimer(RELAYOUT_DELAY, self)
+        self._zoomTimer.triggered.connect(self._applyZoom)
         self._adjustTabDistance()
 
         self.cursorPositionChanged.connect(self._cursorPositionChanged)
         self.textChanged.connect(self._cursorPositionChanged)
         self.selectionChanged.connect(self._selectionChanged)
 
+        self.cursorPositionChanged.connect(self._invalidatePlaceholder)
+        self.document().contentsChange.connect(self._invalidatePlaceholder)
+        self.verticalScrollBar().valueChanged.connect(self._invalidatePlaceholder)
+        self.horizontalScrollBar().valueChanged.connect(self._invalidatePlaceholder)
+        self.document().contentsChange.connect(self._resetHoveredBlock)
+        self.document().documentLayout().documentSizeChanged.connect(self._resetHoveredBlock)
+
     def autoCapitalizationMode(self) -> AutoCapitalizationMode:
         return self._autoCapitalizationMode
 
     def setAutoCapitalizationMode(self, mode: AutoCapitalizationMode):
-        if mode == AutoCapitalizationMode.NONE:
-            self._blockAutoCapitalization = False
-            self._sentenceAutoCapitalization = False
-        elif mode == AutoCapitalizationMode.PARAGRAPH:
-            self._blockAutoCapitalization = True
-            self._sentenceAutoCapitalization = False
-        elif mode == AutoCapitalizationMode.SENTENCE:
-            self._blockAutoCapitalization = True
-            self._sentenceAutoCapitalization = True
-
         self._autoCapitalizationMode = mode
 
     def dashInsertionMode(self) -> DashInsertionMode:
@@ -220,9 +260,20 @@ class EnhancedTextEdit(QTextEdit):
 
     def setUneditableBlocksEnabled(self, enabled: bool):
         self._uneditableBlocksEnabled = enabled
+        self._uneditableBlocks.setActive(enabled)
         if not enabled:
             self._editionState = _TextEditionState.ALLOWED
 
+    def setBlockUneditable(self, block: QTextBlock, uneditable: bool = True):
+        block.setUserState(TextBlockState.UNEDITABLE.value if uneditable else -1)
+        if self._uneditableBlocksEnabled:
+            self._uneditableBlocks.update(block)
+
+    # range checks rely on the index, so blocks locked with setUserState() instead of setBlockUneditable() need a refresh
+    def refreshUneditableBlocks(self):
+        if self._uneditableBlocksEnabled:
+            self._uneditableBlocks.rebuild()
+
     def sidebarEnabled(self) -> bool:
         return self._sidebarEnabled
 
@@ -241,6 +292,55 @@ class EnhancedTextEdit(QTextEdit):
     def setDocumentMargin(self, value: int):
         self.document().setDocumentMargin(value)
 
+    def statistics(self) -> DocumentStatistics:
+        if self._statistics is None or self._statistics.document() is not self.document():
+            if self._statistics is not None:
+                self._statistics.deleteLater()
+            self._statistics = DocumentStatistics(self.document(), self)
+            self._statistics.setActive(True)
+        return self._statistics
+
+    def outline(self) -> HeadingIndex:
+        if self._outline is None or self._outline.document() is not self.document():
+            if self._outline is not None:
+                self._outline.deleteLater()
+            self._outline = HeadingIndex(self.document(), self)
+            self._outline.setActive(True)
+        return self._outline
+
+    def profiler(self) -> LayoutPaintProfiler:
+        if self._profiler is None:
+            self._profiler = LayoutPaintProfiler(self)
+        return self._profiler
+
+    def isProfilingEnabled(self) -> bool:
+        return self._profiler is not None and self._profiler.isActive()
+
+    def setProfilingEnabled(self, enabled: bool, overlay: bool = False):
+        profiler = self.profiler()
+        profiler.setActive(enabled)
+        profiler.setOverlayVisible(enabled and overlay)
+
+    def currentHeading(self) -> int:
+        return self.outline().indexOfBlock(self.textCursor().blockNumber())
+
+    def goToHeading(self, index: int):
+        outline = self.outline()
+        if not 0 <= index < outline.count():
+            return
+        cursor = QTextCursor(outline.block(index))
+        self.setTextCursor(cursor)
+        self.ensureCursorVisible()
+
+    def keystrokeRules(self) -> KeystrokeRuleRegistry:
+        return self._keystrokeRules
+
+    def addKeystrokeRule(self, rule: KeystrokeRule):
+        self._keystrokeRules.addRule(rule)
+
+    def setKeystrokeRuleEnabled(self, name: str, enabled: bool):
+        self._keystrokeRules.setRuleEnabled(name, enabled)
+
     def setCommandOperations(self, operations: List[Type[TextEditorOperation]]):
         self._commandActions.clear()
         self._commandActions.extend(operations)
@@ -305,8 +405,12 @@ class EnhancedTextEdit(QTextEdit):
         self._pasteAsOriginal = previous
 
     def selectAll(self):
-        if self.__blocksUneditable(end=self.document().blockCount()):
-            self._editionState = _TextEditionState.DISALLOWED
+        if self._uneditableBlocksEnabled:
+            self._uneditableBlocks.rebuild()
+            if self._uneditableBlocks.count():
+                self._editionState = _TextEditionState.DISALLOWED
+            else:
+                self._editionState = _TextEditionState.ALLOWED
         super(EnhancedTextEdit, self).selectAll()
 
     def cut(self):
@@ -317,33 +421,9 @@ class EnhancedTextEdit(QTextEdit):
         self._textIsBeingPasted = False
 
     def insertDocument(self, doc: QTextDocument):
-        def _preprocessMarkdown(md: str) -> str:
-            lines = md.split('\n')
-            if len(lines) < 2:
-                return md
-            for i in range(len(lines)):
-                if lines[i].strip() == '***':
-                    lines[i] = '<span>***</span>'
-                elif lines[i].strip() == '###':
-                    lines[i] = '<span>###</span>'
-            return '\n'.join(lines)
-
-        cursor: QTextCursor = self.textCursor()
-
-        cursor.beginEditBlock()
-        start_pos = cursor.position()
-
-        md = doc.toMarkdown().rstrip('\n')
-        md = _preprocessMarkdown(md)
-        cursor.insertMarkdown(md)
-
-        end_pos = cursor.position()
-        cursor.setPosition(start_pos, QTextCursor.MoveAnchor)
-        cursor.setPosition(end_pos, QTextCursor.KeepAnchor)
-        cursor.mergeBlockFormat(self._defaultBlockFormat)
-
-        cursor.endEditBlock()
+        self._insertMarkdown(document_to_markdown(doc), self.textCursor())
 
+    @instrumented()
     def insertFromMimeData(self, source: QMimeData) -> None:
         if self._editionState == _TextEditionState.DISALLOWED:
             return
@@ -356,11 +436,11 @@ class EnhancedTextEdit(QTextEdit):
             super(EnhancedTextEdit, self).insertFromMimeData(source)
         else:
             if source.hasHtml():
-                doc = QTextDocument()
-                html = source.html().replace('<!--StartFragment-->', '')
-                html = html.replace('<!--EndFragment-->', '')
-                doc.setHtml(html)
-                self.insertDocument(doc)
+                html = source.html()
+                if len(html) < self._asyncPasteThreshold:
+                    self._insertMarkdown(html_to_markdown(html), self.textCursor())
+                else:
+                    self._pasteAsync(html)
             elif source.hasText():
                 self.insertPlainText(source.text())
             else:
@@ -368,74 +448,60 @@ class EnhancedTextEdit(QTextEdit):
 
         self._textIsBeingPasted = False
 
+    def isPasteInProgress(self) -> bool:
+        return self._pasteTask is not None
+
+    def cancelPaste(self):
+        if self._pasteTask is None:
+            return
+        self._pasteTask.cancel()
+        self._finishAsyncPaste()
+        self.pasteFinished.emit(False)
+
+    def setAsyncPasteThreshold(self, size: int):
+        self._asyncPasteThreshold = size
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if watched is self._btnBlockFormat:
+            if event.type() == QEvent.Type.MouseButtonPress and event.button() == Qt.MouseButton.LeftButton:
+                self._blockDragOrigin = event.pos()
+            elif event.type() == QEvent.Type.MouseMove and self._blockDragOrigin is not None:
+                if self._blockDragRange is None:
+                    if (event.pos() - self._blockDragOrigin).manhattanLength() < QApplication.startDragDistance():
+                        return False
+                    self._blockDragRange = self._blockRange(self._blockFormatPosition)
+                self._updateBlockDropTarget(self.viewport().mapFromGlobal(self._btnBlockFormat.mapToGlobal(event.pos())))
+                return True
+            elif event.type() == QEvent.Type.MouseButtonRelease and self._blockDragOrigin is not None:
+                dragged = self._blockDragRange is not None
+                if dragged and self._blockDropTarget >= 0:
+                    self.moveBlocks(*self._blockDragRange, self._blockDropTarget)
+                self._resetBlockDrag()
+                return dragged
+        return super().eventFilter(watched, event)
+
     def wheelEvent(self, event: QWheelEvent):
         super().wheelEvent(event)
         if self.verticalScrollBar().isVisible():
             self._btnPlus.setVisible(False)
             self._btnBlockFormat.setVisible(False)
 
+    @instrumented()
     def mouseMoveEvent(self, event: QtGui.QMouseEvent) -> None:
         super(EnhancedTextEdit, self).mouseMoveEvent(event)
 
-        cursor: QTextCursor = self.cursorForPosition(event.pos())
-        beginningCursor = QTextCursor(cursor.block())
-        rect = self.cursorRect(beginningCursor)
-        self._currentHoveredTable = cursor.currentTable()
-        if self._currentHoveredTable:
-            self._currentHoveredTableCell = self._currentHoveredTable.cellAt(cursor)
-            self._btnPlus.setHidden(True)
-            self._btnBlockFormat.setHidden(True)
+        docPos = event.pos() + QPoint(self.horizontalScrollBar().value(), self.verticalScrollBar().value())
+        if not self._hoveredBlockHasAnchors and self._hoveredBlockRect.contains(docPos):
+            return
 
-            # self._btnTablePlusAbove.setGeometry(self.viewportMargins().left() + rect.x() - 16, rect.y() - 10, 16, 16)
-            # self._btnTablePlusAbove.setVisible(True)
-            # beginningCursor.movePosition(QTextCursor.EndOfBlock)
-            # self._btnTablePlusBelow.setGeometry(self.viewportMargins().left() + rect.x() - 16,
-            #                                     self.cursorRect(beginningCursor).y() + rect.height() - 8,
-            #                                     16, 16)
-            # self._btnTablePlusBelow.setVisible(True)
-            #
-            # constraint: QTextLength = self._currentHoveredTable.format().columnWidthConstraints()[
-            #     self._currentHoveredTableCell.column()]
-            # cell_width = self.document().size().width() * constraint.rawValue() / 100
-            #
-            # self._btnTablePlusLeft.setGeometry(self.viewportMargins().left() + rect.x() - 8, rect.y() - 18, 16, 16)
-            # self._btnTablePlusLeft.setVisible(True)
-            #
-            # self._btnTablePlusRight.setGeometry(
-            #     int(self.viewportMargins().left() + rect.x() + cell_width - self._currentHoveredTable.format().leftMargin() - 20),
-            #     int(rect.y() - 18), 16, 16)
-            # self._btnTablePlusRight.setVisible(True)
+        cursor: QTextCursor = self.cursorForPosition(event.pos())
+        if cursor.blockNumber() != self._hoveredBlockNumber:
+            self._hoverBlock(cursor)
 
+        if self._hoveredBlockHasAnchors and not cursor.atBlockStart() and not cursor.atBlockEnd():
+            self._setHoveredAnchor(self.anchorAt(event.pos()))
         else:
-            # self._btnTablePlusAbove.setHidden(True)
-            # self._btnTablePlusBelow.setHidden(True)
-            # self._btnTablePlusLeft.setHidden(True)
-            # self._btnTablePlusRight.setHidden(True)
-            if self._sidebarEnabled and self._blockFormatPosition != cursor.blockNumber():
-                self._blockFormatPosition = cursor.blockNumber()
-
-                y_diff = (rect.height() - 20) // 2 + self.viewportMargins().top()
-                first_x = 40 if self._sidebarMenuEnabled else 20
-                doc_margin = int(self.document().documentMargin())
-                self._btnPlus.setGeometry(self.viewportMargins().left() - first_x + doc_margin, rect.y() + y_diff, 20,
-                                          20)
-                self._btnPlus.setVisible(True)
-                if self._sidebarMenuEnabled:
-                    self._btnBlockFormat.setGeometry(self.viewportMargins().left() - first_x + 20 + doc_margin,
-                                                     rect.y() + y_diff, 20, 20)
-                    self._btnBlockFormat.setVisible(True)
-
-        if cursor.atBlockStart() or cursor.atBlockEnd():
-            QApplication.restoreOverrideCursor()
-        else:
-            anchor = self.anchorAt(event.pos())
-            if anchor:
-                if QApplication.overrideCursor() is None:
-                    QApplication.setOverrideCursor(Qt.PointingHandCursor)
-                    self._setLinkTooltip(anchor)
-            else:
-                QApplication.restoreOverrideCursor()
-                self.setToolTip('')
+            self._setHoveredAnchor('')
 
     def mouseReleaseEvent(self, event: QtGui.QMouseEvent) -> None:
         super(EnhancedTextEdit, self).mouseReleaseEvent(event)
@@ -460,6 +526,8 @@ class EnhancedTextEdit(QTextEdit):
 
     def leaveEvent(self, event: QEvent) -> None:
         super(EnhancedTextEdit, self).leaveEvent(event)
+        self._setHoveredAnchor('')
+        self._resetHoveredBlock()
         self._btnPlus.setHidden(True)
         self._btnBlockFormat.setHidden(True)
         # self._btnTablePlusAbove.setHidden(True)
@@ -474,16 +542,38 @@ class EnhancedTextEdit(QTextEdit):
 
     def setPlaceholderText(self, placeholderText: str) -> None:
         self._defaultPlaceholder = placeholderText
+        self.viewport().update()
 
     def setPlaceholderTextColor(self, color: QColor):
         self._placeholderColor = color
-
+        self.viewport().update()
+
+    @instrumented()
+    def resizeEvent(self, event: QtGui.QResizeEvent) -> None:
+        profiling = self.isProfilingEnabled()
+        if profiling:
+            self._profiler.beginResize()
+        super().resizeEvent(event)
+        self._invalidatePlaceholder()
+        self._resetHoveredBlock()
+        if profiling:
+            self._profiler.endResize()
+
+    @instrumented()
     def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        if ((self._blockPlaceholderEnabled or self.textCursor().blockNumber() == 0)
-                and self._lastPaintedCursorRect != self.cursorRect(self.textCursor())):
-            self._lastPaintedCursorRect = self.cursorRect(self.textCursor())
-            self.viewport().update()
+        if self.isProfilingEnabled():
+            self._profiler.beginPaint()
+            try:
+                self._paintEvent(e)
+            finally:
+                self._profiler.endPaint(e.rect())
+        else:
+            self._paintEvent(e)
+
+    def _paintEvent(self, e: QtGui.QPaintEvent):
         super().paintEvent(e)
+        if self._blockDropTarget >= 0:
+            self._paintBlockDropIndicator()
 
         if not self._blockPlaceholderEnabled and self.textCursor().blockNumber() > 0:
             return
@@ -492,21 +582,14 @@ class EnhancedTextEdit(QTextEdit):
         if block.text() != "":
             return
 
-        placeholderFont = self.font()
+        heading = 0
         if block.textList():
             placeholder = 'List'
         elif block.blockFormat().headingLevel():
             heading = block.blockFormat().headingLevel()
             placeholder = f'Heading {heading}'
-            if heading == 1:
-                placeholderFont.setPointSizeF(placeholderFont.pointSize() * 2)
-            elif heading == 2:
-                placeholderFont.setPointSizeF(placeholderFont.pointSize() * 1.5)
-            elif heading == 3:
-                placeholderFont.setPointSizeF(placeholderFont.pointSize() * 1.2)
-            placeholderFont.setWeight(QtGui.QFont.Weight.Bold)
         else:
-            alignment = self.alignment()
+            alignment = block.blockFormat().alignment()
             if alignment & Qt.AlignmentFlag.AlignCenter:
                 placeholder = self._centeredPlaceholder()
             elif alignment & Qt.AlignmentFlag.AlignRight:
@@ -514,54 +597,31 @@ class EnhancedTextEdit(QTextEdit):
             else:
                 placeholder = self._defaultPlaceholder
 
+        topLeft = self._placeholderCursorRect.topLeft()
+        width = self.viewport().width() - topLeft.x()
+        staticText = self._placeholderText(placeholder, heading, width)
+
         painter = QtGui.QPainter(self.viewport())
         painter.setPen(self._placeholderColor)
-        painter.setFont(placeholderFont)
-
-        text_rect = QRect(self._lastPaintedCursorRect.topLeft(), self.viewport().rect().bottomRight())
-        painter.drawText(text_rect, Qt.TextFlag.TextWordWrap, placeholder)
+        painter.setFont(self._placeholderFont(heading))
+        painter.drawStaticText(topLeft, staticText)
 
+    @instrumented()
     def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
         if self._editionState == _TextEditionState.DISALLOWED:
             if event.key() not in (Qt.Key_Up, Qt.Key_Down):
                 return
 
+        if event.key() == Qt.Key_Escape and self._pasteTask is not None:
+            self.cancelPaste()
+            return
+
         cursor: QTextCursor = self.textCursor()
         if event.key() == Qt.Key_Tab:
-            list_ = cursor.block().textList()
-            if list_:
-                cursor.beginEditBlock()
-                block = cursor.block()
-
-                new_format = list_.format()
-                new_format.setIndent(list_.format().indent() + 1)
-                cursor.insertList(new_format)
-                list_.removeItem(list_.itemNumber(block))
-                cursor.deletePreviousChar()
-
-                cursor.endEditBlock()
+            if self.indentListItems(*self._selectedBlockRange()):
                 return
         if event.key() == Qt.Key_Backtab:
-            list_: QTextList = cursor.block().textList()
-            if list_:
-                indent = list_.format().indent()
-                if indent > 1:
-                    if list_.count() == 1:
-                        cursor.beginEditBlock()
-                        new_format = list_.format()
-                        new_format.setIndent(indent - 1)
-                        list_.setFormat(new_format)
-                        cursor.endEditBlock()
-                    elif list_.count() > 1:
-                        cursor.beginEditBlock()
-                        new_format = list_.format()
-                        new_format.setIndent(indent - 1)
-                        list_.remove(cursor.block())
-                        new_block_format = cursor.block().blockFormat()
-                        new_block_format.setIndent(cursor.block().blockFormat().indent() - 2)
-                        cursor.mergeBlockFormat(new_block_format)
-                        cursor.createList(new_format)
-                        cursor.endEditBlock()
+            if self.outdentListItems(*self._selectedBlockRange()) or cursor.block().textList():
                 return
         if event.matches(QKeySequence.Cut):
             self._textIsBeingPasted = True
@@ -577,66 +637,19 @@ class EnhancedTextEdit(QTextEdit):
         if event.key() == Qt.Key.Key_V and event.modifiers() & Qt.ControlModifier and event.modifiers() & Qt.ShiftModifier:
             self.pasteAsPlainText()
         if event.key() == Qt.Key_D and event.modifiers() & Qt.ControlModifier:
-            self._duplicateBlock(self.textCursor().blockNumber())
+            self.duplicateBlocks(*self._selectedBlockRange())
             return
-        if event.text().isalpha():
-            if (self._blockAutoCapitalization and cursor.atBlockStart() and not cursor.block().text()) or (
-                    self._sentenceAutoCapitalization and self._atSentenceStart(cursor)):
-                self.textCursor().insertText(event.text().upper())
-                return
-        if event.key() == Qt.Key_Return and not event.modifiers():
-            self._insertNewBlock(cursor)
+        if event.key() in (Qt.Key_Up, Qt.Key_Down) and event.modifiers() & Qt.ControlModifier \
+                and event.modifiers() & Qt.ShiftModifier:
+            if event.key() == Qt.Key_Up:
+                self.moveBlocksUp(*self._selectedBlockRange())
+            else:
+                self.moveBlocksDown(*self._selectedBlockRange())
             return
-        if cursor.atBlockEnd() and event.key() == Qt.Key.Key_Space and self._periodInsertionEnabled:
-            moved_cursor = select_previous_character(cursor)
-            if moved_cursor.selectedText() == ' ':
-                self.textCursor().deletePreviousChar()
-                self.textCursor().insertText('.')
-        if event.key() == Qt.Key_Period and self._ellipsisInsertionMode != EllipsisInsertionMode.NONE:
-            moved_cursor = select_previous_character(cursor, amount=2)
-            if moved_cursor.selectedText() == '..':
-                moved_cursor.removeSelectedText()
-                cursor.insertText(ELLIPSIS)
-                # cursor.insertText(f'.{NBSP}.{NBSP}.')
-                return
-        if event.key() == Qt.Key_Minus and self._dashInsertionMode != DashInsertionMode.NONE:
-            moved_cursor = select_previous_character(cursor)
-            if moved_cursor.selectedText() == '-':
-                cursor.deletePreviousChar()
-                if self._dashInsertionMode == DashInsertionMode.INSERT_EN_DASH:
-                    cursor.insertText(EN_DASH)
-                elif self._dashInsertionMode == DashInsertionMode.INSERT_EM_DASH:
-                    cursor.insertText(EM_DASH)
-                return
-            elif moved_cursor.selectedText() == EN_DASH and self._dashInsertionMode == DashInsertionMode.INSERT_EN_DASH:
-                cursor.deletePreviousChar()
-                cursor.insertText(EM_DASH)
-                return
-            elif moved_cursor.selectedText() == EM_DASH and self._dashInsertionMode == DashInsertionMode.INSERT_EM_DASH:
-                cursor.deletePreviousChar()
-                cursor.insertText(EN_DASH)
-                return
-        if event.key() == Qt.Key_Greater:
-            moved_cursor = select_previous_character(cursor, 2)
-            if moved_cursor.selectedText() == '<-':
-                cursor.deletePreviousChar()
-                cursor.deletePreviousChar()
-                cursor.insertText(LONG_ARROW_LEFT_RIGHT)
-                return
-            moved_cursor = select_previous_character(cursor)
-            if moved_cursor.selectedText() == '-':
-                cursor.deletePreviousChar()
-                cursor.insertText(HEAVY_ARROW_RIGHT)
-                return
-            if moved_cursor.selectedText() == '<':
-                cursor.deletePreviousChar()
-                cursor.insertText(SHORT_ARROW_LEFT_RIGHT)
-                return
-        if event.key() == Qt.Key_Apostrophe and self._smartQuotesEnabled:
-            self._insertQuote(cursor, LEFT_SINGLE_QUOTATION, RIGHT_SINGLE_QUOTATION)
+        if self._keystrokeRules.process(self, event, cursor):
             return
-        if event.key() == Qt.Key_QuoteDbl and self._smartQuotesEnabled:
-            self._insertQuote(cursor, LEFT_DOUBLE_QUOTATION, RIGHT_DOUBLE_QUOTATION)
+        if event.key() == Qt.Key_Return and not event.modifiers():
+            self._insertNewBlock(cursor)
             return
         if event.key() == Qt.Key_Delete and (
                 self._editionState == _TextEditionState.DEL_BLOCKED or
@@ -672,33 +685,62 @@ class EnhancedTextEdit(QTextEdit):
         self._defaultBlockFormat = blockFmt
 
         cursor = self.textCursor()
-        cursor.mergeBlockFormat(blockFmt)
+        first = self.document().findBlock(cursor.selectionStart()).blockNumber()
+        last = self.document().findBlock(cursor.selectionEnd()).blockNumber()
+        self.mergeBlockFormats(blockFmt, first, last)
 
-    def applyBlockFormat(self):
-        block = self.document().begin()
+    def applyBlockFormat(self, first: int = 0, last: int = -1) -> int:
         first_parag_block_format = QTextBlockFormat(self._defaultBlockFormat)
         first_parag_block_format.setTextIndent(0)
-        while block.isValid():
-            cursor = QTextCursor(block)
-            if block.blockNumber() == 0:
-                cursor.mergeBlockFormat(first_parag_block_format)
-            else:
-                cursor.mergeBlockFormat(self._defaultBlockFormat)
-
+        return self.mergeBlockFormats(self._defaultBlockFormat, first, last, first_parag_block_format)
+
+    def mergeBlockFormats(self, blockFormat: QTextBlockFormat, first: int = 0, last: int = -1,
+                          firstBlockFormat: Optional[QTextBlockFormat] = None) -> int:
+        doc = self.document()
+        if last < 0 or last >= doc.blockCount():
+            last = doc.blockCount() - 1
+        total = last - first + 1
+        if total <= 0:
+            return 0
+
+        changed = 0
+        cursor = QTextCursor(doc)
+        cursor.beginEditBlock()
+        block = doc.findBlockByNumber(first)
+        for i in range(total):
+            if not block.isValid():
+                break
+            fmt = firstBlockFormat if firstBlockFormat is not None and first + i == 0 else blockFormat
+            current = block.blockFormat()
+            merged = QTextBlockFormat(current)
+            merged.merge(fmt)
+            if merged != current:
+                cursor.setPosition(block.position())
+                cursor.setBlockFormat(merged)
+                changed += 1
+            if (i + 1) % BLOCK_FORMAT_PROGRESS_STEP == 0:
+                self.blockFormatProgress.emit(i + 1, total)
             block = block.next()
+        cursor.endEditBlock()
+        self.blockFormatProgress.emit(total, total)
+
+        return changed
 
     def setStrikethrough(self, strikethrough: bool):
         font = self.currentFont()
         font.setStrikeOut(strikethrough)
         self.setCurrentFont(font)
 
-    def zoomIn(self, range: int = ...) -> None:
-        super(EnhancedTextEdit, self).zoomIn(range)
-        self._adjustTabDistance()
+    def zoomIn(self, range: int = 1) -> None:
+        self._pendingZoom += range
+        self._zoomTimer.trigger()
 
-    def zoomOut(self, range: int = ...) -> None:
-        super(EnhancedTextEdit, self).zoomOut(range)
-        self._adjustTabDistance()
+    def zoomOut(self, range: int = 1) -> None:
+        self._pendingZoom -= range
+        self._zoomTimer.trigger()
+
+    def flushZoom(self):
+        self._zoomTimer.flush()
 
     def resetTextColor(self):
         format = self.textCursor().charFormat()
@@ -706,39 +748,152 @@ class EnhancedTextEdit(QTextEdit):
         format.clearForeground()
         self.textCursor().setCharFormat(format)
 
-    def setHeading(self, heading: int):
-        cursor: QTextCursor = self.textCursor()
+    def setHeading(self, heading: int) -> bool:
+        first, last = self._selectedBlockRange()
+        if self.__blocksUneditable(self.document().findBlockByNumber(first), self.document().findBlockByNumber(last)):
+            return False
+        previousHeading = self.textCursor().blockFormat().headingLevel()
+        cursor = QTextCursor(self.document())
         cursor.beginEditBlock()
-        cursor.select(QTextCursor.SelectionType.LineUnderCursor)
-        self.setTextCursor(cursor)
+        self._setBlocksHeading(cursor, first, last, heading)
+        cursor.endEditBlock()
+        self._resetCurrentCharFormat(previousHeading, heading)
+        self.blockFormatsChanged.emit(first, last)
+        return True
+
+    def convertBlocks(self, heading: int = 0, listStyle: Optional[QTextListFormat.Style] = None) -> bool:
+        first, last = self._selectedBlockRange()
+        firstBlock = self.document().findBlockByNumber(first)
+        lastBlock = self.document().findBlockByNumber(last)
+        if self.__blocksUneditable(firstBlock, lastBlock):
+            return False
+        if listStyle is not None:
+            heading = 0
+        previousHeading = self.textCursor().blockFormat().headingLevel()
 
-        blockFormat: QTextBlockFormat = cursor.blockFormat()
-        blockFormat.setHeadingLevel(heading)
-        cursor.setBlockFormat(blockFormat)
-        sizeAdjustment = 4 - heading if heading else 0
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        self._setBlocksHeading(cursor, first, last, heading)
+        if listStyle is None:
+            block = firstBlock
+            while block.isValid() and block.blockNumber() <= last:
+                if block.textList() is not None:
+                    blockFormat = block.blockFormat()
+                    blockFormat.setObjectIndex(-1)
+                    blockFormat.setIndent(0)
+                    cursor.setPosition(block.position())
+                    cursor.setBlockFormat(blockFormat)
+                block = block.next()
+        else:
+            list_ = firstBlock.textList()
+            if list_ is None or list_ != lastBlock.textList() or list_.format().style() != listStyle \
+                    or list_.itemNumber(lastBlock) - list_.itemNumber(firstBlock) != last - first:
+                self._selectBlockRange(cursor, first, last)
+                cursor.createList(listStyle)
+        cursor.endEditBlock()
+        self._resetCurrentCharFormat(previousHeading, heading)
+        self.blockFormatsChanged.emit(first, last)
+        return True
+
+    def _resetCurrentCharFormat(self, previousHeading: int, heading: int):
+        # the heading's bold and size would otherwise stick to the next typed characters; unchanged levels keep
+        # whatever format the user picked
+        if previousHeading != heading and not self.textCursor().hasSelection():
+            self.mergeCurrentCharFormat(self._headingCharFormat(heading))
+
+    def _setBlocksHeading(self, cursor: QTextCursor, first: int, last: int, heading: int):
+        runs: List[List[int]] = []
+        block = self.document().findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            if block.blockFormat().headingLevel() != heading:
+                number = block.blockNumber()
+                if runs and runs[-1][1] == number - 1:
+                    runs[-1][1] = number
+                else:
+                    runs.append([number, number])
+            block = block.next()
 
+        blockFormat = QTextBlockFormat()
+        blockFormat.setHeadingLevel(heading)
+        charFormat = self._headingCharFormat(heading)
+        for runFirst, runLast in runs:
+            self._selectBlockRange(cursor, runFirst, runLast)
+            cursor.mergeBlockFormat(blockFormat)
+            cursor.mergeBlockCharFormat(charFormat)
+            cursor.mergeCharFormat(charFormat)
+
+    def _selectBlockRange(self, cursor: QTextCursor, first: int, last: int):
+        lastBlock = self.document().findBlockByNumber(last)
+        cursor.setPosition(self.document().findBlockByNumber(first).position())
+        cursor.setPosition(lastBlock.position() + lastBlock.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+
+    def _headingCharFormat(self, heading: int) -> QTextCharFormat:
         charFormat = QTextCharFormat()
         charFormat.setFontWeight(QFont.Bold if heading else QFont.Normal)
-        charFormat.setProperty(QTextFormat.FontSizeAdjustment, sizeAdjustment)
-        cursor.mergeBlockCharFormat(charFormat)
-        self.mergeCurrentCharFormat(charFormat)
-
-        cursor.clearSelection()
-        self.setTextCursor(cursor)
-        cursor.endEditBlock()
+        charFormat.setProperty(QTextFormat.FontSizeAdjustment, 4 - heading if heading else 0)
+        return charFormat
 
     def _centeredPlaceholder(self) -> str:
         return 'Centered'
 
+    def _placeholderFont(self, heading: int) -> QFont:
+        placeholderFont = self.font()
+        if heading:
+            if heading == 1:
+                placeholderFont.setPointSizeF(placeholderFont.pointSize() * 2)
+            elif heading == 2:
+                placeholderFont.setPointSizeF(placeholderFont.pointSize() * 1.5)
+            elif heading == 3:
+                placeholderFont.setPointSizeF(placeholderFont.pointSize() * 1.2)
+            placeholderFont.setWeight(QtGui.QFont.Weight.Bold)
+        return placeholderFont
+
+    def _placeholderText(self, placeholder: str, heading: int, width: int) -> QStaticText:
+        key = (placeholder, self.font().key(), heading, width)
+        if key != self._placeholderCacheKey:
+            staticText = QStaticText(placeholder)
+            staticText.setTextFormat(Qt.TextFormat.PlainText)
+            staticText.setTextWidth(width)
+            staticText.prepare(QtGui.QTransform(), self._placeholderFont(heading))
+            self._placeholderStaticText = staticText
+            self._placeholderCacheKey = key
+        return self._placeholderStaticText
+
+    def _invalidatePlaceholder(self):
+        if not self._blockPlaceholderEnabled and self.textCursor().blockNumber() > 0:
+            if self._placeholderCursorRect.isValid():
+                self._updatePlaceholderArea(self._placeholderCursorRect)
+                self._placeholderCursorRect = QRect(0, 0, 0, 0)
+            return
+
+        rect = self.cursorRect(self.textCursor())
+        if rect != self._placeholderCursorRect:
+            if self._placeholderCursorRect.isValid():
+                self._updatePlaceholderArea(self._placeholderCursorRect)
+            self._placeholderCursorRect = rect
+            self._updatePlaceholderArea(rect)
+
+    def _updatePlaceholderArea(self, cursorRect: QRect):
+        self.viewport().update(QRect(cursorRect.topLeft(), self.viewport().rect().bottomRight()))
+
     def _showFormatMenu(self):
-        block = self.document().findBlockByNumber(self._blockFormatPosition)
-        cursor = QTextCursor(block)
-        self.setTextCursor(cursor)
+        first, last = self._blockRange(self._blockFormatPosition)
+        if first == last:
+            block = self.document().findBlockByNumber(self._blockFormatPosition)
+            cursor = QTextCursor(block)
+            self.setTextCursor(cursor)
         self.ensureCursorVisible()
 
         if not self._blockFormatMenu.actions():
             self._blockFormatMenu.addAction(
-                q_action('Duplicate', qta_icon('fa5.copy'), lambda: self._duplicateBlock(self._blockFormatPosition)))
+                q_action('Duplicate', qta_icon('fa5.copy'),
+                         lambda: self.duplicateBlocks(*self._blockRange(self._blockFormatPosition))))
+            self._blockFormatMenu.addAction(
+                q_action('Move up', qta_icon('mdi.arrow-up'),
+                         lambda: self.moveBlocksUp(*self._blockRange(self._blockFormatPosition))))
+            self._blockFormatMenu.addAction(
+                q_action('Move down', qta_icon('mdi.arrow-down'),
+                         lambda: self.moveBlocksDown(*self._blockRange(self._blockFormatPosition))))
             self._convertIntoMenu = MenuWidget()
             self._convertIntoMenu.setTitle('Convert into')
             self._convertIntoMenu.setIcon(qta_icon('ph.arrows-clockwise-fill'))
@@ -753,38 +908,50 @@ class EnhancedTextEdit(QTextEdit):
             self._blockFormatMenu.addAction(
                 q_action('Delete', qta_icon('fa5s.trash-alt'), lambda: self._deleteBlock(self._blockFormatPosition)))
 
+    def _applyZoom(self):
+        range, self._pendingZoom = self._pendingZoom, 0
+        if range == 0:
+            return
+        if range > 0:
+            super(EnhancedTextEdit, self).zoomIn(range)
+        else:
+            super(EnhancedTextEdit, self).zoomOut(-range)
+        self._adjustTabDistance()
+        self.zoomChanged.emit(range)
+
     def _adjustTabDistance(self):
-        self.setTabStopDistance(QtGui.QFontMetricsF(self.font()).horizontalAdvance(' ') * 4)
+        self.setTabStopDistance(font_metrics(self.font()).horizontalAdvance(' ') * 4)
 
+    @instrumented()
     def _cursorPositionChanged(self):
         if self._popupWidget and self._popupWidget.isVisible():
             self._popupWidget.hide()
         if not self._uneditableBlocksEnabled:
             return
 
-        if self.textCursor().block().userState() == TextBlockState.UNEDITABLE.value:
-            cursor = self.textCursor()
+        cursor = self.textCursor()
+        if cursor.hasSelection() and self.__blocksUneditable(self.document().findBlock(cursor.selectionStart()),
+                                                             self.document().findBlock(cursor.selectionEnd())):
+            self._editionState = _TextEditionState.DISALLOWED
+            return
+
+        block = cursor.block()
+        if self.__blockUneditable(block):
             self._editionState = _TextEditionState.DISALLOWED
             cursor.movePosition(QTextCursor.StartOfBlock)
             self.setTextCursor(cursor)
             return
 
-        if self.textCursor().atBlockEnd():
-            cursor = self.textCursor()
-            cursor.movePosition(QTextCursor.MoveOperation.NextBlock)
-            if cursor.block().userState() == TextBlockState.UNEDITABLE.value:
-                self._editionState = _TextEditionState.DEL_BLOCKED
-        if self.textCursor().atBlockStart():
-            cursor = self.textCursor()
-            cursor.movePosition(QTextCursor.MoveOperation.PreviousBlock)
-            if cursor.block().userState() == TextBlockState.UNEDITABLE.value:
-                if self._editionState == _TextEditionState.DEL_BLOCKED:
-                    self._editionState = _TextEditionState.REMOVAL_BLOCKED
-                else:
-                    self._editionState = _TextEditionState.BACKSPACE_BLOCKED
-                return
-
-        self._editionState = _TextEditionState.ALLOWED
+        delBlocked = cursor.atBlockEnd() and self.__blockUneditable(block.next())
+        backspaceBlocked = cursor.atBlockStart() and self.__blockUneditable(block.previous())
+        if delBlocked and backspaceBlocked:
+            self._editionState = _TextEditionState.REMOVAL_BLOCKED
+        elif delBlocked:
+            self._editionState = _TextEditionState.DEL_BLOCKED
+        elif backspaceBlocked:
+            self._editionState = _TextEditionState.BACKSPACE_BLOCKED
+        else:
+            self._editionState = _TextEditionState.ALLOWED
 
     def _selectionChanged(self):
         if not self.textCursor().hasSelection():
@@ -801,28 +968,92 @@ class EnhancedTextEdit(QTextEdit):
     def __blocksUneditable(self, firstBlock: QTextBlock, lastBlock: QTextBlock) -> bool:
         if not self._uneditableBlocksEnabled:
             return False
-        block = firstBlock
-        while block.isValid() and block.blockNumber() <= lastBlock.blockNumber():
-            if self.__blockUneditable(block):
-                return True
-            block = block.next()
-        return False
+        return self._uneditableBlocks.intersects(firstBlock, lastBlock)
 
     def __blockUneditable(self, block: QTextBlock) -> bool:
-        return self._uneditableBlocksEnabled and block.userState() == TextBlockState.UNEDITABLE.value
+        # the block's own state is authoritative, it may have been set directly without updating the index
+        return self._uneditableBlocksEnabled and block.isValid() and block.userState() == TextBlockState.UNEDITABLE.value
+
+    def _hoverBlock(self, cursor: QTextCursor):
+        block = cursor.block()
+        self._hoveredBlockNumber = block.blockNumber()
+        self._hoveredBlockHasAnchors = any(range_.format.isAnchor() for range_ in block.textFormats())
+
+        blockRect = self.document().documentLayout().blockBoundingRect(block).toRect()
+        beginningCursor = QTextCursor(block)
+        rect = self.cursorRect(beginningCursor)
+        self._currentHoveredTable = cursor.currentTable()
+        if self._currentHoveredTable:
+            self._hoveredBlockRect = blockRect
+            self._currentHoveredTableCell = self._currentHoveredTable.cellAt(cursor)
+            self._btnPlus.setHidden(True)
+            self._btnBlockFormat.setHidden(True)
+            # self._btnTablePlusAbove.setGeometry(self.viewportMargins().left() + rect.x() - 16, rect.y() - 10, 16, 16)
+            # self._btnTablePlusAbove.setVisible(True)
+            # beginningCursor.movePosition(QTextCursor.EndOfBlock)
+            # self._btnTablePlusBelow.setGeometry(self.viewportMargins().left() + rect.x() - 16,
+            #                                     self.cursorRect(beginningCursor).y() + rect.height() - 8,
+            #                                     16, 16)
+            # self._btnTablePlusBelow.setVisible(True)
+            #
+            # constraint: QTextLength = self._currentHoveredTable.format().columnWidthConstraints()[
+            #     self._currentHoveredTableCell.column()]
+            # cell_width = self.document().size().width() * constraint.rawValue() / 100
+            #
+            # self._btnTablePlusLeft.setGeometry(self.viewportMargins().left() + rect.x() - 8, rect.y() - 18, 16, 16)
+            # self._btnTablePlusLeft.setVisible(True)
+            #
+            # self._btnTablePlusRight.setGeometry(
+            #     int(self.viewportMargins().left() + rect.x() + cell_width - self._currentHoveredTable.format().leftMargin() - 20),
+            #     int(rect.y() - 18), 16, 16)
+            # self._btnTablePlusRight.setVisible(True)
+
+        else:
+            width = int(max(self.document().size().width(), self.viewport().width()))
+            self._hoveredBlockRect = QRect(0, blockRect.top(), width, blockRect.height())
+            self._currentHoveredTableCell = None
+            # self._btnTablePlusAbove.setHidden(True)
+            # self._btnTablePlusBelow.setHidden(True)
+            # self._btnTablePlusLeft.setHidden(True)
+            # self._btnTablePlusRight.setHidden(True)
+            if self._sidebarEnabled and self._blockFormatPosition != cursor.blockNumber():
+                self._blockFormatPosition = cursor.blockNumber()
+
+                y_diff = (rect.height() - 20) // 2 + self.viewportMargins().top()
+                first_x = 40 if self._sidebarMenuEnabled else 20
+                doc_margin = int(self.document().documentMargin())
+                self._btnPlus.setGeometry(self.viewportMargins().left() - first_x + doc_margin, rect.y() + y_diff, 20,
+                                          20)
+                self._btnPlus.setVisible(True)
+                if self._sidebarMenuEnabled:
+                    self._btnBlockFormat.setGeometry(self.viewportMargins().left() - first_x + 20 + doc_margin,
+                                                     rect.y() + y_diff, 20, 20)
+                    self._btnBlockFormat.setVisible(True)
+
+    def _resetHoveredBlock(self):
+        self._hoveredBlockNumber = -1
+        self._hoveredBlockRect = QRect()
+        self._hoveredBlockHasAnchors = False
+
+    def _setHoveredAnchor(self, anchor: str):
+        if anchor == self._hoveredAnchor:
+            return
+        if anchor and not self._hoveredAnchor:
+            QApplication.setOverrideCursor(Qt.PointingHandCursor)
+        elif not anchor:
+            QApplication.restoreOverrideCursor()
+        self._hoveredAnchor = anchor
+
+        if anchor:
+            self._setLinkTooltip(anchor)
+        else:
+            self.setToolTip('')
 
     def _setLinkTooltip(self, anchor: str):
-        icon = qtawesome.icon('fa5s.external-link-alt')
-        buffer = QBuffer()
-        buffer.open(QIODevice.WriteOnly)
-        pixmap = icon.pixmap(QSize(8, 8))
-        pixmap.save(buffer, "PNG", quality=100)
-        html = f"<img src='data:image/png;base64, {bytes(buffer.data().toBase64()).decode()}'>{anchor}"
-        self.setToolTip(html)
+        self.setToolTip(f"<img src='{_linkIconDataUri()}'>{anchor}")
 
     def _editLink(self, cursor: QTextCursor):
-        QApplication.restoreOverrideCursor()
-        self.setToolTip('')
+        self._setHoveredAnchor('')
 
         anchor, ok = QInputDialog.getText(self, 'Edit link', 'URL', text=cursor.charFormat().anchorHref())
         if ok:
@@ -832,26 +1063,52 @@ class EnhancedTextEdit(QTextEdit):
             char_format.setAnchorHref(anchor)
             pos_cursor.mergeCharFormat(char_format)
 
-    def _atSentenceStart(self, cursor: QTextCursor) -> bool:
-        if cursor.atBlockStart():
-            if cursor.block().text():
-                return False
-            return True
-        moved_cursor = select_previous_character(cursor)
-        if not cursor.atBlockEnd():
-            right_moved_cursor = select_next_character(cursor)
-            if right_moved_cursor.selectedText().isalpha():
-                return False
-        if moved_cursor.atBlockStart() and is_open_quotation(moved_cursor.selectedText()):
-            return True
-        if moved_cursor.positionInBlock() == 1:
-            return False
-        elif moved_cursor.selectedText() == ' ' or is_open_quotation(moved_cursor.selectedText()):
-            moved_cursor.movePosition(QTextCursor.PreviousCharacter, QTextCursor.KeepAnchor)
-            if is_ending_punctuation(moved_cursor.selectedText()[0]):
-                return True
+    def _insertMarkdown(self, md: str, cursor: QTextCursor):
+        cursor.beginEditBlock()
+        start_pos = cursor.selectionStart()
 
-        return False
+        cursor.insertMarkdown(md)
+
+        end_pos = cursor.position()
+        cursor.setPosition(start_pos, QTextCursor.MoveAnchor)
+        cursor.setPosition(end_pos, QTextCursor.KeepAnchor)
+        cursor.mergeBlockFormat(self._defaultBlockFormat)
+
+        cursor.endEditBlock()
+
+    def _pasteAsync(self, html: str):
+        if self._pasteTask is not None:
+            self.cancelPaste()
+
+        self._pasteCursor = QTextCursor(self.textCursor())
+        self._pasteRequestId += 1
+        self._pasteTask = PasteConversionTask(self._pasteRequestId, html)
+        self._pasteTask.signals.finished.connect(self._asyncPasteConverted)
+        self.viewport().setCursor(Qt.CursorShape.BusyCursor)
+        self.pasteStarted.emit()
+        QThreadPool.globalInstance().start(self._pasteTask)
+
+    def _asyncPasteConverted(self, requestId: int, md: str):
+        if self._pasteTask is None or requestId != self._pasteTask.requestId():
+            return
+        cursor = self._pasteCursor
+        self._finishAsyncPaste()
+        current = self.textCursor()
+        # the user may have moved on while the conversion ran; the paste then must not pull the view back
+        userAtPaste = current.anchor() == cursor.anchor() and current.position() == cursor.position()
+
+        self._textIsBeingPasted = True
+        self._insertMarkdown(md, cursor)
+        self._textIsBeingPasted = False
+        cursor.setPosition(cursor.selectionEnd())
+        if userAtPaste:
+            self.setTextCursor(cursor)
+        self.pasteFinished.emit(True)
+
+    def _finishAsyncPaste(self):
+        self._pasteTask = None
+        self._pasteCursor = None
+        self.viewport().setCursor(Qt.CursorShape.IBeamCursor)
 
     def _insertBlock(self, blockNumber: int, showCommands: bool = False):
         block: QTextBlock = self.document().findBlockByNumber(blockNumber)
@@ -897,20 +1154,268 @@ class EnhancedTextEdit(QTextEdit):
                 self._showCommands(self._btnPlus)
         self.ensureCursorVisible()
 
-    def _duplicateBlock(self, blockNumber: int):
-        block: QTextBlock = self.document().findBlockByNumber(blockNumber)
-        cursor = QTextCursor(block)
-        cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
-        fragment = cursor.selection()
+    def duplicateBlocks(self, first: int, last: int) -> bool:
+        if not self._blocksMovable(first, last, checkUneditable=False):
+            return False
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        start, end = self._copyBlocks(cursor, first, last, last + 1)
+        cursor.endEditBlock()
+        self._selectBlocks(start, end)
+        return True
+
+    def moveBlocks(self, first: int, last: int, target: int) -> bool:
+        if first <= target <= last + 1 or target < 0 or target > self.document().blockCount():
+            return False
+        if not self._blocksMovable(first, last):
+            return False
+
+        if target == 0:
+            if not self._blocksMovable(0, first - 1):
+                return False
+            self._moveBlocks(0, first - 1, last + 1)
+            lastBlock = self.document().findBlockByNumber(last - first)
+            start, end = 0, lastBlock.position() + lastBlock.length() - 1
+        else:
+            start, end = self._moveBlocks(first, last, target)
+        self._selectBlocks(start, end)
+        return True
+
+    def moveBlocksUp(self, first: int, last: int) -> bool:
+        return self.moveBlocks(first, last, first - 1)
+
+    def moveBlocksDown(self, first: int, last: int) -> bool:
+        return self.moveBlocks(first, last, last + 2)
+
+    def _updateBlockDropTarget(self, pos: QPoint):
+        scrollBar = self.verticalScrollBar()
+        if pos.y() < 0:
+            scrollBar.setValue(scrollBar.value() - scrollBar.singleStep())
+        elif pos.y() > self.viewport().height():
+            scrollBar.setValue(scrollBar.value() + scrollBar.singleStep())
+
+        block = self.cursorForPosition(pos).block()
+        rect = self.document().documentLayout().blockBoundingRect(block)
+        target = block.blockNumber()
+        if pos.y() + scrollBar.value() > rect.center().y():
+            target += 1
+        first, last = self._blockDragRange
+        if first <= target <= last + 1:
+            target = -1
+        if target != self._blockDropTarget:
+            self._blockDropTarget = target
+            self.viewport().update()
+
+    def _resetBlockDrag(self):
+        if self._blockDropTarget >= 0:
+            self.viewport().update()
+        if self._blockDragRange is not None:
+            self._btnBlockFormat.setDown(False)
+            self._btnPlus.setHidden(True)
+            self._btnBlockFormat.setHidden(True)
+            self._blockFormatPosition = -1
+        self._blockDragOrigin = None
+        self._blockDragRange = None
+        self._blockDropTarget = -1
+
+    def _paintBlockDropIndicator(self):
+        layout = self.document().documentLayout()
+        if self._blockDropTarget < self.document().blockCount():
+            y = layout.blockBoundingRect(self.document().findBlockByNumber(self._blockDropTarget)).top()
+        else:
+            y = layout.blockBoundingRect(self.document().lastBlock()).bottom()
+        y = int(y) - self.verticalScrollBar().value()
+        margin = int(self.document().documentMargin())
+
+        painter = QtGui.QPainter(self.viewport())
+        painter.setPen(QtGui.QPen(self._blockDropColor, 2))
+        painter.drawLine(margin, y, self.viewport().width() - margin, y)
+        painter.end()
+
+    def indentListItems(self, first: int, last: int) -> bool:
+        return self._changeListLevel(first, last, 1)
+
+    def outdentListItems(self, first: int, last: int) -> bool:
+        return self._changeListLevel(first, last, -1)
+
+    def _changeListLevel(self, first: int, last: int, delta: int) -> bool:
+        levels = self._listLevelsBefore(first)
+        # a list belongs to a single parent item, so a list seen under another parent is never reused
+        used: Set[int] = {list_.objectIndex() for list_ in levels.values()}
+        cursor = QTextCursor(self.document())
+        changed = False
+        run: Optional[List] = None
+
+        block = self.document().findBlockByNumber(first)
+        while block.isValid():
+            number = block.blockNumber()
+            list_ = block.textList()
+            if list_ is None:
+                if number > last:
+                    break
+                levels.clear()
+                block = block.next()
+                continue
+
+            indent = list_.format().indent()
+            if number > last:
+                # the following nested items may now continue or leave the lists of the changed items
+                if indent <= 1:
+                    break
+                newIndent = indent
+            else:
+                newIndent = max(indent + delta, 1)
+            for level in [level for level in levels if level > newIndent]:
+                del levels[level]
+            target = levels.get(newIndent)
+            if target is None and newIndent == indent and list_.objectIndex() not in used:
+                target = list_
+            if newIndent == indent and target is not None and target.objectIndex() == list_.objectIndex():
+                levels[indent] = list_
+                used.add(list_.objectIndex())
+                block = block.next()
+                continue
+
+            if not changed:
+                cursor.beginEditBlock()
+                changed = True
+            if target is None:
+                listFormat = list_.format()
+                listFormat.setIndent(newIndent)
+                cursor.setPosition(block.position())
+                target = cursor.createList(listFormat)
+            elif run is not None and run[0] == target and run[2] == number - 1:
+                run[2] = number
+            else:
+                self._joinList(cursor, run)
+                run = [target, number, number]
+            levels[newIndent] = target
+            used.add(target.objectIndex())
+            block = block.next()
+
+        if changed:
+            self._joinList(cursor, run)
+            cursor.endEditBlock()
+        return changed
+
+    def _listLevelsBefore(self, blockNumber: int) -> Dict[int, QTextList]:
+        levels: Dict[int, QTextList] = {}
+        maxLevel = -1
+        block = self.document().findBlockByNumber(blockNumber).previous()
+        while block.isValid() and block.textList() is not None:
+            level = block.textList().format().indent()
+            if maxLevel < 0 or level < maxLevel:
+                levels[level] = block.textList()
+                maxLevel = level
+            if level <= 1:
+                break
+            block = block.previous()
+        return levels
+
+    def _joinList(self, cursor: QTextCursor, run: Optional[List]):
+        if run is None:
+            return
+        list_, first, last = run
+        listFormat = QTextBlockFormat()
+        listFormat.setObjectIndex(list_.objectIndex())
+        self._selectBlockRange(cursor, first, last)
+        cursor.mergeBlockFormat(listFormat)
+
+    def _blockRange(self, blockNumber: int) -> Tuple[int, int]:
+        cursor = self.textCursor()
+        if cursor.hasSelection():
+            first = self.document().findBlock(cursor.selectionStart()).blockNumber()
+            last = self.document().findBlock(cursor.selectionEnd()).blockNumber()
+            if first <= blockNumber <= last:
+                return first, last
+        return blockNumber, blockNumber
+
+    def _selectedBlockRange(self) -> Tuple[int, int]:
+        return self._blockRange(self.textCursor().blockNumber())
+
+    def _blocksMovable(self, first: int, last: int, checkUneditable: bool = True) -> bool:
+        firstBlock = self.document().findBlockByNumber(first)
+        lastBlock = self.document().findBlockByNumber(last)
+        if not firstBlock.isValid() or not lastBlock.isValid() or first > last:
+            return False
+        if QTextCursor(firstBlock).currentTable() or QTextCursor(lastBlock).currentTable():
+            return False
+        return not checkUneditable or not self.__blocksUneditable(firstBlock, lastBlock)
 
+    def _moveBlocks(self, first: int, last: int, target: int) -> Tuple[int, int]:
+        cursor = QTextCursor(self.document())
         cursor.beginEditBlock()
-        self._insertBlock(blockNumber)
-        self.textCursor().insertMarkdown(fragment.toMarkdown())
-        heading = block.blockFormat().headingLevel()
-        if heading > 0:
-            self.setHeading(heading)
+        start, end = self._copyBlocks(cursor, first, last, target)
+        if target < first:
+            shift = last - first + 1
+            first, last = first + shift, last + shift
+        firstBlock = self.document().findBlockByNumber(first)
+        lastBlock = self.document().findBlockByNumber(last)
+        if lastBlock.next().isValid():
+            cursor.setPosition(firstBlock.position())
+            cursor.setPosition(lastBlock.next().position(), QTextCursor.MoveMode.KeepAnchor)
+        else:
+            cursor.setPosition(firstBlock.previous().position() + firstBlock.previous().length() - 1)
+            cursor.setPosition(lastBlock.position() + lastBlock.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        removed = cursor.selectionEnd() - cursor.selectionStart()
+        cursor.removeSelectedText()
         cursor.endEditBlock()
 
+        if target > first:
+            start, end = start - removed, end - removed
+        return start, end
+
+    def _copyBlocks(self, cursor: QTextCursor, first: int, last: int, target: int) -> Tuple[int, int]:
+        firstBlock = self.document().findBlockByNumber(first)
+        self._selectBlockRange(cursor, first, last)
+        fragment = cursor.selection()
+        lists = []
+        block = firstBlock
+        while block.isValid() and block.blockNumber() <= last:
+            lists.append(block.textList())
+            block = block.next()
+
+        previous = self.document().findBlockByNumber(target - 1)
+        position = previous.position() + previous.length() - 1
+        blockCount = self.document().blockCount()
+        cursor.setPosition(position)
+        cursor.insertFragment(fragment)
+        end = cursor.position() + 1
+        # fragments copied from the beginning of a list item may already start with a block separator
+        if self.document().blockCount() - blockCount == last - first:
+            cursor.setPosition(position)
+            cursor.insertBlock(firstBlock.blockFormat(), firstBlock.charFormat())
+        else:
+            end -= 1
+        start = position + 1
+
+        block = self.document().findBlock(start)
+        runStart = 0
+        for i, list_ in enumerate(lists):
+            if i + 1 < len(lists) and lists[i + 1] == list_:
+                continue
+            if list_ is not None:
+                runBlock = self.document().findBlockByNumber(block.blockNumber() + runStart)
+                cursor.setPosition(runBlock.position())
+                cursor.setPosition(self.document().findBlockByNumber(block.blockNumber() + i).position(),
+                                   QTextCursor.MoveMode.KeepAnchor)
+                listFormat = QTextBlockFormat()
+                listFormat.setObjectIndex(list_.objectIndex())
+                cursor.mergeBlockFormat(listFormat)
+            runStart = i + 1
+
+        return start, end
+
+    def _selectBlocks(self, start: int, end: int):
+        cursor = self.textCursor()
+        if self.document().findBlock(start) == self.document().findBlock(end):
+            cursor.setPosition(start)
+        else:
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        self.setTextCursor(cursor)
+        self.ensureCursorVisible()
+
     def _deleteBlock(self, blockNumber: int, force: bool = False):
         block: QTextBlock = self.document().findBlockByNumber(blockNumber)
         if self.__blockUneditable(block) and not force:
@@ -928,20 +1433,6 @@ class EnhancedTextEdit(QTextEdit):
             cursor.deleteChar()
         cursor.endEditBlock()
 
-    def _insertQuote(self, cursor: QTextCursor, left: str, right: str):
-        if cursor.hasSelection():
-            selected_text = cursor.selectedText()
-            cursor.insertText(left + selected_text + right)
-        elif has_character_left(cursor):
-            self.textCursor().insertText(right)
-        elif has_character_right(cursor):
-            self.textCursor().insertText(left)
-        else:
-            self.textCursor().insertText(left)
-            self.textCursor().insertText(right)
-            cursor.movePosition(QTextCursor.PreviousCharacter)
-            self.setTextCursor(cursor)
-
     def _insertRowAbove(self):
         if self._currentHoveredTableCell is None:
             return
@@ -1071,6 +1562,15 @@ class TextEditorToolbar(QFrame):
         self.btnGroupAlignment = QButtonGroup(self)
         self.btnGroupAlignment.setExclusive(True)
 
+        self._lastFormatState: Optional[TextFormatState] = None
+        self._lastFormatTextEdit: Optional[QTextEdit] = None
+        self._pendingFormatTextEdit: Optional[QTextEdit] = None
+        self._skippedFormatUpdates: int = 0
+        self._formatUpdateTimer = QTimer(self)
+        self._formatUpdateTimer.setSingleShot(True)
+        self._formatUpdateTimer.setInterval(0)
+        self._formatUpdateTimer.timeout.connect(self._flushFormatUpdate)
+
     def addTextEditorOperation(self, operationType: Type[TextEditorOperation]) -> TextEditorOperationButton:
         operation, btn = self._initOperation(operationType)
         if self._linkedTextEdit:
@@ -1111,24 +1611,60 @@ class TextEditorToolbar(QFrame):
 
     def clear(self):
         self._textEditorOperations.clear()
+        self._lastFormatState = None
         clear_layout(self)
 
     def activate(self, textEdit: QTextEdit, editor: Optional['RichTextEditor'] = None):
+        if self._linkedTextEdit is not None:
+            self._linkedTextEdit.currentCharFormatChanged.disconnect(self._invalidateFormatState)
         self._linkedTextEdit = textEdit
         self._linkedTextEditor = editor
+        self._lastFormatState = None
+        # the typing format changes without moving the cursor, e.g. when Bold is toggled with no selection
+        textEdit.currentCharFormatChanged.connect(self._invalidateFormatState)
         for btn in self._textEditorOperations.values():
             btn.op.activateOperation(textEdit, editor)
 
+    @instrumented()
     def updateFormat(self, textEdit: QTextEdit):
+        state = TextFormatState.fromTextEdit(textEdit)
+        if textEdit is self._lastFormatTextEdit and state == self._lastFormatState:
+            self._skippedFormatUpdates += 1
+            return
+        self._lastFormatState = state
+        self._lastFormatTextEdit = textEdit
+
         self.btnGroupAlignment.setExclusive(False)
         for btn in self._textEditorOperations.values():
-            btn.op.updateFormat(textEdit)
+            btn.op.updateFormatState(textEdit, state)
         self.btnGroupAlignment.setExclusive(True)
 
+    def scheduleFormatUpdate(self, textEdit: QTextEdit):
+        if self._formatUpdateTimer.isActive() and self._pendingFormatTextEdit is textEdit:
+            self._skippedFormatUpdates += 1
+            return
+        self._pendingFormatTextEdit = textEdit
+        self._formatUpdateTimer.start()
+
+    def skippedFormatUpdates(self) -> int:
+        return self._skippedFormatUpdates
+
+    def _invalidateFormatState(self):
+        self._lastFormatState = None
+
+    def _flushFormatUpdate(self):
+        textEdit = self._pendingFormatTextEdit
+        self._pendingFormatTextEdit = None
+        if textEdit is not None:
+            self.updateFormat(textEdit)
+
     def _initOperation(self, operationType: Type[TextEditorOperation]):
         operation = operationType()
         btn = TextEditorOperationButton(operation)
         self._textEditorOperations[operationType] = btn
+        self._lastFormatState = None
+        if isinstance(operation, (TextEditorOperationAction, TextEditorOperationWidgetAction, TextEditorOperationMenu)):
+            operation.triggered.connect(self._invalidateFormatState)
 
         if isinstance(operation, AlignmentOperation):
             self.btnGroupAlignment.addButton(btn)
@@ -1210,6 +1746,9 @@ class TextFindWidget(QFrame):
         self.wdgFind.layout().addWidget(self._icon)
         self.wdgFind.layout().addWidget(self._lineText)
         self.wdgFind.layout().addWidget(self._btnFindNext)
+        self._lblMatches = QLabel()
+        decr_font(self._lblMatches)
+        self.wdgFind.layout().addWidget(self._lblMatches)
         self.wdgFind.layout().addWidget(spacer())
         self.wdgFind.layout().addWidget(self._btnClose, alignment=Qt.AlignmentFlag.AlignTop)
 
@@ -1234,6 +1773,9 @@ class TextFindWidget(QFrame):
         self.wdgReplace.layout().addWidget(self._lineTextReplace)
         self.wdgReplace.layout().addWidget(self._btnReplace)
         self.wdgReplace.layout().addWidget(self._btnReplaceAll)
+        self._lblReplaced = QLabel()
+        decr_font(self._lblReplaced)
+        self.wdgReplace.layout().addWidget(self._lblReplaced)
         self.wdgReplace.layout().addWidget(spacer())
 
         self._btnActivateReplace = QPushButton('Replace...')
@@ -1249,6 +1791,11 @@ class TextFindWidget(QFrame):
         self.layout().addWidget(self.wdgReplace)
         self.layout().addWidget(self._btnActivateReplace, alignment=Qt.AlignmentFlag.AlignLeft)
 
+        self._findTimer = QTimer(self)
+        self._findTimer.setSingleShot(True)
+        self._findTimer.setInterval(FIND_DEBOUNCE_DELAY)
+        self._findTimer.timeout.connect(self._emitFind)
+
         self._lineText.textChanged.connect(self._termChanged)
         self._btnReplace.clicked.connect(self._replace)
         self._btnReplaceAll.clicked.connect(self._replaceAll)
@@ -1256,10 +1803,33 @@ class TextFindWidget(QFrame):
 
     def keyPressEvent(self, event: QKeyEvent):
         if event.key() == Qt.Key_Return and self._lineText.text():
-            self.findNext.emit(self._lineText.text())
+            if not self.flushFind():
+                self.findNext.emit(self._lineText.text())
         elif event.key() == Qt.Key_Escape:
             self.closed.emit()
 
+    def hideEvent(self, event: QHideEvent):
+        self._findTimer.stop()
+        super().hideEvent(event)
+
+    def setTerm(self, term: str):
+        self._findTimer.stop()
+        self._lineText.blockSignals(True)
+        self._lineText.setText(term)
+        self._lineText.blockSignals(False)
+        self._lblReplaced.clear()
+        self._updateButtons(term)
+
+    def setFindDelay(self, delay: int):
+        self._findTimer.setInterval(delay)
+
+    def flushFind(self) -> bool:
+        if self._findTimer.isActive():
+            self._findTimer.stop()
+            self._emitFind()
+            return True
+        return False
+
     def lineEditSearch(self) -> QLineEdit:
         return self._lineText
 
@@ -1286,6 +1856,20 @@ class TextFindWidget(QFrame):
         qtanim.glow(self._lineText, duration=300)
         qtanim.glow(self._icon, duration=300)
 
+    def clearMatchCount(self):
+        self._lblMatches.clear()
+
+    def setMatchCount(self, current: int, total: int):
+        if total == 0:
+            self._lblMatches.setText('No results')
+        elif current > 0:
+            self._lblMatches.setText(f'{current} of {total}')
+        else:
+            self._lblMatches.setText(f'{total} found')
+
+    def showReplacedCount(self, count: int):
+        self._lblReplaced.setText(f'{count} replaced')
+
     def showFindOver(self):
         qtanim.glow(self._lineText, color=QColor('#ffb703'))
         qtanim.glow(self._icon, color=QColor('#ffb703'))
@@ -1300,18 +1884,32 @@ class TextFindWidget(QFrame):
         self._btnActivateReplace.setVisible(True)
 
     def _termChanged(self, term: str):
+        self._lblReplaced.clear()
+        self._updateButtons(term)
+        if term:
+            self._findTimer.start()
+        else:
+            self._findTimer.stop()
+            self.find.emit(term)
+
+    def _updateButtons(self, term: str):
         self._btnFindNext.setEnabled(len(term) > 0)
         self._btnReplace.setEnabled(len(term) > 0)
         self._btnReplaceAll.setEnabled(len(term) > 0)
-        self.find.emit(term)
+
+    def _emitFind(self):
+        self.find.emit(self._lineText.text())
 
     def _findNext(self):
-        self.findNext.emit(self._lineText.text())
+        if not self.flushFind():
+            self.findNext.emit(self._lineText.text())
 
     def _replace(self):
+        self.flushFind()
         self.replace.emit(self._lineTextReplace.text())
 
     def _replaceAll(self):
+        self.flushFind()
         self.replaceAll.emit(self._lineTextReplace.text())
 
 
@@ -1331,20 +1929,39 @@ class RichTextEditor(QWidget):
         self._wdgFind.setHidden(True)
         self._findCursor: Optional[QTextCursor] = None
         self._findTerm: str = ''
+        self._findMatches: List[Tuple[int, int]] = []
+        self._findSpans: List[Tuple[int, int]] = []
+        self._findText: Optional[str] = None
+        self._searchTask: Optional[SearchTask] = None
+        self._searchRequestId: int = 0
+        self._searchAsyncThreshold: int = SEARCH_ASYNC_THRESHOLD
+        self._matchFormat = QTextCharFormat()
+        self._matchFormat.setBackground(QColor('#ffe066'))
+        self._matchFormat.setProperty(FIND_MATCH_PROPERTY, True)
+        self._findRefreshTimer = QTimer(self)
+        self._findRefreshTimer.setSingleShot(True)
+        self._findRefreshTimer.setInterval(100)
+        self._findRefreshTimer.timeout.connect(self._scanMatches)
+        self._relayoutTimer = CoalescingTimer(RELAYOUT_DELAY, self)
+        self._relayoutTimer.triggered.connect(self._resize)
 
         self._textedit = self._initTextEdit()
         self._wdgFind.find.connect(self._find)
         self._wdgFind.findNext.connect(self._findNext)
         self._wdgFind.replace.connect(self._replace)
         self._wdgFind.replaceAll.connect(self._replaceAll)
-        self._wdgFind.closed.connect(lambda: self._wdgFind.setHidden(True))
+        self._wdgFind.closed.connect(self._closeFind)
 
         self.layout().addWidget(self._toolbar)
         self.layout().addWidget(self._wdgFind)
         self.layout().addWidget(self._textedit)
 
         self._toolbar.activate(self._textedit, self)
-        self._textedit.cursorPositionChanged.connect(lambda: self._toolbar.updateFormat(self._textedit))
+        self._textedit.cursorPositionChanged.connect(lambda: self._toolbar.scheduleFormatUpdate(self._textedit))
+        self._textedit.blockFormatsChanged.connect(lambda: self._toolbar.scheduleFormatUpdate(self._textedit))
+        self._textedit.document().contentsChange.connect(self._findDocumentChanged)
+        self._textedit.verticalScrollBar().valueChanged.connect(self._updateMatchHighlights)
+        self._textedit.zoomChanged.connect(self._zoomChanged)
 
     @property
     def textEdit(self):
@@ -1358,7 +1975,7 @@ class RichTextEditor(QWidget):
             self._wdgFind.setVisible(True)
             self._wdgFind.activate(replace=True)
         elif event.key() == Qt.Key_Escape and self._wdgFind.isVisible():
-            self._wdgFind.setHidden(True)
+            self._closeFind()
         else:
             super(RichTextEditor, self).keyPressEvent(event)
 
@@ -1386,18 +2003,57 @@ class RichTextEditor(QWidget):
 
     def setCharacterWidth(self, count: int = 80):
         self._characterWidth = count
-        metrics = QtGui.QFontMetricsF(self._textedit.font())
-        self._maxContentWidth = metrics.boundingRect('M' * self._characterWidth).width()
-        self._resize()
+        self._maxContentWidth = character_width(self._textedit.font(), count)
+        self._relayoutTimer.trigger()
 
     def setWidthPercentage(self, percentage: int):
         if 0 < percentage <= 100:
             self._widthPercentage = percentage
-            self._resize()
+            self._relayoutTimer.trigger()
 
     def resizeEvent(self, a0: QtGui.QResizeEvent) -> None:
         if self._widthPercentage > 0 or self._maxContentWidth > 0:
-            self._resize()
+            self._relayoutTimer.trigger()
+        if self._findMatches:
+            self._updateMatchHighlights()
+
+    def findMatches(self) -> List[Tuple[int, int]]:
+        return list(self._findMatches)
+
+    def openFindMatch(self, term: str, position: int, length: int):
+        self._wdgFind.setVisible(True)
+        self._wdgFind.setTerm(term)
+        self._findTerm = term
+        self._findCursor = None
+        self._scanMatches()
+
+        match = QTextCursor(self._textedit.document())
+        match.setPosition(position)
+        match.setPosition(position + length, QTextCursor.MoveMode.KeepAnchor)
+        self._selectMatch(match)
+        self._textedit.setFocus()
+
+    def findPhrase(self, phrase: str, index: int = 0) -> int:
+        occurrences = phrase_occurrences(self._textedit.document(), phrase)
+        if not occurrences:
+            return 0
+        start, end = occurrences[index % len(occurrences)]
+        match = QTextCursor(self._textedit.document())
+        match.setPosition(start)
+        match.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        self.openFindMatch(match.selectedText(), start, end - start)
+        return len(occurrences)
+
+    def setSearchAsyncThreshold(self, size: int):
+        self._searchAsyncThreshold = size
+
+    def flushRelayout(self):
+        self._textedit.flushZoom()
+        self._relayoutTimer.flush()
+
+    def _zoomChanged(self):
+        if self._characterWidth:
+            self.setCharacterWidth(self._characterWidth)
 
     def _resize(self):
         if 0 < self._maxContentWidth < self.width():
@@ -1419,17 +2075,14 @@ class RichTextEditor(QWidget):
         return EnhancedTextEdit(self)
 
     def _find(self, text: str):
+        previousTerm = self._findTerm
         self._findTerm = text
-        if not text:
-            self._findCursor = None
-            return
-        match: QTextCursor = self._textedit.document().find(text)
-        if match.isNull():
-            self._wdgFind.showZeroFind()
+        self._findCursor = None
+        if previousTerm and text.startswith(previousTerm) and self._searchTask is None \
+                and self._findText is not None:
+            self._setMatches(refine_matches(self._findText, self._findSpans, text), select=True)
         else:
-            self._findCursor = match
-            self._textedit.setTextCursor(self._findCursor)
-            self._textedit.ensureCursorVisible()
+            self._scanMatches(select=True)
 
     def _findNext(self, text: str):
         if self._findCursor is None:
@@ -1444,15 +2097,139 @@ class RichTextEditor(QWidget):
                 self._wdgFind.showFindOver()
                 self._findCursor = QTextCursor(self._textedit.document())
         else:
-            self._findCursor = match
-            self._textedit.setTextCursor(self._findCursor)
-            self._textedit.ensureCursorVisible()
+            self._selectMatch(match)
+
+    def _selectMatch(self, match: QTextCursor):
+        self._findCursor = match
+        self._textedit.setTextCursor(self._findCursor)
+        self._textedit.ensureCursorVisible()
+        self._updateMatchCount()
+
+    def _scanMatches(self, select: bool = False):
+        if self._searchTask is not None:
+            self._searchTask.cancel()
+            self._searchTask = None
+        if not self._findTerm:
+            self._findText = None
+            self._setMatches([], select)
+            return
+
+        text = self._textedit.document().toRawText()
+        self._findText = text
+        if len(text) < self._searchAsyncThreshold:
+            self._setMatches(find_all(text, self._findTerm), select)
+            return
+
+        self._searchRequestId += 1
+        self._searchTask = SearchTask(self._searchRequestId, text, self._findTerm)
+        self._searchTask.signals.finished.connect(partial(self._searchFinished, select))
+        QThreadPool.globalInstance().start(self._searchTask)
+
+    def _searchFinished(self, select: bool, requestId: int, matches: List[Tuple[int, int]]):
+        if self._searchTask is None or requestId != self._searchTask.requestId():
+            return
+        self._searchTask = None
+        if self._findText is None:
+            self._scanMatches(select)
+            return
+        self._setMatches(matches, select)
+
+    def _setMatches(self, matches: List[Tuple[int, int]], select: bool):
+        self._findSpans = matches
+        self._findMatches = utf16_spans(self._findText, matches) if matches else []
+        if select and matches:
+            start, end = self._findMatches[0]
+            match = QTextCursor(self._textedit.document())
+            match.setPosition(start)
+            match.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            self._selectMatch(match)
+        else:
+            if select and self._findTerm:
+                self._wdgFind.showZeroFind()
+            self._updateMatchCount()
+        self._updateMatchHighlights()
+
+    def _updateMatchCount(self):
+        if not self._findTerm:
+            self._wdgFind.clearMatchCount()
+            return
+        current = 0
+        if self._findCursor is not None and self._findCursor.hasSelection():
+            i = bisect_left(self._findMatches, (self._findCursor.selectionStart(), self._findCursor.selectionEnd()))
+            if i < len(self._findMatches) and self._findMatches[i][0] == self._findCursor.selectionStart():
+                current = i + 1
+        self._wdgFind.setMatchCount(current, len(self._findMatches))
+
+    def _updateMatchHighlights(self):
+        current = self._textedit.extraSelections()
+        selections = [selection for selection in current if not selection.format.boolProperty(FIND_MATCH_PROPERTY)]
+        if not self._findMatches:
+            if len(selections) != len(current):
+                self._textedit.setExtraSelections(selections)
+            return
+
+        viewport = self._textedit.viewport()
+        first = self._textedit.cursorForPosition(QPoint(0, 0)).block().position()
+        lastBlock = self._textedit.cursorForPosition(QPoint(viewport.width(), viewport.height())).block()
+        last = lastBlock.position() + lastBlock.length()
+
+        doc = self._textedit.document()
+        for start, end in self._findMatches[bisect_left(self._findMatches, (first, first)):]:
+            if start > last:
+                break
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(doc)
+            selection.cursor.setPosition(start)
+            selection.cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            selection.format = self._matchFormat
+            selections.append(selection)
+        self._textedit.setExtraSelections(selections)
+
+    def _findDocumentChanged(self, position: int, charsRemoved: int, charsAdded: int):
+        # the revision is not bumped when undo/redo is disabled, so the scanned text is dropped on every change
+        self._findText = None
+        if self._findTerm and self._wdgFind.isVisible():
+            self._findRefreshTimer.start()
+
+    def _closeFind(self):
+        self._wdgFind.setHidden(True)
+        self._findRefreshTimer.stop()
+        if self._searchTask is not None:
+            self._searchTask.cancel()
+            self._searchTask = None
+        self._findTerm = ''
+        self._findMatches = []
+        self._findSpans = []
+        self._findText = None
+        self._updateMatchHighlights()
 
     def _replace(self, replacedWith: str):
         if self._findCursor and self._findCursor.selectedText():
             self._findCursor.insertText(replacedWith)
             self._findNext(self._findTerm)
 
+    def replaceAll(self, term: str, replacedWith: str) -> int:
+        doc = self._textedit.document()
+        matches = find_all_in_document(doc, term)
+        if not matches:
+            return 0
+
+        cursor = QTextCursor(doc)
+        cursor.beginEditBlock()
+        for start, end in reversed(matches):
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(replacedWith)
+        cursor.endEditBlock()
+
+        self._findCursor = None
+        return len(matches)
+
     def _replaceAll(self, replacedWith: str):
-        while self._findCursor and self._findCursor.selectedText():
-            self._replace(replacedWith)
+        if not self._findTerm:
+            return
+        count = self.replaceAll(self._findTerm, replacedWith)
+        if count:
+            self._wdgFind.showReplacedCount(count)
+        else:
+            self._wdgFind.showZeroFind()
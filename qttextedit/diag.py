@@ -4,6 +4,8 @@ import qtawesome
 from qthandy import vbox, hbox, transparent
 from qtpy.QtWidgets import QDialog, QSizePolicy, QWidget, QToolButton, QLineEdit, QDialogButtonBox
 
+from qttextedit.preview import PrintPreview, PrintPreviewWidget
+
 
 @dataclass
 class LinkCreationResult:
@@ -73,3 +75,30 @@ class LinkCreationDialog(QDialog):
 
     def _nameEdited(self):
         self._nameManuallyEdited = len(self.lineName.text()) > 0
+
+
+class PrintPreviewDialog(QDialog):
+    def __init__(self, preview: PrintPreview, parent=None):
+        super(PrintPreviewDialog, self).__init__(parent)
+        self.setWindowTitle('Print preview')
+        vbox(self)
+
+        self.wdgPreview = PrintPreviewWidget()
+        self.wdgPreview.setMinimumSize(preview.pageWidth() + 60, 600)
+        self.wdgPreview.setPreview(preview)
+
+        self._btnBox = QDialogButtonBox()
+        self._btnBox.setStandardButtons(QDialogButtonBox.Cancel)
+        self.btnPrint = self._btnBox.addButton('Print', QDialogButtonBox.AcceptRole)
+        self.btnPrint.setIcon(qtawesome.icon('mdi.printer'))
+        self.btnCancel = self._btnBox.button(QDialogButtonBox.Cancel)
+        self.btnPrint.clicked.connect(lambda: self.accept())
+        self.btnCancel.clicked.connect(lambda: self.reject())
+
+        self.layout().addWidget(self.wdgPreview)
+        self.layout().addWidget(self._btnBox)
+
+    def display(self) -> bool:
+        result = self.exec()
+        self.wdgPreview.setPreview(None)
+        return result == QDialog.Accepted
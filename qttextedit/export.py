@@ -0,0 +1,128 @@
+import os
+from functools import partial
+from typing import Tuple, Callable, Optional
+
+from qtpy.QtCore import QObject, QRunnable, Signal, QRectF, QPointF, QThread
+from qtpy.QtGui import QTextDocument, QPdfWriter, QPainter, QAbstractTextDocumentLayout, QFontMetrics, QPaintDevice, \
+    QGuiApplication, QFont, QFontMetricsF
+
+PDF_EXPORT_RESOLUTION = 1200
+
+
+def default_dpi() -> float:
+    screen = QGuiApplication.primaryScreen()
+    return screen.logicalDotsPerInchY() if screen is not None else 96
+
+
+def prepare_pages(document: QTextDocument, device: QPaintDevice) -> Tuple[QRectF, QPointF]:
+    document.documentLayout().setPaintDevice(device)
+    # the layout scales format lengths from screen to device resolution, like QTextDocument.print
+    dpi = default_dpi()
+    dpiScale = device.logicalDpiY() / dpi
+    margin = int((2 / 2.54) * dpi)
+    frameFormat = document.rootFrame().frameFormat()
+    frameFormat.setMargin(margin)
+    document.rootFrame().setFrameFormat(frameFormat)
+    body = QRectF(0, 0, device.width(), device.height())
+    document.setPageSize(body.size())
+    pageNumberPos = QPointF(body.width() - margin * dpiScale,
+                            body.height() - margin * dpiScale + QFontMetrics(document.defaultFont(), device).ascent()
+                            + 5 * dpiScale)
+    return body, pageNumberPos
+
+
+def paint_page(painter: QPainter, document: QTextDocument, body: QRectF, pageNumberPos: QPointF, page: int):
+    painter.save()
+    painter.translate(body.left(), body.top() - page * body.height())
+    view = QRectF(0, page * body.height(), body.width(), body.height())
+    context = QAbstractTextDocumentLayout.PaintContext()
+    context.clip = view
+    painter.setClipRect(view)
+    document.documentLayout().draw(painter, context)
+
+    painter.setClipping(False)
+    font = QFont(document.defaultFont())
+    if font.pointSizeF() > 0:
+        font.setPixelSize(round(font.pointSizeF() * document.documentLayout().paintDevice().logicalDpiY() / 72))
+    painter.setFont(font)
+    pageNumber = str(page + 1)
+    painter.drawText(pageNumberPos + QPointF(-QFontMetricsF(font).horizontalAdvance(pageNumber), page * body.height()),
+                     pageNumber)
+    painter.restore()
+
+
+class PdfExportSignals(QObject):
+    progress = Signal(int, int, int)
+    finished = Signal(int, str)
+    cancelled = Signal(int)
+    failed = Signal(int, str)
+
+
+class PdfExportTask(QRunnable):
+    def __init__(self, requestId: int, document: QTextDocument, filename: str, title: str = ''):
+        super(PdfExportTask, self).__init__()
+        self.signals = PdfExportSignals()
+        self._requestId = requestId
+        self._filename = filename
+        self._title = title
+        self._cancelled: bool = False
+        self._document: Optional[QTextDocument] = document.clone()
+        self._document.moveToThread(None)
+
+    def requestId(self) -> int:
+        return self._requestId
+
+    def filename(self) -> str:
+        return self._filename
+
+    def cancel(self):
+        self._cancelled = True
+
+    def isCancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        document, self._document = self._document, None
+        document.moveToThread(QThread.currentThread())
+        try:
+            outcome = self._export(document)
+        except Exception as e:
+            outcome = partial(self.signals.failed.emit, self._requestId, str(e))
+        finally:
+            # the clone is deleted in the thread that laid it out, before the GUI thread can drop this task
+            del document
+        outcome()
+
+    def _export(self, document: QTextDocument) -> Callable[[], None]:
+        if self._cancelled:
+            return partial(self.signals.cancelled.emit, self._requestId)
+
+        writer = QPdfWriter(self._filename)
+        writer.setResolution(PDF_EXPORT_RESOLUTION)
+        writer.setTitle(self._title)
+        body, pageNumberPos = prepare_pages(document, writer)
+
+        painter = QPainter()
+        if not painter.begin(writer):
+            return partial(self.signals.failed.emit, self._requestId, f'Could not write PDF file: {self._filename}')
+
+        try:
+            pages = document.pageCount()
+            for page in range(pages):
+                if self._cancelled:
+                    painter.end()
+                    self._removeFile()
+                    return partial(self.signals.cancelled.emit, self._requestId)
+                if page:
+                    writer.newPage()
+                paint_page(painter, document, body, pageNumberPos, page)
+                self.signals.progress.emit(self._requestId, page + 1, pages)
+        finally:
+            # an active painter must not outlive the writer when an error unwinds this frame
+            if painter.isActive():
+                painter.end()
+        return partial(self.signals.finished.emit, self._requestId, self._filename)
+
+    def _removeFile(self):
+        if os.path.exists(self._filename):
+            os.remove(self._filename)
@@ -0,0 +1,86 @@
+from bisect import bisect_left
+from typing import List
+
+from qtpy.QtGui import QTextDocument, QTextBlock
+
+
+class BlockStateIndex:
+    def __init__(self, document: QTextDocument, state: int):
+        self._document = document
+        self._state = state
+        self._positions: List[int] = []
+        self._active: bool = False
+
+    def isActive(self) -> bool:
+        return self._active
+
+    def setActive(self, active: bool):
+        if active == self._active:
+            return
+        self._active = active
+        if active:
+            self._document.contentsChange.connect(self._contentsChange)
+            self.rebuild()
+        else:
+            self._document.contentsChange.disconnect(self._contentsChange)
+            self._positions.clear()
+
+    def rebuild(self):
+        self._positions.clear()
+        block = self._document.begin()
+        while block.isValid():
+            if block.userState() == self._state:
+                self._positions.append(block.position())
+            block = block.next()
+
+    def positions(self) -> List[int]:
+        return list(self._positions)
+
+    def count(self) -> int:
+        return len(self._positions)
+
+    def contains(self, block: QTextBlock) -> bool:
+        position = block.position()
+        i = bisect_left(self._positions, position)
+        return i < len(self._positions) and self._positions[i] == position
+
+    def intersects(self, first: QTextBlock, last: QTextBlock) -> bool:
+        # only the endpoints are read directly; a state set directly on a block in between is seen after update() or rebuild()
+        if first.userState() == self._state or last.userState() == self._state:
+            return True
+        i = bisect_left(self._positions, first.position())
+        end = last.position()
+        while i < len(self._positions) and self._positions[i] <= end:
+            block = self._document.findBlock(self._positions[i])
+            if block.position() == self._positions[i] and block.userState() == self._state:
+                return True
+            i += 1
+        return False
+
+    def update(self, block: QTextBlock):
+        position = block.position()
+        i = bisect_left(self._positions, position)
+        indexed = i < len(self._positions) and self._positions[i] == position
+        if block.userState() == self._state:
+            if not indexed:
+                self._positions.insert(i, position)
+        elif indexed:
+            del self._positions[i]
+
+    def _contentsChange(self, position: int, charsRemoved: int, charsAdded: int):
+        start = bisect_left(self._positions, position)
+        end = bisect_left(self._positions, position + charsRemoved + 1)
+        delta = charsAdded - charsRemoved
+        shifted = [pos + delta for pos in self._positions[end:]]
+        del self._positions[start:]
+        self._positions.extend(shifted)
+
+        block = self._document.findBlock(position)
+        last = self._document.findBlock(position + charsAdded)
+        if not last.isValid():
+            last = self._document.lastBlock()
+        while block.isValid():
+            self.update(block)
+            if block == last:
+                break
+            block = block.next()
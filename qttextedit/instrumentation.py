@@ -0,0 +1,270 @@
+import json
+import logging
+import math
+from functools import wraps
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Callable
+
+HISTOGRAM_MIN_LATENCY = 1e-6
+HISTOGRAM_MAX_LATENCY = 100.0
+# neighbouring buckets differ by 5%, which bounds the error of the reported percentiles
+HISTOGRAM_BUCKET_GROWTH = 1.05
+
+logger = logging.getLogger('qttextedit.instrumentation')
+
+_LOG_GROWTH = math.log(HISTOGRAM_BUCKET_GROWTH)
+_BUCKETS = int(math.log(HISTOGRAM_MAX_LATENCY / HISTOGRAM_MIN_LATENCY) / _LOG_GROWTH) + 2
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self._buckets: List[int] = [0] * _BUCKETS
+        self._count: int = 0
+        self._total: float = 0.0
+        self._min: float = math.inf
+        self._max: float = 0.0
+
+    def record(self, elapsed: float):
+        if elapsed <= HISTOGRAM_MIN_LATENCY:
+            index = 0
+        else:
+            index = min(int(math.log(elapsed / HISTOGRAM_MIN_LATENCY) / _LOG_GROWTH) + 1, _BUCKETS - 1)
+        self._buckets[index] += 1
+        self._count += 1
+        self._total += elapsed
+        self._min = min(self._min, elapsed)
+        self._max = max(self._max, elapsed)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for i, count in enumerate(other._buckets):
+            self._buckets[i] += count
+        self._count += other._count
+        self._total += other._total
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    def count(self) -> int:
+        return self._count
+
+    def total(self) -> float:
+        return self._total
+
+    def mean(self) -> float:
+        return self._total / self._count if self._count else 0.0
+
+    def min(self) -> float:
+        return self._min if self._count else 0.0
+
+    def max(self) -> float:
+        return self._max
+
+    def percentile(self, percentile: float) -> float:
+        if not self._count:
+            return 0.0
+        rank = max(1, math.ceil(percentile / 100 * self._count))
+        seen = 0
+        for index, count in enumerate(self._buckets):
+            seen += count
+            if seen >= rank:
+                break
+        if index == 0:
+            value = HISTOGRAM_MIN_LATENCY
+        else:
+            # geometric middle of the bucket
+            value = HISTOGRAM_MIN_LATENCY * HISTOGRAM_BUCKET_GROWTH ** (index - 0.5)
+        return min(max(value, self._min), self._max)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self._count,
+            'mean': self.mean(),
+            'min': self.min(),
+            'max': self._max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class InstrumentationSink:
+    def recordSpan(self, name: str, elapsed: float):
+        pass
+
+    def recordCount(self, name: str, value: int):
+        pass
+
+    def flush(self):
+        pass
+
+
+class MemorySink(InstrumentationSink):
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, int] = {}
+
+    def recordSpan(self, name: str, elapsed: float):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self._histograms[name] = histogram
+        histogram.record(elapsed)
+
+    def recordCount(self, name: str, value: int):
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def spans(self) -> List[str]:
+        return sorted(self._histograms.keys())
+
+    def histogram(self, name: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get(name)
+
+    def counter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def counters(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+    def summary(self) -> Dict:
+        return {
+            'spans': {name: self._histograms[name].summary() for name in self.spans()},
+            'counters': dict(sorted(self._counters.items())),
+        }
+
+    def reset(self):
+        self._histograms.clear()
+        self._counters.clear()
+
+
+class LoggingSink(InstrumentationSink):
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.DEBUG, threshold: float = 0.0):
+        self._log = log or logger
+        self._level = level
+        self._threshold = threshold
+
+    def recordSpan(self, name: str, elapsed: float):
+        if elapsed >= self._threshold:
+            self._log.log(self._level, '%s: %.3f ms', name, elapsed * 1000)
+
+    def recordCount(self, name: str, value: int):
+        self._log.log(self._level, '%s: +%d', name, value)
+
+
+class JsonFileSink(MemorySink):
+    def __init__(self, path: str):
+        super(JsonFileSink, self).__init__()
+        self._path = path
+
+    def path(self) -> str:
+        return self._path
+
+    def flush(self):
+        with open(self._path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+class Span:
+    __slots__ = ('_name', '_start')
+
+    def __init__(self, name: str):
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> 'Span':
+        self._start = timer()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        record_span(self._name, timer() - self._start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_enabled: bool = False
+_sinks: List[InstrumentationSink] = []
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def add_sink(sink: InstrumentationSink):
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_sink(sink: InstrumentationSink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def sinks() -> List[InstrumentationSink]:
+    return list(_sinks)
+
+
+def flush():
+    for sink in _sinks:
+        sink.flush()
+
+
+def record_span(name: str, elapsed: float):
+    for sink in _sinks:
+        sink.recordSpan(name, elapsed)
+
+
+def count(name: str, value: int = 1):
+    if _enabled:
+        for sink in _sinks:
+            sink.recordCount(name, value)
+
+
+def span(name: str):
+    # a shared no-op context manager keeps disabled spans allocation free
+    return Span(name) if _enabled else _NULL_SPAN
+
+
+def instrumented(name: Optional[str] = None):
+    def decorator(func: Callable):
+        spanName = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_span(spanName, timer() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def counted(name: Optional[str] = None):
+    def decorator(func: Callable):
+        counterName = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _enabled:
+                count(counterName)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
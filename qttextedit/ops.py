@@ -6,15 +6,34 @@ from typing import List, Optional, Dict
 
 import qtawesome
 from qthandy import busy, vbox, line, bold, flow, margins, vspacer
-from qtpy.QtCore import Qt, QSize, Signal, QTimer
+from qtpy.QtCore import Qt, QSize, Signal, QTimer, QThreadPool
 from qtpy.QtGui import QFont, QKeySequence, QTextListFormat, QColor, QMouseEvent, QTextFrameFormat, QTextTableFormat, \
-    QTextLength, QIcon
+    QTextLength, QIcon, QTextCharFormat, QTextBlockFormat
 from qtpy.QtPrintSupport import QPrinter, QPrintDialog
 from qtpy.QtWidgets import QMenu, QToolButton, QTextEdit, QSizePolicy, QGridLayout, QWidget, QAction, QWidgetAction, \
     QFileDialog, QLabel, QSlider, QButtonGroup, QRadioButton, QTabWidget, QApplication
 
-from qttextedit.diag import LinkCreationDialog
-from qttextedit.util import button, qta_icon
+from qttextedit.diag import LinkCreationDialog, PrintPreviewDialog
+from qttextedit.export import PdfExportTask
+from qttextedit.preview import PrintPreview
+from qttextedit.util import button, qta_icon, CoalescingTimer
+
+SLIDER_SETTLE_DELAY = 150
+
+
+class TextFormatState:
+    def __init__(self, charFormat: QTextCharFormat, blockFormat: QTextBlockFormat):
+        self.charFormat = charFormat
+        self.blockFormat = blockFormat
+
+    @staticmethod
+    def fromTextEdit(textEdit: QTextEdit) -> 'TextFormatState':
+        return TextFormatState(textEdit.currentCharFormat(), textEdit.textCursor().blockFormat())
+
+    def __eq__(self, other):
+        if not isinstance(other, TextFormatState):
+            return False
+        return self.charFormat == other.charFormat and self.blockFormat == other.blockFormat
 
 
 class TextEditorOperation:
@@ -26,6 +45,9 @@ class TextEditorOperation:
     def updateFormat(self, textEdit: QTextEdit):
         pass
 
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
+        self.updateFormat(textEdit)
+
 
 class TextEditorOperationAction(QAction, TextEditorOperation):
     def __init__(self, icon: str, text: str = '', tooltip: str = '', icon_color: str = 'black', shortcut=None,
@@ -82,8 +104,8 @@ class FormatOperation(TextEditorOperationMenu):
             self.addAction(action)
         self.addSeparator()
 
-    def updateFormat(self, textEdit: QTextEdit):
-        heading = textEdit.textCursor().blockFormat().headingLevel()
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
+        heading = state.blockFormat.headingLevel()
         if heading == 0:
             icon = qta_icon('mdi.format-text')
         else:
@@ -97,7 +119,7 @@ class TextOperation(TextEditorOperationAction):
         super(TextOperation, self).__init__('mdi.format-text', 'Text', parent=parent)
 
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
-        self.triggered.connect(lambda: textEdit.setHeading(0))
+        self.triggered.connect(lambda: textEdit.convertBlocks())
 
 
 class HeadingOperation(TextEditorOperationAction):
@@ -107,7 +129,7 @@ class HeadingOperation(TextEditorOperationAction):
         super(HeadingOperation, self).__init__(f'mdi.format-header-{heading}', f'Heading {heading}', parent=parent)
 
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
-        self.triggered.connect(lambda: textEdit.setHeading(self._heading))
+        self.triggered.connect(lambda: textEdit.convertBlocks(self._heading))
 
 
 class Heading1Operation(HeadingOperation):
@@ -136,8 +158,8 @@ class BoldOperation(TextEditorOperationAction):
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(lambda x: textEdit.setFontWeight(QFont.Bold if x else QFont.Normal))
 
-    def updateFormat(self, textEdit: QTextEdit):
-        self.setChecked(textEdit.fontWeight() == QFont.Bold)
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
+        self.setChecked(state.charFormat.fontWeight() == QFont.Bold)
 
 
 class ItalicOperation(TextEditorOperationAction):
@@ -148,8 +170,8 @@ class ItalicOperation(TextEditorOperationAction):
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(lambda x: textEdit.setFontItalic(x))
 
-    def updateFormat(self, textEdit: QTextEdit):
-        self.setChecked(textEdit.fontItalic())
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
+        self.setChecked(state.charFormat.fontItalic())
 
 
 class UnderlineOperation(TextEditorOperationAction):
@@ -161,8 +183,8 @@ class UnderlineOperation(TextEditorOperationAction):
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(lambda x: textEdit.setFontUnderline(x))
 
-    def updateFormat(self, textEdit: QTextEdit):
-        self.setChecked(textEdit.fontUnderline())
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
+        self.setChecked(state.charFormat.fontUnderline())
 
 
 class StrikethroughOperation(TextEditorOperationAction):
@@ -173,8 +195,8 @@ class StrikethroughOperation(TextEditorOperationAction):
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(textEdit.setStrikethrough)
 
-    def updateFormat(self, textEdit: QTextEdit):
-        self.setChecked(textEdit.currentFont().strikeOut())
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
+        self.setChecked(state.charFormat.fontStrikeOut())
 
 
 class TextColorSelectorWidget(QWidget):
@@ -248,9 +270,9 @@ class AlignmentOperation(TextEditorOperationAction):
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(partial(self._triggered, textEdit))
 
-    def updateFormat(self, textEdit: QTextEdit):
+    def updateFormatState(self, textEdit: QTextEdit, state: TextFormatState):
         self._locked = True
-        if textEdit.alignment() & self.alignment():
+        if state.blockFormat.alignment() & self.alignment():
             self.setChecked(True)
         else:
             self.setChecked(False)
@@ -306,7 +328,7 @@ class InsertListOperation(TextEditorOperationAction):
         super(InsertListOperation, self).__init__('fa5s.list', 'Bulleted list', 'Insert list', parent=parent)
 
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
-        self.triggered.connect(lambda: textEdit.textCursor().createList(QTextListFormat.ListDisc))
+        self.triggered.connect(lambda: textEdit.convertBlocks(listStyle=QTextListFormat.ListDisc))
 
 
 class InsertNumberedListOperation(TextEditorOperationAction):
@@ -315,7 +337,7 @@ class InsertNumberedListOperation(TextEditorOperationAction):
                                                           parent=parent)
 
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
-        self.triggered.connect(lambda: textEdit.textCursor().createList(QTextListFormat.ListDecimal))
+        self.triggered.connect(lambda: textEdit.convertBlocks(listStyle=QTextListFormat.ListDecimal))
 
 
 class InsertTableOperation(TextEditorOperationAction):
@@ -425,9 +447,17 @@ class InsertLinkOperation(TextEditorOperationAction):
 
 
 class ExportPdfOperation(TextEditorOperationAction):
+    exportStarted = Signal(int, str)
+    exportProgress = Signal(int, int, int)
+    exportFinished = Signal(int, str)
+    exportCancelled = Signal(int)
+    exportFailed = Signal(int, str)
+
     def __init__(self, parent=None):
         super(ExportPdfOperation, self).__init__('mdi.file-export-outline', 'Export to PDF', parent=parent)
         self._title = 'document'
+        self._tasks: Dict[int, PdfExportTask] = {}
+        self._lastRequestId: int = 0
 
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(lambda: self._exportPdf(textEdit))
@@ -438,36 +468,110 @@ class ExportPdfOperation(TextEditorOperationAction):
     def setTitle(self, value: str):
         self._title = value
 
+    def exportPdf(self, textEdit: QTextEdit, filename: str) -> int:
+        self._lastRequestId += 1
+        task = PdfExportTask(self._lastRequestId, textEdit.document(), filename, self._title)
+        task.signals.progress.connect(self._exportProgress)
+        task.signals.finished.connect(self._exportFinished)
+        task.signals.cancelled.connect(self._exportCancelled)
+        task.signals.failed.connect(self._exportFailed)
+        self._tasks[task.requestId()] = task
+        self.exportStarted.emit(task.requestId(), filename)
+        QThreadPool.globalInstance().start(task)
+        return task.requestId()
+
+    def isExporting(self) -> bool:
+        return len(self._tasks) > 0
+
+    def activeExports(self) -> List[int]:
+        return list(self._tasks.keys())
+
+    def cancelExport(self, requestId: int):
+        task = self._tasks.get(requestId)
+        if task is not None:
+            task.cancel()
+
+    def cancelAllExports(self):
+        for task in self._tasks.values():
+            task.cancel()
+
     def _exportPdf(self, textEdit: QTextEdit):
         filename, _ = QFileDialog.getSaveFileName(textEdit, 'Export PDF', f'{self._title}.pdf',
                                                   'PDF files (*.pdf);;All Files()')
         if filename:
-            self._print(filename, textEdit)
+            self.exportPdf(textEdit, filename)
 
-    @busy
-    def _print(self, filename: str, textEdit: QTextEdit):
-        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
-        printer.setOutputFileName(filename)
-        printer.setDocName(self._title)
-        textEdit.print(printer)
+    def _exportProgress(self, requestId: int, page: int, pages: int):
+        if requestId in self._tasks:
+            self.setToolTip(f'Exporting to PDF ({page}/{pages})')
+            self.exportProgress.emit(requestId, page, pages)
+
+    def _exportFinished(self, requestId: int, filename: str):
+        self._removeTask(requestId)
+        self.exportFinished.emit(requestId, filename)
+
+    def _exportCancelled(self, requestId: int):
+        self._removeTask(requestId)
+        self.exportCancelled.emit(requestId)
+
+    def _exportFailed(self, requestId: int, error: str):
+        self._removeTask(requestId)
+        self.exportFailed.emit(requestId, error)
+
+    def _removeTask(self, requestId: int):
+        self._tasks.pop(requestId, None)
+        if not self._tasks:
+            self.setToolTip(self.text())
 
 
 class PrintOperation(TextEditorOperationAction):
     def __init__(self, parent=None):
         super(PrintOperation, self).__init__('mdi.printer', 'Print', parent=parent)
+        self._printer: Optional[QPrinter] = None
+        self._preview: Optional[PrintPreview] = None
+        self._previewEnabled: bool = True
 
     def activateOperation(self, textEdit: QTextEdit, editor: Optional[QWidget] = None):
         self.triggered.connect(lambda: self._print(textEdit))
 
+    def isPreviewEnabled(self) -> bool:
+        return self._previewEnabled
+
+    def setPreviewEnabled(self, enabled: bool):
+        self._previewEnabled = enabled
+
+    def preview(self, textEdit: QTextEdit) -> PrintPreview:
+        if self._preview is None or self._preview.document() is not textEdit.document():
+            if self._preview is not None:
+                self._preview.deleteLater()
+            self._preview = PrintPreview(textEdit.document(), self)
+        printer = self._printerFor()
+        self._preview.setPageLayout(printer.pageLayout(), printer.resolution())
+        return self._preview
+
     @busy
     def _getPrinter(self) -> QPrinter:
         return QPrinter(QPrinter.PrinterMode.HighResolution)
 
+    def _printerFor(self) -> QPrinter:
+        if self._printer is None:
+            self._printer = self._getPrinter()
+        return self._printer
+
     def _print(self, textEdit: QTextEdit):
-        printer = self._getPrinter()
+        if self._preview is not None and self._preview.isPrinting():
+            return
+        if self._previewEnabled:
+            dialog = PrintPreviewDialog(self.preview(textEdit), textEdit)
+            if not dialog.display():
+                return
+
+        printer = self._printerFor()
         dialog = QPrintDialog(printer, textEdit)
         if dialog.exec_() == QPrintDialog.Accepted:
+            # the previewed pages are printed without paginating again, unless the dialog changed the page setup
+            if self._previewEnabled and self._preview.print(printer):
+                return
             textEdit.print(printer)
 
 
@@ -517,6 +621,10 @@ class SliderSectionWidget(AbstractSettingsSectionWidget):
         self._slider.setMaximum(max_)
         self.layout().addWidget(self._slider)
 
+        self._settleTimer = CoalescingTimer(SLIDER_SETTLE_DELAY, self)
+        self._settleTimer.triggered.connect(lambda: self._valueChanged(self._slider.value()))
+        self._slider.sliderReleased.connect(self._settleTimer.flush)
+
     def value(self) -> int:
         return self._slider.value()
 
@@ -529,6 +637,18 @@ class SliderSectionWidget(AbstractSettingsSectionWidget):
 
     def _deactivate(self):
         self._slider.valueChanged.disconnect()
+        self._settleTimer.flush()
+
+    def _sliderValueChanged(self, value: int):
+        if self._slider.isSliderDown():
+            self._settleTimer.trigger()
+        else:
+            self._settleTimer.cancel()
+            self._valueChanged(value)
+
+    @abstractmethod
+    def _valueChanged(self, value: int):
+        pass
 
 
 class PageWidthSectionSettingWidget(SliderSectionWidget):
@@ -538,7 +658,7 @@ class PageWidthSectionSettingWidget(SliderSectionWidget):
     def _activate(self):
         w = self._editor.widthPercentage()
         self._slider.setValue(w if w else 100)
-        self._slider.valueChanged.connect(self._valueChanged)
+        self._slider.valueChanged.connect(self._sliderValueChanged)
 
     def _valueChanged(self, value: int):
         if self._editor is None:
@@ -554,7 +674,7 @@ class TextWidthSectionSettingWidget(SliderSectionWidget):
 
     def _activate(self):
         self._slider.setValue(self._editor.characterWidth())
-        self._slider.valueChanged.connect(self._valueChanged)
+        self._slider.valueChanged.connect(self._sliderValueChanged)
 
     def _valueChanged(self, value: int):
         if self._editor is None:
@@ -667,7 +787,7 @@ class FontSizeSectionSettingWidget(SliderSectionWidget):
     def _activate(self):
         size = self._editor.textEdit.font().pointSize()
         self._slider.setValue(size)
-        self._slider.valueChanged.connect(self._valueChanged)
+        self._slider.valueChanged.connect(self._sliderValueChanged)
 
     def _valueChanged(self, value: int):
         if self._editor is None:
@@ -0,0 +1,233 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Dict, Any
+
+from qtpy.QtCore import QObject, Signal, Qt, QAbstractItemModel, QModelIndex
+from qtpy.QtGui import QTextDocument, QTextBlock
+
+
+@dataclass
+class OutlineHeading:
+    level: int
+    title: str
+    blockNumber: int
+    position: int
+
+
+class HeadingIndex(QObject):
+    headingsChanged = Signal()
+    headingChanged = Signal(int)
+
+    def __init__(self, document: QTextDocument, parent=None):
+        super(HeadingIndex, self).__init__(parent)
+        self._document = document
+        # headings are keyed by block number, which only moves when blocks are inserted or removed
+        self._numbers: List[int] = []
+        self._levels: List[int] = []
+        self._titles: List[str] = []
+        self._blockCount: int = 0
+        self._active: bool = False
+
+    def document(self) -> QTextDocument:
+        return self._document
+
+    def isActive(self) -> bool:
+        return self._active
+
+    def setActive(self, active: bool):
+        if active == self._active:
+            return
+        self._active = active
+        if active:
+            self._document.documentLayout()  # contentsChange is only emitted once the document has a layout
+            self._document.contentsChange.connect(self._contentsChange)
+            self.rebuild()
+        else:
+            self._document.contentsChange.disconnect(self._contentsChange)
+            self._numbers.clear()
+            self._levels.clear()
+            self._titles.clear()
+
+    def rebuild(self):
+        self._numbers.clear()
+        self._levels.clear()
+        self._titles.clear()
+        self._blockCount = self._document.blockCount()
+        block = self._document.begin()
+        while block.isValid():
+            level = block.blockFormat().headingLevel()
+            if level > 0:
+                self._numbers.append(block.blockNumber())
+                self._levels.append(level)
+                self._titles.append(block.text())
+            block = block.next()
+        self.headingsChanged.emit()
+
+    def count(self) -> int:
+        return len(self._numbers)
+
+    def heading(self, index: int) -> OutlineHeading:
+        block = self.block(index)
+        return OutlineHeading(self._levels[index], self._titles[index], self._numbers[index], block.position())
+
+    def headings(self) -> List[OutlineHeading]:
+        return [self.heading(i) for i in range(len(self._numbers))]
+
+    def level(self, index: int) -> int:
+        return self._levels[index]
+
+    def title(self, index: int) -> str:
+        return self._titles[index]
+
+    def blockNumber(self, index: int) -> int:
+        return self._numbers[index]
+
+    def block(self, index: int) -> QTextBlock:
+        return self._document.findBlockByNumber(self._numbers[index])
+
+    def indexOfBlock(self, blockNumber: int) -> int:
+        return bisect_right(self._numbers, blockNumber) - 1
+
+    def headingAt(self, position: int) -> int:
+        block = self._document.findBlock(position)
+        if not block.isValid():
+            block = self._document.lastBlock()
+        return self.indexOfBlock(block.blockNumber())
+
+    def nextHeading(self, blockNumber: int) -> int:
+        i = bisect_right(self._numbers, blockNumber)
+        return i if i < len(self._numbers) else -1
+
+    def previousHeading(self, blockNumber: int) -> int:
+        return bisect_left(self._numbers, blockNumber) - 1
+
+    def _contentsChange(self, position: int, charsRemoved: int, charsAdded: int):
+        first = self._document.findBlock(position)
+        last = self._document.findBlock(position + charsAdded)
+        if not first.isValid():
+            first = self._document.lastBlock()
+        if not last.isValid():
+            last = self._document.lastBlock()
+
+        blockCount = self._document.blockCount()
+        delta = blockCount - self._blockCount
+        start = first.blockNumber()
+        end = last.blockNumber()
+        if end - delta < start:
+            self.rebuild()
+            return
+        self._blockCount = blockCount
+
+        numbers: List[int] = []
+        levels: List[int] = []
+        titles: List[str] = []
+        block = first
+        while block.isValid():
+            level = block.blockFormat().headingLevel()
+            if level > 0:
+                numbers.append(block.blockNumber())
+                levels.append(level)
+                titles.append(block.text())
+            if block == last:
+                break
+            block = block.next()
+
+        i = bisect_left(self._numbers, start)
+        j = bisect_right(self._numbers, end - delta)
+        if delta:
+            self._numbers[j:] = [number + delta for number in self._numbers[j:]]
+        structural = self._levels[i:j] != levels
+        changed = [i + k for k, title in enumerate(titles) if not structural and self._titles[i + k] != title]
+        self._numbers[i:j] = numbers
+        self._levels[i:j] = levels
+        self._titles[i:j] = titles
+
+        if structural:
+            self.headingsChanged.emit()
+        for index in changed:
+            self.headingChanged.emit(index)
+
+
+class HeadingOutlineModel(QAbstractItemModel):
+    LevelRole = Qt.ItemDataRole.UserRole + 1
+    BlockNumberRole = Qt.ItemDataRole.UserRole + 2
+    PositionRole = Qt.ItemDataRole.UserRole + 3
+
+    def __init__(self, index: HeadingIndex, parent=None):
+        super(HeadingOutlineModel, self).__init__(parent)
+        self._index = index
+        self._parents: List[int] = []
+        self._rows: List[int] = []
+        self._children: Dict[int, List[int]] = {}
+        self._buildTree()
+        self._index.headingsChanged.connect(self._headingsChanged)
+        self._index.headingChanged.connect(self._headingChanged)
+
+    def headingIndex(self) -> HeadingIndex:
+        return self._index
+
+    def heading(self, index: QModelIndex) -> int:
+        return index.internalId() if index.isValid() else -1
+
+    def modelIndex(self, heading: int) -> QModelIndex:
+        if 0 <= heading < len(self._rows):
+            return self.createIndex(self._rows[heading], 0, heading)
+        return QModelIndex()
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        children = self._children.get(self.heading(parent), [])
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self.modelIndex(self._parents[index.internalId()])
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self._children.get(self.heading(parent), []))
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        heading = index.internalId()
+        if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.ToolTipRole:
+            return self._index.title(heading)
+        if role == self.LevelRole:
+            return self._index.level(heading)
+        if role == self.BlockNumberRole:
+            return self._index.blockNumber(heading)
+        if role == self.PositionRole:
+            return self._index.block(heading).position()
+        return None
+
+    def _buildTree(self):
+        self._parents.clear()
+        self._rows.clear()
+        self._children = {-1: []}
+        stack: List[int] = []
+        for heading in range(self._index.count()):
+            level = self._index.level(heading)
+            while stack and self._index.level(stack[-1]) >= level:
+                stack.pop()
+            parent = stack[-1] if stack else -1
+            siblings = self._children.setdefault(parent, [])
+            self._parents.append(parent)
+            self._rows.append(len(siblings))
+            siblings.append(heading)
+            stack.append(heading)
+
+    def _headingsChanged(self):
+        self.beginResetModel()
+        self._buildTree()
+        self.endResetModel()
+
+    def _headingChanged(self, heading: int):
+        index = self.modelIndex(heading)
+        self.dataChanged.emit(index, index)
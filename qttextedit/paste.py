@@ -0,0 +1,69 @@
+import re
+
+from qtpy.QtCore import QObject, QRunnable, Signal
+from qtpy.QtGui import QTextDocument
+
+from qttextedit.util import FONT_DECLARATION_PATTERN
+
+ASYNC_PASTE_THRESHOLD = 100_000
+
+_HTML_CLEANUP_PATTERN = re.compile(
+    r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>|' + FONT_DECLARATION_PATTERN,
+    re.IGNORECASE | re.DOTALL)
+_MARKDOWN_LITERAL_LINE_PATTERN = re.compile(r'^[ \t]*(\*\*\*|###)[ \t]*$', re.MULTILINE)
+
+
+def sanitize_html(html: str) -> str:
+    return _HTML_CLEANUP_PATTERN.sub('', html)
+
+
+def preprocess_markdown(md: str) -> str:
+    if '\n' not in md:
+        return md
+    return _MARKDOWN_LITERAL_LINE_PATTERN.sub(r'<span>\1</span>', md)
+
+
+def document_to_markdown(doc: QTextDocument) -> str:
+    return preprocess_markdown(doc.toMarkdown().rstrip('\n'))
+
+
+def html_to_markdown(html: str) -> str:
+    doc = QTextDocument()
+    doc.setHtml(sanitize_html(html))
+    return document_to_markdown(doc)
+
+
+class PasteConversionSignals(QObject):
+    finished = Signal(int, str)
+
+
+class PasteConversionTask(QRunnable):
+    def __init__(self, requestId: int, html: str):
+        super(PasteConversionTask, self).__init__()
+        self.signals = PasteConversionSignals()
+        self._requestId = requestId
+        self._html = html
+        self._cancelled: bool = False
+
+    def requestId(self) -> int:
+        return self._requestId
+
+    def cancel(self):
+        self._cancelled = True
+
+    def isCancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        html = sanitize_html(self._html)
+        self._html = ''
+        if self._cancelled:
+            return
+        doc = QTextDocument()
+        doc.setHtml(html)
+        if self._cancelled:
+            return
+        md = document_to_markdown(doc)
+        if self._cancelled:
+            return
+        self.signals.finished.emit(self._requestId, md)
@@ -0,0 +1,538 @@
+from collections import OrderedDict
+from functools import partial
+from typing import List, Optional, Dict, Tuple, Iterable, Callable
+
+from qthandy import vbox
+from qtpy.QtCore import QObject, QRunnable, Signal, QThread, QThreadPool, QBuffer, QRectF, QPointF, QSizeF, QTimer, Qt, \
+    QMarginsF
+from qtpy.QtGui import QTextDocument, QPdfWriter, QPainter, QImage, QPageLayout, QPageSize, QPixmap, QFont, QPalette
+from qtpy.QtPrintSupport import QPrinter
+from qtpy.QtWidgets import QScrollArea, QWidget, QLabel
+
+from qttextedit.export import prepare_pages, paint_page, PDF_EXPORT_RESOLUTION
+
+PREVIEW_CACHE_SIZE = 64
+PREVIEW_PAGE_WIDTH = 600
+PREVIEW_PAGE_SPACING = 20
+PREVIEW_PREFETCH_PAGES = 1
+PREVIEW_REPAGINATE_DELAY = 300
+
+
+_previewThreadPool: Optional[QThreadPool] = None
+
+
+def preview_thread_pool() -> QThreadPool:
+    global _previewThreadPool
+    if _previewThreadPool is None:
+        # a cloned document is laid out once and drawn many times; its layout caches font engines that belong to
+        # the thread which created them, so every preview task runs on the same long-lived thread
+        _previewThreadPool = QThreadPool()
+        _previewThreadPool.setMaxThreadCount(1)
+        _previewThreadPool.setExpiryTimeout(-1)
+    return _previewThreadPool
+
+
+def page_ranges(document: QTextDocument) -> List[Tuple[int, int]]:
+    layout = document.documentLayout()
+    pageHeight = document.pageSize().height()
+    starts: List[int] = []
+    block = document.begin()
+    while block.isValid():
+        top = layout.blockBoundingRect(block).top()
+        textLayout = block.layout()
+        for i in range(textLayout.lineCount()):
+            line = textLayout.lineAt(i)
+            page = int((top + line.y()) // pageHeight)
+            while len(starts) <= page:
+                starts.append(block.position() + line.textStart())
+        block = block.next()
+
+    end = document.characterCount()
+    if not starts:
+        starts.append(0)
+    while len(starts) < document.pageCount():
+        starts.append(end)
+    return [(start, starts[i + 1] if i + 1 < len(starts) else end) for i, start in enumerate(starts)]
+
+
+class PageImageCache:
+    def __init__(self, capacity: int = PREVIEW_CACHE_SIZE):
+        self._capacity = capacity
+        self._images: 'OrderedDict[int, QImage]' = OrderedDict()
+
+    def capacity(self) -> int:
+        return self._capacity
+
+    def setCapacity(self, capacity: int):
+        self._capacity = capacity
+        self._evict()
+
+    def image(self, page: int) -> Optional[QImage]:
+        image = self._images.get(page)
+        if image is not None:
+            self._images.move_to_end(page)
+        return image
+
+    def insert(self, page: int, image: QImage):
+        self._images[page] = image
+        self._images.move_to_end(page)
+        self._evict()
+
+    def remove(self, page: int):
+        self._images.pop(page, None)
+
+    def pages(self) -> List[int]:
+        return list(self._images.keys())
+
+    def clear(self):
+        self._images.clear()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def __contains__(self, page: int) -> bool:
+        return page in self._images
+
+    def _evict(self):
+        while len(self._images) > self._capacity:
+            self._images.popitem(last=False)
+
+
+class _PaginatedDocument:
+    def __init__(self, revision: int, document: QTextDocument, pageLayout: QPageLayout, resolution: int):
+        self.revision = revision
+        self.document = document.clone()
+        self.document.moveToThread(None)
+        self.body = QRectF()
+        self.pageNumberPos = QPointF()
+        self._buffer = QBuffer()
+        self._device = QPdfWriter(self._buffer)
+        self._device.setPageLayout(pageLayout)
+        self._device.setResolution(resolution)
+
+    def paginate(self) -> List[Tuple[int, int]]:
+        self.body, self.pageNumberPos = prepare_pages(self.document, self._device)
+        return page_ranges(self.document)
+
+    def render(self, page: int, width: int) -> QImage:
+        height = round(width * self.body.height() / self.body.width())
+        image = QImage(width, height, QImage.Format.Format_RGB32)
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        painter.setRenderHints(QPainter.RenderHint.Antialiasing | QPainter.RenderHint.TextAntialiasing)
+        painter.scale(width / self.body.width(), height / self.body.height())
+        paint_page(painter, self.document, self.body, self.pageNumberPos, page)
+        painter.end()
+        return image
+
+    def print(self, printer: QPrinter) -> bool:
+        pages = self.document.pageCount()
+        first = max(printer.fromPage() - 1, 0)
+        last = min(printer.toPage(), pages) if printer.toPage() > 0 else pages
+        painter = QPainter()
+        if not painter.begin(printer):
+            return False
+        for page in range(first, last):
+            if page > first:
+                printer.newPage()
+            paint_page(painter, self.document, self.body, self.pageNumberPos, page)
+        painter.end()
+        return True
+
+
+class PrintPreviewSignals(QObject):
+    paginated = Signal(int, list)
+    rendered = Signal(int, int, QImage)
+    printed = Signal(bool)
+
+
+class _PrintPreviewTask(QRunnable):
+    def __init__(self, paginated: _PaginatedDocument, signals: PrintPreviewSignals):
+        super(_PrintPreviewTask, self).__init__()
+        self._paginated = paginated
+        self._signals = signals
+
+    def run(self):
+        document = self._paginated.document
+        document.moveToThread(QThread.currentThread())
+        try:
+            outcome = self._run()
+        finally:
+            document.moveToThread(None)
+        # the GUI thread may release the paginated document once it hears back, so this is the last step
+        if outcome is not None:
+            outcome()
+
+    def _run(self) -> Optional[Callable[[], None]]:
+        pass
+
+
+class PaginationTask(_PrintPreviewTask):
+    def _run(self) -> Callable[[], None]:
+        ranges = self._paginated.paginate()
+        return partial(self._signals.paginated.emit, self._paginated.revision, ranges)
+
+
+class PageRenderTask(_PrintPreviewTask):
+    def __init__(self, paginated: _PaginatedDocument, signals: PrintPreviewSignals, page: int, width: int):
+        super(PageRenderTask, self).__init__(paginated, signals)
+        self._page = page
+        self._width = width
+        self._cancelled: bool = False
+
+    def page(self) -> int:
+        return self._page
+
+    def cancel(self):
+        self._cancelled = True
+
+    def isCancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        if not self._cancelled:
+            super(PageRenderTask, self).run()
+
+    def _run(self) -> Callable[[], None]:
+        image = self._paginated.render(self._page, self._width)
+        return partial(self._signals.rendered.emit, self._paginated.revision, self._page, image)
+
+
+class PrintTask(_PrintPreviewTask):
+    def __init__(self, paginated: _PaginatedDocument, signals: PrintPreviewSignals, printer: QPrinter):
+        super(PrintTask, self).__init__(paginated, signals)
+        self._printer = printer
+
+    def _run(self) -> Callable[[], None]:
+        return partial(self._signals.printed.emit, self._paginated.print(self._printer))
+
+
+class PrintPreview(QObject):
+    paginated = Signal(int)
+    pageRendered = Signal(int, QImage)
+    printed = Signal(bool)
+
+    def __init__(self, document: QTextDocument, parent=None):
+        super(PrintPreview, self).__init__(parent)
+        self._document = document
+        self._pageLayout = QPageLayout(QPageSize(QPageSize.PageSizeId.A4), QPageLayout.Orientation.Portrait, QMarginsF())
+        self._resolution: int = PDF_EXPORT_RESOLUTION
+        self._pageWidth: int = PREVIEW_PAGE_WIDTH
+        self._cache = PageImageCache()
+        self._active: bool = False
+
+        self._pool = preview_thread_pool()
+        self._signals = PrintPreviewSignals()
+        self._signals.paginated.connect(self._paginationFinished)
+        self._signals.rendered.connect(self._renderFinished)
+        self._signals.printed.connect(self._printFinished)
+
+        self._paginatedDocument: Optional[_PaginatedDocument] = None
+        self._ranges: List[Tuple[int, int]] = []
+        self._defaultFont: Optional[QFont] = None
+        self._revision: int = 0
+        self._paginating: Optional[_PaginatedDocument] = None
+        self._paginatingEdit: Optional[Tuple[int, int, int]] = None
+        self._edit: Optional[Tuple[int, int, int]] = None
+        self._stale: bool = True
+        self._requested: List[int] = []
+        self._pending: Dict[int, PageRenderTask] = {}
+        self._printing: int = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(PREVIEW_REPAGINATE_DELAY)
+        self._timer.timeout.connect(self.paginate)
+
+        self._document.documentLayout()  # contentsChange is only emitted once the document has a layout
+        self._document.contentsChange.connect(self._contentsChange)
+
+    def document(self) -> QTextDocument:
+        return self._document
+
+    def pageLayout(self) -> QPageLayout:
+        return self._pageLayout
+
+    def resolution(self) -> int:
+        return self._resolution
+
+    def setPageLayout(self, pageLayout: QPageLayout, resolution: int = PDF_EXPORT_RESOLUTION):
+        if pageLayout == self._pageLayout and resolution == self._resolution:
+            return
+        self._pageLayout = QPageLayout(pageLayout)
+        self._resolution = resolution
+        self._invalidate()
+
+    def pageWidth(self) -> int:
+        return self._pageWidth
+
+    def setPageWidth(self, width: int):
+        if width == self._pageWidth:
+            return
+        self._pageWidth = width
+        self._invalidate()
+
+    def cache(self) -> PageImageCache:
+        return self._cache
+
+    def isActive(self) -> bool:
+        return self._active
+
+    def setActive(self, active: bool):
+        self._active = active
+        if active:
+            self.paginate()
+        else:
+            self._timer.stop()
+            self.requestPages([])
+
+    def isPaginated(self) -> bool:
+        return self._paginatedDocument is not None and not self._stale and self._paginating is None
+
+    def isRendering(self) -> bool:
+        return self._paginating is not None or len(self._pending) > 0
+
+    def isPrinting(self) -> bool:
+        return self._printing > 0
+
+    def pageCount(self) -> int:
+        return len(self._ranges)
+
+    def pageRange(self, page: int) -> Tuple[int, int]:
+        return self._ranges[page]
+
+    def pageSize(self) -> QSizeF:
+        if self._paginatedDocument is not None:
+            return self._paginatedDocument.body.size()
+        return QSizeF(self._pageLayout.paintRectPixels(self._resolution).size())
+
+    def imageSize(self) -> QSizeF:
+        size = self.pageSize()
+        return QSizeF(self._pageWidth, round(self._pageWidth * size.height() / size.width()))
+
+    def image(self, page: int) -> Optional[QImage]:
+        return self._cache.image(page)
+
+    def paginate(self):
+        self._timer.stop()
+        if self._paginating is not None:
+            if self._stale:
+                self._timer.start()
+            return
+        if self._defaultFont is not None and self._defaultFont != self._document.defaultFont():
+            self._invalidate()
+        if not self._stale:
+            if self._paginatedDocument is not None:
+                self.paginated.emit(self.pageCount())
+            return
+
+        self._revision += 1
+        self._paginating = _PaginatedDocument(self._revision, self._document, self._pageLayout, self._resolution)
+        self._paginatingEdit = self._edit
+        self._defaultFont = QFont(self._document.defaultFont())
+        self._edit = None
+        self._stale = False
+        self._pool.start(PaginationTask(self._paginating, self._signals))
+
+    def requestPages(self, pages: Iterable[int]):
+        self._requested = [page for page in pages if page >= 0]
+        wanted = set(self._requested)
+        for page in [page for page in self._pending if page not in wanted]:
+            self._pending.pop(page).cancel()
+
+        if self._paginatedDocument is None or self._paginating is not None:
+            return
+        for page in self._requested:
+            if page >= len(self._ranges):
+                continue
+            image = self._cache.image(page)
+            if image is not None:
+                self.pageRendered.emit(page, image)
+            elif page not in self._pending:
+                task = PageRenderTask(self._paginatedDocument, self._signals, page, self._pageWidth)
+                self._pending[page] = task
+                self._pool.start(task)
+
+    def print(self, printer: QPrinter) -> bool:
+        # the paginated clone is printed on the preview thread as long as its pages are what the printer would get
+        if not self.isPaginated() or printer.printRange() == QPrinter.PrintRange.Selection:
+            return False
+        if printer.pageLayout() != self._pageLayout or printer.resolution() != self._resolution:
+            return False
+        self._printing += 1
+        self._pool.start(PrintTask(self._paginatedDocument, self._signals, printer))
+        return True
+
+    def _invalidate(self):
+        self._cache.clear()
+        self._ranges.clear()
+        self._edit = None
+        self._paginatingEdit = None
+        self._paginatedDocument = None
+        self._stale = True
+        if self._active:
+            self.paginate()
+
+    def _contentsChange(self, position: int, charsRemoved: int, charsAdded: int):
+        if self._edit is None:
+            self._edit = (position, position + charsAdded, charsAdded - charsRemoved)
+        else:
+            start, end, delta = self._edit
+            end = max(end, position + charsRemoved) + charsAdded - charsRemoved
+            self._edit = (min(start, position), end, delta + charsAdded - charsRemoved)
+        self._stale = True
+        if self._active:
+            self._timer.start()
+
+    def _paginationFinished(self, revision: int, ranges: List[Tuple[int, int]]):
+        if self._paginating is None or revision != self._paginating.revision:
+            return
+        paginated = self._paginating
+        self._paginating = None
+        if self._paginatedDocument is None:
+            self._cache.clear()
+        else:
+            self._keepValidImages(ranges, self._paginatingEdit)
+        self._paginatingEdit = None
+        self._paginatedDocument = paginated
+        self._ranges = [tuple(pageRange) for pageRange in ranges]
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+
+        if self._stale and self._active:
+            self._timer.start()
+        self.paginated.emit(self.pageCount())
+        self.requestPages(self._requested)
+
+    def _keepValidImages(self, ranges: List[Tuple[int, int]], edit: Optional[Tuple[int, int, int]]):
+        for page in self._cache.pages():
+            if page >= len(self._ranges) or page >= len(ranges):
+                self._cache.remove(page)
+                continue
+            start, end = self._ranges[page]
+            if edit is not None:
+                editStart, editEnd, delta = edit
+                editEnd -= delta
+                if end <= editStart:
+                    delta = 0
+                elif start <= editEnd:
+                    self._cache.remove(page)
+                    continue
+                start, end = start + delta, end + delta
+            if tuple(ranges[page]) != (start, end):
+                self._cache.remove(page)
+
+    def _renderFinished(self, revision: int, page: int, image: QImage):
+        if self._paginatedDocument is None or revision != self._paginatedDocument.revision:
+            return
+        task = self._pending.pop(page, None)
+        if task is None or task.isCancelled():
+            return
+        self._cache.insert(page, image)
+        if page in self._requested:
+            self.pageRendered.emit(page, image)
+
+    def _printFinished(self, success: bool):
+        self._printing -= 1
+        self.printed.emit(success)
+
+
+class PrintPreviewWidget(QScrollArea):
+    def __init__(self, parent=None):
+        super(PrintPreviewWidget, self).__init__(parent)
+        self._preview: Optional[PrintPreview] = None
+        self._pages: List[QLabel] = []
+
+        self._container = QWidget()
+        vbox(self._container, PREVIEW_PAGE_SPACING, PREVIEW_PAGE_SPACING)
+        self._container.layout().setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop)
+        self.setWidget(self._container)
+        self.setWidgetResizable(True)
+        self.setBackgroundRole(QPalette.ColorRole.Dark)
+        self.verticalScrollBar().valueChanged.connect(self._requestVisiblePages)
+
+    def preview(self) -> Optional[PrintPreview]:
+        return self._preview
+
+    def setPreview(self, preview: Optional[PrintPreview]):
+        if self._preview is not None:
+            self._preview.paginated.disconnect(self._paginated)
+            self._preview.pageRendered.disconnect(self._pageRendered)
+            self._preview.setActive(False)
+        self._preview = preview
+        self._setPageCount(0)
+        if self._preview is not None:
+            self._preview.paginated.connect(self._paginated)
+            self._preview.pageRendered.connect(self._pageRendered)
+            if self.isVisible():
+                self._preview.setActive(True)
+
+    def pageCount(self) -> int:
+        return len(self._pages)
+
+    def pageLabel(self, page: int) -> QLabel:
+        return self._pages[page]
+
+    def visiblePages(self) -> List[int]:
+        if not self._pages:
+            return []
+        stride = self._pages[0].height() + PREVIEW_PAGE_SPACING
+        top = self.verticalScrollBar().value() - PREVIEW_PAGE_SPACING
+        first = max(0, top // stride)
+        last = min(len(self._pages) - 1, (top + self.viewport().height()) // stride)
+        return list(range(first, last + 1))
+
+    def scrollToPage(self, page: int):
+        if 0 <= page < len(self._pages):
+            self.verticalScrollBar().setValue(PREVIEW_PAGE_SPACING + page * (self._pages[0].height() + PREVIEW_PAGE_SPACING))
+
+    def showEvent(self, event):
+        super(PrintPreviewWidget, self).showEvent(event)
+        if self._preview is not None:
+            self._preview.setActive(True)
+
+    def hideEvent(self, event):
+        super(PrintPreviewWidget, self).hideEvent(event)
+        if self._preview is not None:
+            self._preview.setActive(False)
+
+    def resizeEvent(self, event):
+        super(PrintPreviewWidget, self).resizeEvent(event)
+        self._requestVisiblePages()
+
+    def _setPageCount(self, pages: int):
+        while len(self._pages) > pages:
+            self._pages.pop().deleteLater()
+        while len(self._pages) < pages:
+            lbl = QLabel()
+            lbl.setAutoFillBackground(True)
+            lbl.setBackgroundRole(QPalette.ColorRole.Base)
+            self._container.layout().addWidget(lbl)
+            self._pages.append(lbl)
+
+    def _paginated(self, pages: int):
+        self._setPageCount(pages)
+        size = self._preview.imageSize().toSize()
+        for page, lbl in enumerate(self._pages):
+            lbl.setFixedSize(size)
+            image = self._preview.cache().image(page)
+            if image is None:
+                lbl.clear()
+            else:
+                lbl.setPixmap(QPixmap.fromImage(image))
+        self._requestVisiblePages()
+
+    def _pageRendered(self, page: int, image: QImage):
+        if page < len(self._pages):
+            self._pages[page].setPixmap(QPixmap.fromImage(image))
+
+    def _requestVisiblePages(self):
+        if self._preview is None or not self._preview.isActive():
+            return
+        pages = self.visiblePages()
+        if pages:
+            first = max(0, pages[0] - PREVIEW_PREFETCH_PAGES)
+            last = min(len(self._pages) - 1, pages[-1] + PREVIEW_PREFETCH_PAGES)
+            pages = pages + [page for page in range(first, last + 1) if page not in pages]
+        self._preview.requestPages(pages)
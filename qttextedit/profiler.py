@@ -0,0 +1,235 @@
+from collections import deque
+from dataclasses import dataclass, field
+from timeit import default_timer as timer
+from typing import Deque, Dict, List, Optional, Tuple
+
+from qtpy.QtCore import QObject, Signal, Qt, QRect, QPoint
+from qtpy.QtGui import QColor, QPainter, QPaintEvent, QFont
+from qtpy.QtWidgets import QTextEdit, QWidget
+
+from qttextedit import instrumentation
+
+PROFILER_FRAME_HISTORY = 120
+PROFILER_SLOW_FRAME = 1 / 60
+PROFILER_OVERLAY_SIZE = (260, 96)
+
+BlockRange = Tuple[int, int]
+
+
+@dataclass
+class FrameProfile:
+    number: int
+    layoutTime: float = 0.0
+    paintTime: float = 0.0
+    resizeTime: float = 0.0
+    layoutRanges: List[BlockRange] = field(default_factory=list)
+    paintedRange: BlockRange = (-1, -1)
+    paintRect: QRect = field(default_factory=QRect)
+
+    def frameTime(self) -> float:
+        return self.layoutTime + self.paintTime + self.resizeTime
+
+    def relayoutBlocks(self) -> int:
+        return sum(last - first + 1 for first, last in self.layoutRanges)
+
+
+class LayoutPaintProfiler(QObject):
+    frameProfiled = Signal(FrameProfile)
+    slowFrame = Signal(FrameProfile)
+
+    def __init__(self, textEdit: QTextEdit, history: int = PROFILER_FRAME_HISTORY):
+        super(LayoutPaintProfiler, self).__init__(textEdit)
+        self._textEdit = textEdit
+        self._frames: Deque[FrameProfile] = deque(maxlen=history)
+        self._frameCount: int = 0
+        self._current = FrameProfile(0)
+        self._active: bool = False
+        self._slowFrameThreshold: float = PROFILER_SLOW_FRAME
+        self._layoutStart: Optional[float] = None
+        self._paintStart: Optional[float] = None
+        self._resizeStart: Optional[float] = None
+        self._overlay: Optional[ProfilerOverlay] = None
+
+    def textEdit(self) -> QTextEdit:
+        return self._textEdit
+
+    def isActive(self) -> bool:
+        return self._active
+
+    def setActive(self, active: bool):
+        if active == self._active:
+            return
+        self._active = active
+        document = self._textEdit.document()
+        layout = document.documentLayout()
+        if active:
+            document.contentsChange.connect(self._contentsChange)
+            layout.update.connect(self._layoutUpdated)
+            layout.documentSizeChanged.connect(self._layoutUpdated)
+        else:
+            document.contentsChange.disconnect(self._contentsChange)
+            layout.update.disconnect(self._layoutUpdated)
+            layout.documentSizeChanged.disconnect(self._layoutUpdated)
+            self._layoutStart = None
+            self._paintStart = None
+            self._resizeStart = None
+            self.setOverlayVisible(False)
+
+    def slowFrameThreshold(self) -> float:
+        return self._slowFrameThreshold
+
+    def setSlowFrameThreshold(self, threshold: float):
+        self._slowFrameThreshold = threshold
+
+    def isOverlayVisible(self) -> bool:
+        return self._overlay is not None and self._overlay.isVisible()
+
+    def setOverlayVisible(self, visible: bool):
+        if visible and self._active:
+            if self._overlay is None:
+                self._overlay = ProfilerOverlay(self)
+            self._overlay.reposition()
+            self._overlay.setVisible(True)
+            self._overlay.raise_()
+        elif self._overlay is not None:
+            self._overlay.setHidden(True)
+
+    def frames(self) -> List[FrameProfile]:
+        return list(self._frames)
+
+    def lastFrame(self) -> Optional[FrameProfile]:
+        return self._frames[-1] if self._frames else None
+
+    def slowestFrames(self, count: int = 5) -> List[FrameProfile]:
+        return sorted(self._frames, key=lambda frame: frame.frameTime(), reverse=True)[:count]
+
+    def hotspots(self, count: int = 5) -> List[Tuple[BlockRange, float]]:
+        # block ranges that cost the most layout time across the recorded frames, e.g. a huge table
+        costs: Dict[BlockRange, float] = {}
+        for frame in self._frames:
+            if not frame.layoutRanges:
+                continue
+            share = frame.layoutTime / len(frame.layoutRanges)
+            for blockRange in frame.layoutRanges:
+                costs[blockRange] = costs.get(blockRange, 0.0) + share
+        return sorted(costs.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def clear(self):
+        self._frames.clear()
+        self._current = FrameProfile(self._frameCount)
+
+    def beginPaint(self):
+        self._paintStart = timer()
+
+    def endPaint(self, rect: QRect):
+        if self._paintStart is None:
+            return
+        self._current.paintTime += timer() - self._paintStart
+        self._paintStart = None
+        self._current.paintRect = QRect(rect)
+        self._current.paintedRange = (self._blockAt(rect.topLeft()), self._blockAt(rect.bottomLeft()))
+        self._finishFrame()
+
+    def beginResize(self):
+        self._resizeStart = timer()
+
+    def endResize(self):
+        if self._resizeStart is None:
+            return
+        self._current.resizeTime += timer() - self._resizeStart
+        self._resizeStart = None
+        if self._overlay is not None:
+            self._overlay.reposition()
+
+    def _finishFrame(self):
+        frame = self._current
+        self._frames.append(frame)
+        self._frameCount += 1
+        self._current = FrameProfile(self._frameCount)
+        self.frameProfiled.emit(frame)
+        if frame.frameTime() >= self._slowFrameThreshold:
+            self.slowFrame.emit(frame)
+        if self._overlay is not None and self._overlay.isVisible():
+            self._overlay.update()
+
+    def _blockAt(self, pos: QPoint) -> int:
+        return self._textEdit.cursorForPosition(pos).blockNumber()
+
+    def _contentsChange(self, position: int, charsRemoved: int, charsAdded: int):
+        # the document lays out the changed range right after the contentsChange slots, so the layout signals mark the end.
+        # Slots run in connection order: reconnecting keeps this one last for the next changes, but slots connected since
+        # the previous change still run after it and are counted once. Layout steps deferred to later turns are not timed.
+        document = self._textEdit.document()
+        document.contentsChange.disconnect(self._contentsChange)
+        document.contentsChange.connect(self._contentsChange)
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + charsAdded).blockNumber()
+        if last < 0:
+            last = document.blockCount() - 1
+        self._current.layoutRanges.append((first, max(first, last)))
+        self._layoutStart = timer()
+
+    def _layoutUpdated(self):
+        if self._layoutStart is None:
+            return
+        elapsed = timer() - self._layoutStart
+        self._layoutStart = None
+        self._current.layoutTime += elapsed
+        if instrumentation.is_enabled():
+            instrumentation.record_span('EnhancedTextEdit.layout', elapsed)
+
+
+class ProfilerOverlay(QWidget):
+    def __init__(self, profiler: LayoutPaintProfiler):
+        super(ProfilerOverlay, self).__init__(profiler.textEdit())
+        self._profiler = profiler
+        # an opaque overlay repaints without invalidating the viewport below it, which would profile itself
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setFixedSize(*PROFILER_OVERLAY_SIZE)
+        self._background = QColor('#2E3440')
+        self._foreground = QColor('#ECEFF4')
+        self._layoutColor = QColor('#EBCB8B')
+        self._paintColor = QColor('#88C0D0')
+        self._slowColor = QColor('#BF616A')
+
+    def reposition(self):
+        viewport = self._profiler.textEdit().viewport()
+        topRight = viewport.geometry().topRight()
+        self.move(topRight.x() - self.width() - 4, topRight.y() + 4)
+
+    def paintEvent(self, event: QPaintEvent):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self._background)
+        font = QFont(self.font())
+        font.setPointSize(8)
+        painter.setFont(font)
+
+        frame = self._profiler.lastFrame()
+        painter.setPen(self._foreground)
+        if frame is None:
+            painter.drawText(6, 14, 'No frame recorded')
+            return
+        painter.drawText(6, 14, f'frame {frame.frameTime() * 1000:.2f} ms  layout {frame.layoutTime * 1000:.2f}  '
+                                f'paint {frame.paintTime * 1000:.2f}')
+        ranges = ', '.join(f'{first}-{last}' if first != last else str(first) for first, last in frame.layoutRanges[:4])
+        painter.drawText(6, 28, f'relayout: {ranges or "-"}')
+        painter.drawText(6, 42, f'painted: {frame.paintedRange[0]}-{frame.paintedRange[1]}')
+
+        # stacked layout/paint bars of the recent frames, scaled so a slow frame fills the chart
+        frames = self._profiler.frames()[-(self.width() // 3):]
+        threshold = self._profiler.slowFrameThreshold()
+        chartTop, chartHeight = 50, self.height() - 54
+        scale = chartHeight / max(threshold * 2, max(f.frameTime() for f in frames))
+        for i, recent in enumerate(frames):
+            x = 6 + i * 3
+            layoutHeight = int(recent.layoutTime * scale)
+            paintHeight = int((recent.paintTime + recent.resizeTime) * scale)
+            bottom = chartTop + chartHeight
+            painter.fillRect(x, bottom - layoutHeight, 2, layoutHeight, self._layoutColor)
+            paintColor = self._slowColor if recent.frameTime() >= threshold else self._paintColor
+            painter.fillRect(x, bottom - layoutHeight - paintHeight, 2, paintHeight, paintColor)
+        y = chartTop + chartHeight - int(threshold * scale)
+        painter.setPen(self._slowColor)
+        painter.drawLine(6, y, self.width() - 6, y)
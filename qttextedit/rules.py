@@ -0,0 +1,306 @@
+from abc import abstractmethod
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from qtpy.QtCore import Qt
+from qtpy.QtGui import QKeyEvent, QTextCursor
+from qtpy.QtWidgets import QTextEdit
+
+from qttextedit.instrumentation import span, count
+from qttextedit.util import ELLIPSIS, EN_DASH, EM_DASH, LEFT_SINGLE_QUOTATION, RIGHT_SINGLE_QUOTATION, \
+    LEFT_DOUBLE_QUOTATION, RIGHT_DOUBLE_QUOTATION, LONG_ARROW_LEFT_RIGHT, HEAVY_ARROW_RIGHT, SHORT_ARROW_LEFT_RIGHT, \
+    is_open_quotation, is_ending_punctuation
+
+ANY_LETTER = -1
+
+
+class DashInsertionMode(Enum):
+    NONE = 'none'
+    INSERT_EN_DASH = 'en'
+    INSERT_EM_DASH = 'em'
+
+
+class EllipsisInsertionMode(Enum):
+    NONE = 'none'
+    INSERT_ELLIPSIS = 'ellipsis'
+
+
+class AutoCapitalizationMode(Enum):
+    NONE = 'none'
+    PARAGRAPH = 'paragraph'
+    SENTENCE = 'sentence'
+
+
+class KeystrokeContext:
+    def __init__(self, textEdit: QTextEdit, event: QKeyEvent, cursor: QTextCursor):
+        self.textEdit = textEdit
+        self.event = event
+        self.cursor = cursor
+        self._text: Optional[str] = None
+        self._pos: int = -1
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.cursor.block().text()
+            self._pos = self.cursor.positionInBlock()
+        return self._text
+
+    @property
+    def pos(self) -> int:
+        if self._text is None:
+            _ = self.text
+        return self._pos
+
+    def before(self, amount: int = 1) -> str:
+        text = self.text
+        return text[max(0, self._pos - amount):self._pos]
+
+    def after(self, amount: int = 1) -> str:
+        text = self.text
+        return text[self._pos:self._pos + amount]
+
+    def atBlockStart(self) -> bool:
+        return self.pos == 0
+
+    def atBlockEnd(self) -> bool:
+        return self.pos == len(self.text)
+
+    def hasCharacterLeft(self) -> bool:
+        prev = self.before()
+        return bool(prev) and prev != ' '
+
+    def hasCharacterRight(self) -> bool:
+        next_ = self.after()
+        return bool(next_) and next_ != ' '
+
+    def atSentenceStart(self) -> bool:
+        return at_sentence_start(self.text, self.pos)
+
+
+def at_sentence_start(text: str, pos: int) -> bool:
+    if pos == 0:
+        return not text
+    if pos < len(text) and text[pos].isalpha():
+        return False
+    prev = text[pos - 1]
+    if pos == 1:
+        return is_open_quotation(prev)
+    if pos == 2:
+        return False
+    if prev == ' ' or is_open_quotation(prev):
+        return is_ending_punctuation(text[pos - 2])
+
+    return False
+
+
+class KeystrokeRule:
+    name: str = ''
+    keys: Tuple[int, ...] = ()
+
+    def __init__(self):
+        self._enabled: bool = True
+
+    def isEnabled(self) -> bool:
+        return self._enabled
+
+    def setEnabled(self, enabled: bool):
+        self._enabled = enabled
+
+    def isActive(self, textEdit: QTextEdit) -> bool:
+        return True
+
+    @abstractmethod
+    def apply(self, context: KeystrokeContext) -> bool:
+        pass
+
+
+class AutoCapitalizationRule(KeystrokeRule):
+    name = 'auto_capitalization'
+    keys = (ANY_LETTER,)
+
+    def isActive(self, textEdit: QTextEdit) -> bool:
+        return textEdit.autoCapitalizationMode() != AutoCapitalizationMode.NONE
+
+    def apply(self, context: KeystrokeContext) -> bool:
+        sentence = context.textEdit.autoCapitalizationMode() == AutoCapitalizationMode.SENTENCE
+        if (context.atBlockStart() and not context.text) or (sentence and context.atSentenceStart()):
+            context.cursor.insertText(context.event.text().upper())
+            return True
+        return False
+
+
+class PeriodInsertionRule(KeystrokeRule):
+    name = 'period_insertion'
+    keys = (Qt.Key_Space,)
+
+    def isActive(self, textEdit: QTextEdit) -> bool:
+        return textEdit.periodInsertionEnabled()
+
+    def apply(self, context: KeystrokeContext) -> bool:
+        if context.atBlockEnd() and context.before() == ' ':
+            context.cursor.deletePreviousChar()
+            context.cursor.insertText('.')
+        return False
+
+
+class EllipsisRule(KeystrokeRule):
+    name = 'ellipsis'
+    keys = (Qt.Key_Period,)
+
+    def isActive(self, textEdit: QTextEdit) -> bool:
+        return textEdit.ellipsisInsertionMode() != EllipsisInsertionMode.NONE
+
+    def apply(self, context: KeystrokeContext) -> bool:
+        if context.before(2) == '..':
+            context.cursor.deletePreviousChar()
+            context.cursor.deletePreviousChar()
+            context.cursor.insertText(ELLIPSIS)
+            return True
+        return False
+
+
+class DashRule(KeystrokeRule):
+    name = 'dash'
+    keys = (Qt.Key_Minus,)
+
+    def isActive(self, textEdit: QTextEdit) -> bool:
+        return textEdit.dashInsertionMode() != DashInsertionMode.NONE
+
+    def apply(self, context: KeystrokeContext) -> bool:
+        mode = context.textEdit.dashInsertionMode()
+        prev = context.before()
+        if prev == '-':
+            replacement = EN_DASH if mode == DashInsertionMode.INSERT_EN_DASH else EM_DASH
+        elif prev == EN_DASH and mode == DashInsertionMode.INSERT_EN_DASH:
+            replacement = EM_DASH
+        elif prev == EM_DASH and mode == DashInsertionMode.INSERT_EM_DASH:
+            replacement = EN_DASH
+        else:
+            return False
+
+        context.cursor.deletePreviousChar()
+        context.cursor.insertText(replacement)
+        return True
+
+
+class ArrowRule(KeystrokeRule):
+    name = 'arrow'
+    keys = (Qt.Key_Greater,)
+
+    def apply(self, context: KeystrokeContext) -> bool:
+        if context.before(2) == '<-':
+            context.cursor.deletePreviousChar()
+            context.cursor.deletePreviousChar()
+            context.cursor.insertText(LONG_ARROW_LEFT_RIGHT)
+            return True
+        prev = context.before()
+        if prev == '-':
+            arrow = HEAVY_ARROW_RIGHT
+        elif prev == '<':
+            arrow = SHORT_ARROW_LEFT_RIGHT
+        else:
+            return False
+
+        context.cursor.deletePreviousChar()
+        context.cursor.insertText(arrow)
+        return True
+
+
+class SmartQuoteRule(KeystrokeRule):
+    name = 'smart_quotes'
+    keys = (Qt.Key_Apostrophe, Qt.Key_QuoteDbl)
+
+    def isActive(self, textEdit: QTextEdit) -> bool:
+        return textEdit.smartQuotesEnabled()
+
+    def apply(self, context: KeystrokeContext) -> bool:
+        if context.event.key() == Qt.Key_Apostrophe:
+            left, right = LEFT_SINGLE_QUOTATION, RIGHT_SINGLE_QUOTATION
+        else:
+            left, right = LEFT_DOUBLE_QUOTATION, RIGHT_DOUBLE_QUOTATION
+
+        cursor = context.cursor
+        if cursor.hasSelection():
+            cursor.insertText(left + cursor.selectedText() + right)
+        elif context.hasCharacterLeft():
+            cursor.insertText(right)
+        elif context.hasCharacterRight():
+            cursor.insertText(left)
+        else:
+            cursor.insertText(left + right)
+            cursor.movePosition(QTextCursor.PreviousCharacter)
+            context.textEdit.setTextCursor(cursor)
+        return True
+
+
+class KeystrokeRuleRegistry:
+    def __init__(self):
+        self._rules: List[KeystrokeRule] = []
+        self._rulesByKey: Dict[int, List[KeystrokeRule]] = {}
+        # instrumentation names are built once per rule rather than on every keystroke
+        self._spanNames: Dict[KeystrokeRule, Tuple[str, str]] = {}
+
+    def rules(self) -> List[KeystrokeRule]:
+        return list(self._rules)
+
+    def rule(self, name: str) -> Optional[KeystrokeRule]:
+        for rule in self._rules:
+            if rule.name == name:
+                return rule
+        return None
+
+    def addRule(self, rule: KeystrokeRule):
+        if not rule.keys:
+            raise ValueError(f'Keystroke rule must define at least one trigger key: {rule.name}')
+        self._rules.append(rule)
+        self._spanNames[rule] = (f'keystroke.{rule.name}', f'keystroke.{rule.name}.applied')
+        for key in rule.keys:
+            self._rulesByKey.setdefault(key, []).append(rule)
+
+    def removeRule(self, name: str):
+        rule = self._ruleOrFail(name)
+        self._rules.remove(rule)
+        del self._spanNames[rule]
+        for key in rule.keys:
+            self._rulesByKey[key].remove(rule)
+            if not self._rulesByKey[key]:
+                del self._rulesByKey[key]
+
+    def setRuleEnabled(self, name: str, enabled: bool):
+        self._ruleOrFail(name).setEnabled(enabled)
+
+    def hasRules(self, event: QKeyEvent) -> bool:
+        if event.key() in self._rulesByKey:
+            return True
+        return ANY_LETTER in self._rulesByKey and event.text().isalpha()
+
+    def process(self, textEdit: QTextEdit, event: QKeyEvent, cursor: QTextCursor) -> bool:
+        rules = self._rulesByKey.get(event.key())
+        if ANY_LETTER in self._rulesByKey and event.text().isalpha():
+            rules = self._rulesByKey[ANY_LETTER] + rules if rules else self._rulesByKey[ANY_LETTER]
+        if not rules:
+            return False
+
+        context = KeystrokeContext(textEdit, event, cursor)
+        for rule in rules:
+            if not rule.isEnabled() or not rule.isActive(textEdit):
+                continue
+            spanName, appliedName = self._spanNames[rule]
+            with span(spanName):
+                applied = rule.apply(context)
+            if applied:
+                count(appliedName)
+                return True
+        return False
+
+    def _ruleOrFail(self, name: str) -> KeystrokeRule:
+        rule = self.rule(name)
+        if rule is None:
+            raise ValueError(f'Keystroke rule is not registered: {name}')
+        return rule
+
+
+def default_keystroke_rules() -> List[KeystrokeRule]:
+    return [AutoCapitalizationRule(), PeriodInsertionRule(), EllipsisRule(), DashRule(), ArrowRule(),
+            SmartQuoteRule()]
@@ -0,0 +1,304 @@
+import json
+import re
+from bisect import bisect_left
+import zlib
+from dataclasses import dataclass
+from functools import partial
+from typing import List, Tuple, Pattern, Dict, Optional, Callable, Set
+
+from qtpy.QtCore import QObject, QRunnable, Signal
+from qtpy.QtGui import QTextDocument
+
+SEARCH_ASYNC_THRESHOLD = 500_000
+SEARCH_INDEX_VERSION = 1
+
+_WORD_PATTERN = re.compile(r'\w+')
+_ASTRAL_PATTERN = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def compile_term(term: str, caseSensitive: bool = False) -> Pattern:
+    return re.compile(re.escape(term), 0 if caseSensitive else re.IGNORECASE)
+
+
+def find_all(text: str, term: str, caseSensitive: bool = False) -> List[Tuple[int, int]]:
+    if not term:
+        return []
+    return [match.span() for match in compile_term(term, caseSensitive).finditer(text)]
+
+
+def refine_matches(text: str, matches: List[Tuple[int, int]], term: str, caseSensitive: bool = False) -> List[Tuple[int, int]]:
+    if not term:
+        return []
+    # every occurrence of the extended term is an occurrence of the previous one, and any of those that was not
+    # matched overlaps a previous match, so only positions inside the previous matches need to be checked
+    pattern = compile_term(term, caseSensitive)
+    refined = []
+    end = 0
+    for start, stop in matches:
+        candidate = max(start, end)
+        while candidate < stop:
+            match = pattern.match(text, candidate)
+            if match is None:
+                candidate += 1
+            else:
+                refined.append(match.span())
+                end = candidate = match.end()
+    return refined
+
+
+def utf16_spans(text: str, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # document positions count UTF-16 code units, in which characters outside the BMP (e.g. emojis) take two
+    astral = [match.start() for match in _ASTRAL_PATTERN.finditer(text)]
+    if not astral:
+        return spans
+    return [(start + bisect_left(astral, start), end + bisect_left(astral, end)) for start, end in spans]
+
+
+def find_all_in_document(doc: QTextDocument, term: str, caseSensitive: bool = False) -> List[Tuple[int, int]]:
+    text = doc.toRawText()
+    return utf16_spans(text, find_all(text, term, caseSensitive))
+
+
+class SearchSignals(QObject):
+    finished = Signal(int, list)
+
+
+class SearchTask(QRunnable):
+    def __init__(self, requestId: int, text: str, term: str, caseSensitive: bool = False):
+        super(SearchTask, self).__init__()
+        self.signals = SearchSignals()
+        self._requestId = requestId
+        self._text = text
+        self._term = term
+        self._caseSensitive = caseSensitive
+        self._cancelled: bool = False
+
+    def requestId(self) -> int:
+        return self._requestId
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        matches = []
+        for i, match in enumerate(compile_term(self._term, self._caseSensitive).finditer(self._text)):
+            if i % 1000 == 0 and self._cancelled:
+                return
+            matches.append(match.span())
+        self._text = ''
+        if not self._cancelled:
+            self.signals.finished.emit(self._requestId, matches)
+
+
+def tokenize(text: str) -> Dict[str, List[int]]:
+    terms: Dict[str, List[int]] = {}
+    for match in _WORD_PATTERN.finditer(text):
+        terms.setdefault(match.group().lower(), []).append(match.start())
+    return terms
+
+
+def document_checksum(doc: QTextDocument) -> int:
+    return zlib.crc32(doc.toRawText().encode('utf-8', 'surrogatepass'))
+
+
+@dataclass
+class SearchResult:
+    key: str
+    blockNumber: int
+    position: int
+    length: int
+
+
+class _IndexedBlock:
+    __slots__ = ('terms',)
+
+    def __init__(self, terms: Dict[str, List[int]]):
+        self.terms = terms
+
+
+class _IndexedDocument:
+    def __init__(self, document: QTextDocument, slot: Callable):
+        self.document = document
+        self.slot = slot
+        self.blocks: List[_IndexedBlock] = []
+        self.postings: Dict[str, Set[_IndexedBlock]] = {}
+        self._numbers: Optional[Dict[_IndexedBlock, int]] = None
+
+    def blockNumber(self, block: _IndexedBlock) -> int:
+        if self._numbers is None:
+            self._numbers = {indexed: number for number, indexed in enumerate(self.blocks)}
+        return self._numbers[block]
+
+    def replaceBlocks(self, start: int, end: int, blocks: List[_IndexedBlock]) -> Tuple[Set[str], Set[str]]:
+        removed = set()
+        for block in self.blocks[start:end]:
+            for term in block.terms:
+                matches = self.postings[term]
+                matches.discard(block)
+                if not matches:
+                    del self.postings[term]
+                    removed.add(term)
+        added = set()
+        for block in blocks:
+            for term in block.terms:
+                matches = self.postings.get(term)
+                if matches is None:
+                    matches = self.postings[term] = set()
+                    added.add(term)
+                matches.add(block)
+
+        if self._numbers is not None and end - start == len(blocks):
+            for number, block in enumerate(blocks, start):
+                del self._numbers[self.blocks[number]]
+                self._numbers[block] = number
+        else:
+            self._numbers = None
+        self.blocks[start:end] = blocks
+        return removed - added, added - removed
+
+
+class DocumentSearchIndex:
+    def __init__(self):
+        self._documents: Dict[str, _IndexedDocument] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._persisted: Dict[str, dict] = {}
+
+    def keys(self) -> List[str]:
+        return list(self._documents.keys())
+
+    def document(self, key: str) -> Optional[QTextDocument]:
+        indexed = self._documents.get(key)
+        return indexed.document if indexed else None
+
+    def addDocument(self, key: str, document: QTextDocument):
+        if key in self._documents:
+            self.removeDocument(key)
+
+        terms = self._restoredBlocks(key, document)
+        if terms is None:
+            terms = []
+            block = document.begin()
+            while block.isValid():
+                terms.append(tokenize(block.text()))
+                block = block.next()
+
+        indexed = _IndexedDocument(document, partial(self._contentsChange, key))
+        self._documents[key] = indexed
+        self._replaceBlocks(key, 0, 0, [_IndexedBlock(blockTerms) for blockTerms in terms])
+        document.documentLayout()  # contentsChange is only emitted once the document has a layout
+        document.contentsChange.connect(indexed.slot)
+
+    def removeDocument(self, key: str):
+        indexed = self._documents.get(key)
+        if indexed is None:
+            return
+        indexed.document.contentsChange.disconnect(indexed.slot)
+        self._replaceBlocks(key, 0, len(indexed.blocks), [])
+        del self._documents[key]
+
+    def reindex(self, key: str):
+        indexed = self._documents.get(key)
+        if indexed is not None:
+            self.addDocument(key, indexed.document)
+
+    def terms(self) -> int:
+        return len(self._postings)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[SearchResult]:
+        tokens = list(tokenize(query).keys())
+        if not tokens:
+            return []
+
+        candidates = None
+        for token in tokens:
+            keys = self._postings.get(token)
+            if not keys:
+                return []
+            candidates = set(keys) if candidates is None else candidates.intersection(keys)
+            if not candidates:
+                return []
+
+        pattern = re.compile(r'(?<!\w)' + re.escape(query.strip()) + r'(?!\w)', re.IGNORECASE)
+        results: List[SearchResult] = []
+        for key, indexed in self._documents.items():
+            if key not in candidates:
+                continue
+            matches = sorted((indexed.postings[token] for token in tokens), key=len)
+            blocks = matches[0].intersection(*matches[1:])
+            for number in sorted(indexed.blockNumber(block) for block in blocks):
+                block = indexed.document.findBlockByNumber(number)
+                text = block.text()
+                for start, end in utf16_spans(text, [match.span() for match in pattern.finditer(text)]):
+                    results.append(SearchResult(key, number, block.position() + start, end - start))
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
+
+    def save(self, path: str):
+        documents = dict(self._persisted)
+        for key, indexed in self._documents.items():
+            documents[key] = {'checksum': document_checksum(indexed.document),
+                              'blocks': [block.terms for block in indexed.blocks]}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'version': SEARCH_INDEX_VERSION, 'documents': documents}, file)
+
+    def load(self, path: str) -> bool:
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get('version') != SEARCH_INDEX_VERSION:
+            return False
+
+        self._persisted = data.get('documents', {})
+        for key in self._documents:
+            self._persisted.pop(key, None)
+        return True
+
+    def _restoredBlocks(self, key: str, document: QTextDocument) -> Optional[List[Dict[str, List[int]]]]:
+        persisted = self._persisted.pop(key, None)
+        if persisted is None:
+            return None
+        blocks = persisted.get('blocks')
+        if not isinstance(blocks, list) or len(blocks) != document.blockCount():
+            return None
+        if persisted.get('checksum') != document_checksum(document):
+            return None
+        return blocks
+
+    def _replaceBlocks(self, key: str, start: int, end: int, blocks: List[_IndexedBlock]):
+        removed, added = self._documents[key].replaceBlocks(start, end, blocks)
+        for term in removed:
+            keys = self._postings[term]
+            keys.discard(key)
+            if not keys:
+                del self._postings[term]
+        for term in added:
+            self._postings.setdefault(term, set()).add(key)
+
+    def _contentsChange(self, key: str, position: int, charsRemoved: int, charsAdded: int):
+        indexed = self._documents[key]
+        document = indexed.document
+        first = document.findBlock(position)
+        last = document.findBlock(position + charsAdded)
+        if not first.isValid():
+            first = document.lastBlock()
+        if not last.isValid():
+            last = document.lastBlock()
+
+        delta = document.blockCount() - len(indexed.blocks)
+        start = first.blockNumber()
+        end = last.blockNumber() - delta + 1
+        if end <= start or end > len(indexed.blocks):
+            start, end = 0, len(indexed.blocks)
+            first, last = document.begin(), document.lastBlock()
+
+        blocks = []
+        block = first
+        while block.isValid():
+            blocks.append(_IndexedBlock(tokenize(block.text())))
+            if block == last:
+                break
+            block = block.next()
+        self._replaceBlocks(key, start, end, blocks)
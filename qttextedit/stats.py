@@ -0,0 +1,199 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from qtpy.QtCore import QObject, Signal
+from qtpy.QtGui import QTextDocument, QTextBlock, QTextCursor
+
+READING_WORDS_PER_MINUTE = 230
+
+_WORD_PATTERN = re.compile(r"\w+(?:(?:['’-]|(?<=\d)[.,](?=\d))\w+)*")
+_SENTENCE_END_PATTERN = re.compile(r'[.!?…]+(?=[\s"\')\]”’]|$)')
+_WHITESPACE_PATTERN = re.compile(r'\s')
+
+
+@dataclass
+class TextStatistics:
+    words: int = 0
+    characters: int = 0
+    charactersWithoutSpaces: int = 0
+    sentences: int = 0
+    paragraphs: int = 0
+
+    def readingTime(self) -> float:
+        return self.words / READING_WORDS_PER_MINUTE
+
+    def __add__(self, other: 'TextStatistics') -> 'TextStatistics':
+        return TextStatistics(self.words + other.words, self.characters + other.characters,
+                              self.charactersWithoutSpaces + other.charactersWithoutSpaces,
+                              self.sentences + other.sentences, self.paragraphs + other.paragraphs)
+
+
+@dataclass
+class SectionStatistics:
+    blockNumber: int
+    level: int
+    title: str
+    statistics: TextStatistics
+
+
+# words, characters, characters without spaces, sentences
+_Counts = Tuple[int, int, int, int]
+
+
+def count_text(text: str) -> _Counts:
+    words = len(_WORD_PATTERN.findall(text))
+    if not words:
+        return 0, len(text), len(text) - len(_WHITESPACE_PATTERN.findall(text)), 0
+
+    sentences = 0
+    start = 0
+    for match in _SENTENCE_END_PATTERN.finditer(text):
+        if _WORD_PATTERN.search(text, start, match.start()):
+            sentences += 1
+        start = match.end()
+    if _WORD_PATTERN.search(text, start):
+        sentences += 1
+    return words, len(text), len(text) - len(_WHITESPACE_PATTERN.findall(text)), sentences
+
+
+def text_statistics(text: str) -> TextStatistics:
+    statistics = TextStatistics()
+    for line in text.split('\n'):
+        _add(statistics, count_text(line))
+    return statistics
+
+
+def _add(statistics: TextStatistics, counts: _Counts, sign: int = 1):
+    words, characters, charactersWithoutSpaces, sentences = counts
+    statistics.words += sign * words
+    statistics.characters += sign * characters
+    statistics.charactersWithoutSpaces += sign * charactersWithoutSpaces
+    statistics.sentences += sign * sentences
+    if words:
+        statistics.paragraphs += sign
+
+
+class DocumentStatistics(QObject):
+    statisticsChanged = Signal()
+
+    def __init__(self, document: QTextDocument, parent=None):
+        super(DocumentStatistics, self).__init__(parent)
+        self._document = document
+        self._blocks: List[_Counts] = []
+        self._totals = TextStatistics()
+        self._active: bool = False
+
+    def document(self) -> QTextDocument:
+        return self._document
+
+    def isActive(self) -> bool:
+        return self._active
+
+    def setActive(self, active: bool):
+        if active == self._active:
+            return
+        self._active = active
+        if active:
+            self._document.documentLayout()  # contentsChange is only emitted once the document has a layout
+            self._document.contentsChange.connect(self._contentsChange)
+            self.rebuild()
+        else:
+            self._document.contentsChange.disconnect(self._contentsChange)
+            self._blocks.clear()
+            self._totals = TextStatistics()
+
+    def rebuild(self):
+        self._blocks.clear()
+        self._totals = TextStatistics()
+        block = self._document.begin()
+        while block.isValid():
+            counts = count_text(block.text())
+            _add(self._totals, counts)
+            self._blocks.append(counts)
+            block = block.next()
+        self.statisticsChanged.emit()
+
+    def totals(self) -> TextStatistics:
+        return TextStatistics(self._totals.words, self._totals.characters, self._totals.charactersWithoutSpaces,
+                              self._totals.sentences, self._totals.paragraphs)
+
+    def wordCount(self) -> int:
+        return self._totals.words
+
+    def characterCount(self) -> int:
+        return self._totals.characters
+
+    def sentenceCount(self) -> int:
+        return self._totals.sentences
+
+    def readingTime(self) -> float:
+        return self._totals.readingTime()
+
+    def blockStatistics(self, block: QTextBlock) -> TextStatistics:
+        statistics = TextStatistics()
+        number = block.blockNumber()
+        if 0 <= number < len(self._blocks):
+            _add(statistics, self._blocks[number])
+        return statistics
+
+    def rangeStatistics(self, first: int, last: int) -> TextStatistics:
+        statistics = TextStatistics()
+        for counts in self._blocks[max(0, first):last + 1]:
+            _add(statistics, counts)
+        return statistics
+
+    def sectionStatistics(self) -> List[SectionStatistics]:
+        sections: List[SectionStatistics] = []
+        openSections: List[SectionStatistics] = []
+        block = self._document.begin()
+        for number, counts in enumerate(self._blocks):
+            if not block.isValid():
+                break
+            level = block.blockFormat().headingLevel()
+            if level > 0:
+                while openSections and openSections[-1].level >= level:
+                    openSections.pop()
+                section = SectionStatistics(number, level, block.text(), TextStatistics())
+                sections.append(section)
+                openSections.append(section)
+            for section in openSections:
+                _add(section.statistics, counts)
+            block = block.next()
+        return sections
+
+    def selectionStatistics(self, cursor: QTextCursor) -> TextStatistics:
+        if not cursor.hasSelection():
+            return TextStatistics()
+        return text_statistics(cursor.selection().toPlainText())
+
+    def _contentsChange(self, position: int, charsRemoved: int, charsAdded: int):
+        first = self._document.findBlock(position)
+        last = self._document.findBlock(position + charsAdded)
+        if not first.isValid():
+            first = self._document.lastBlock()
+        if not last.isValid():
+            last = self._document.lastBlock()
+
+        delta = self._document.blockCount() - len(self._blocks)
+        start = first.blockNumber()
+        end = last.blockNumber() - delta + 1
+        if end <= start or end > len(self._blocks):
+            self.rebuild()
+            return
+
+        # block revisions are not bumped while undo/redo is disabled, so every block in the changed range is recounted
+        replaced: List[_Counts] = []
+        block = first
+        while block.isValid():
+            replaced.append(count_text(block.text()))
+            if block == last:
+                break
+            block = block.next()
+
+        for counts in self._blocks[start:end]:
+            _add(self._totals, counts, -1)
+        for counts in replaced:
+            _add(self._totals, counts)
+        self._blocks[start:end] = replaced
+        self.statisticsChanged.emit()
@@ -0,0 +1,95 @@
+import pytest
+from qtpy.QtGui import QTextDocument
+
+from qttextedit import RichTextEditor, WordFrequencyAnalyzer, PhraseFrequency
+from qttextedit.analysis import count_ngrams, split_chunks, phrase_occurrences
+
+
+def prepare_document(text: str) -> QTextDocument:
+    document = QTextDocument()
+    document.setPlainText(text)
+    return document
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = WordFrequencyAnalyzer(maxWorkers=2)
+    yield analyzer
+    analyzer.shutdown()
+
+
+def test_count_ngrams():
+    words, counts = count_ngrams("The dark night. A dark night, the dark night fell\nnight fell again isn't it")
+    assert words == 15
+    assert counts[1] == {'dark': 3, 'night': 4, 'fell': 2, 'again': 1, "isn't": 1}
+    assert counts[2]['dark night'] == 3
+    assert counts[2]['night fell'] == 2
+    assert 'night night' not in counts[2]
+    assert 'fell night' not in counts[2]
+    assert counts[3]['the dark night'] == 2
+    assert 'a dark' in counts[2]
+    assert counts[2]["isn't it"] == 1
+
+    _, counts = count_ngrams('And then it was over', (2,))
+    assert counts[2] == {'was over': 1}
+
+
+def test_split_chunks():
+    text = 'one\ntwo\nthree\nfour'
+    chunks = split_chunks(text, 5)
+    assert chunks == ['one\ntwo\n', 'three\n', 'four']
+    assert ''.join(split_chunks(text, 1)) == text
+    assert split_chunks('', 5) == []
+
+
+def test_analysis_streams_partial_results(qtbot, analyzer):
+    analyzer.setChunkSize(100)
+    first = prepare_document('\n'.join('The river ran through the town.' for _ in range(50)))
+    second = prepare_document('\n'.join('Quiet river, quiet town.' for _ in range(20)))
+
+    partials = []
+    analyzer.partialResult.connect(lambda requestId, result: partials.append(result.chunks))
+    with qtbot.waitSignal(analyzer.analysisFinished, timeout=30000) as blocker:
+        requestId = analyzer.analyze([first, second])
+    assert blocker.args[0] == requestId
+    result = blocker.args[1]
+    assert result.isComplete()
+    assert partials == list(range(1, result.totalChunks))
+    assert result.words == 380
+    assert result.count('river') == 70
+    assert result.count('River ran') == 50
+    assert result.mostCommon(1, 2) == [PhraseFrequency('river', 1, 70), PhraseFrequency('town', 1, 70)]
+    assert result.mostCommon(3, 1) == [PhraseFrequency('the river ran', 3, 50)]
+    assert not analyzer.isAnalyzing()
+
+
+def test_analysis_cancel(qtbot, analyzer):
+    analyzer.setChunkSize(1000)
+    finished = []
+    analyzer.analysisFinished.connect(lambda requestId, result: finished.append(requestId))
+
+    with qtbot.waitSignal(analyzer.analysisCancelled) as blocker:
+        requestId = analyzer.analyzeText('Some words here\n' * 10000)
+        analyzer.cancel(requestId)
+    assert blocker.args == [requestId]
+    assert not analyzer.isAnalyzing()
+
+    with qtbot.waitSignal(analyzer.analysisFinished, timeout=30000):
+        analyzer.analyzeText('Other words')
+    assert finished == [requestId + 1]
+
+
+def test_find_phrase_selects_occurrences(qtbot):
+    editor = RichTextEditor()
+    qtbot.addWidget(editor)
+    editor.textEdit.setPlainText('A dark night.\nThe Dark\tnight fell\ndarknight')
+
+    assert phrase_occurrences(editor.textEdit.document(), 'dark night') == [(2, 12), (18, 28)]
+    assert editor.findPhrase('dark night', 1) == 2
+    assert editor.textEdit.textCursor().selectedText() == 'Dark\tnight'
+    assert editor.textEdit.textCursor().selectionStart() == 18
+    assert editor.findPhrase('missing') == 0
+
+    editor.textEdit.setPlainText('\U0001F600\U0001F600 the dark night fell')
+    assert editor.findPhrase('dark night') == 1
+    assert editor.textEdit.textCursor().selectedText() == 'dark night'
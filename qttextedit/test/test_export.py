@@ -0,0 +1,109 @@
+import re
+
+from qtpy.QtCore import Qt, QThreadPool
+from qtpy.QtGui import QTextCursor, QPdfWriter, QTextDocument
+from qtpy.QtWidgets import QTextEdit
+
+from qttextedit.export import PDF_EXPORT_RESOLUTION, PdfExportTask
+from qttextedit.ops import ExportPdfOperation
+
+
+def prepare_textedit(qtbot, paragraphs: int = 300) -> QTextEdit:
+    textedit = QTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.setPlainText('\n'.join(f'Paragraph {i} ' * 20 for i in range(paragraphs)))
+    return textedit
+
+
+def pdf_page_count(filename: str) -> int:
+    with open(filename, 'rb') as file:
+        return len(re.findall(rb'/Type\s*/Page\b', file.read()))
+
+
+def printed_page_count(document: QTextDocument, filename: str) -> int:
+    writer = QPdfWriter(filename)
+    writer.setResolution(PDF_EXPORT_RESOLUTION)
+    document.clone().print(writer)
+    del writer
+    return pdf_page_count(filename)
+
+
+def test_export_pdf(qtbot, tmp_path):
+    textedit = prepare_textedit(qtbot)
+    op = ExportPdfOperation()
+    progress = []
+    op.exportProgress.connect(lambda requestId, page, pages: progress.append((page, pages)))
+
+    filename = str(tmp_path / 'document.pdf')
+    with qtbot.waitSignal(op.exportFinished, timeout=30000) as blocker:
+        requestId = op.exportPdf(textedit, filename)
+        assert op.isExporting()
+    assert blocker.args == [requestId, filename]
+    assert not op.isExporting()
+
+    pages = progress[-1][1]
+    assert pages == printed_page_count(textedit.document(), str(tmp_path / 'printed.pdf'))
+    assert [page for page, _ in progress] == list(range(1, pages + 1))
+    with open(filename, 'rb') as file:
+        assert file.read(4) == b'%PDF'
+    assert pdf_page_count(filename) == pages
+
+
+def test_export_pdf_concurrently_while_editing(qtbot, tmp_path):
+    textedit = prepare_textedit(qtbot)
+    op = ExportPdfOperation()
+    finished = []
+    op.exportFinished.connect(lambda requestId, filename: finished.append(requestId))
+
+    first = op.exportPdf(textedit, str(tmp_path / 'first.pdf'))
+    QTextCursor(textedit.document()).insertText('Edited while exporting\n')
+    second = op.exportPdf(textedit, str(tmp_path / 'second.pdf'))
+    assert op.activeExports() == [first, second]
+
+    qtbot.waitUntil(lambda: len(finished) == 2, timeout=30000)
+    assert sorted(finished) == [first, second]
+    assert textedit.toPlainText().startswith('Edited while exporting')
+
+
+def test_cancel_export_pdf(qtbot, tmp_path):
+    textedit = prepare_textedit(qtbot, 3000)
+    op = ExportPdfOperation()
+    filename = tmp_path / 'cancelled.pdf'
+    op.exportProgress.connect(lambda requestId, page, pages: op.cancelExport(requestId))
+
+    with qtbot.waitSignal(op.exportCancelled, timeout=30000):
+        op.exportPdf(textedit, str(filename))
+    assert not op.isExporting()
+    assert not filename.exists()
+
+
+def test_export_pdf_failure(qtbot, tmp_path):
+    textedit = prepare_textedit(qtbot, 1)
+    op = ExportPdfOperation()
+    with qtbot.waitSignal(op.exportFailed, timeout=30000):
+        op.exportPdf(textedit, str(tmp_path / 'missing' / 'document.pdf'))
+
+
+def test_export_pdf_error(qtbot, tmp_path, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('Paint error')
+
+    monkeypatch.setattr('qttextedit.export.paint_page', fail)
+    textedit = prepare_textedit(qtbot, 1)
+    op = ExportPdfOperation()
+    with qtbot.waitSignal(op.exportFailed, timeout=30000) as blocker:
+        requestId = op.exportPdf(textedit, str(tmp_path / 'document.pdf'))
+    assert blocker.args == [requestId, 'Paint error']
+    assert not op.isExporting()
+
+
+def test_export_pdf_releases_clone_before_finishing(qtbot, tmp_path):
+    textedit = prepare_textedit(qtbot, 10)
+    task = PdfExportTask(1, textedit.document(), str(tmp_path / 'document.pdf'))
+    released = []
+    task.signals.finished.connect(lambda requestId, filename: released.append(task._document is None),
+                                  Qt.ConnectionType.DirectConnection)
+
+    with qtbot.waitSignal(task.signals.finished, timeout=30000):
+        QThreadPool.globalInstance().start(task)
+    assert released == [True]
@@ -0,0 +1,123 @@
+import json
+import logging
+import random
+
+import pytest
+from qtpy.QtCore import Qt, QEvent, QMimeData
+from qtpy.QtGui import QKeyEvent
+
+from qttextedit import EnhancedTextEdit, MemorySink, LoggingSink, JsonFileSink, LatencyHistogram, DashInsertionMode
+from qttextedit import instrumentation
+from qttextedit.instrumentation import span, count, instrumented, counted
+from qttextedit.util import Timer
+
+
+@pytest.fixture
+def sink():
+    sink = MemorySink()
+    instrumentation.add_sink(sink)
+    instrumentation.set_enabled(True)
+    yield sink
+    instrumentation.set_enabled(False)
+    instrumentation.remove_sink(sink)
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    rnd = random.Random(1)
+    samples = [rnd.uniform(0.001, 0.002) for _ in range(980)] + [0.1] * 20
+    for sample in samples:
+        histogram.record(sample)
+    samples.sort()
+    assert histogram.count() == 1000
+    assert histogram.percentile(50) == pytest.approx(samples[499], rel=0.05)
+    assert histogram.percentile(95) == pytest.approx(samples[949], rel=0.05)
+    assert histogram.percentile(99) == pytest.approx(0.1, rel=0.05)
+    assert histogram.max() == 0.1
+    assert histogram.mean() == pytest.approx(sum(samples) / len(samples))
+
+    other = LatencyHistogram()
+    other.record(1.0)
+    histogram.merge(other)
+    assert histogram.count() == 1001
+    assert histogram.percentile(100) == 1.0
+
+
+def test_spans_and_counters(sink):
+    @instrumented('work')
+    def work(value: int) -> int:
+        return value * 2
+
+    @counted()
+    def called():
+        pass
+
+    assert work(2) == 4
+    with span('block'):
+        pass
+    called()
+    called()
+    count('items', 3)
+
+    assert sink.spans() == ['block', 'work']
+    assert sink.histogram('work').count() == 1
+    assert sink.counter('items') == 3
+    assert sink.counter(called.__qualname__) == 2
+    assert set(sink.summary()['spans']['work'].keys()) == {'count', 'mean', 'min', 'max', 'p50', 'p95', 'p99'}
+
+
+def test_disabled_instrumentation_records_nothing():
+    sink = MemorySink()
+    instrumentation.add_sink(sink)
+    try:
+        @instrumented('work')
+        def work():
+            return 1
+
+        assert work() == 1
+        with span('block'):
+            count('items')
+        assert sink.spans() == []
+        assert sink.counters() == {}
+    finally:
+        instrumentation.remove_sink(sink)
+
+
+def test_logging_and_json_sinks(sink, caplog, tmp_path):
+    logging_sink = LoggingSink(threshold=0.0)
+    json_sink = JsonFileSink(str(tmp_path / 'spans.json'))
+    instrumentation.add_sink(logging_sink)
+    instrumentation.add_sink(json_sink)
+    try:
+        with caplog.at_level(logging.DEBUG, logger='qttextedit.instrumentation'):
+            with span('save'):
+                pass
+            Timer('load').end('file')
+        assert [record.getMessage().split(':')[0] for record in caplog.records] == ['save', 'load[file]']
+
+        instrumentation.flush()
+        with open(json_sink.path()) as f:
+            summary = json.load(f)
+        assert summary['spans']['save']['count'] == 1
+        assert summary['spans']['load[file]']['count'] == 1
+    finally:
+        instrumentation.remove_sink(logging_sink)
+        instrumentation.remove_sink(json_sink)
+
+
+def test_editor_hot_paths_are_instrumented(qtbot, sink):
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.setDashInsertionMode(DashInsertionMode.INSERT_EM_DASH)
+    for key, text in [(Qt.Key_Minus, '-'), (Qt.Key_Minus, '-')]:
+        textedit.keyPressEvent(QKeyEvent(QEvent.Type.KeyPress, key, Qt.KeyboardModifier.NoModifier, text))
+    source = QMimeData()
+    source.setText('Pasted')
+    textedit.insertFromMimeData(source)
+
+    assert sink.histogram('EnhancedTextEdit.keyPressEvent').count() == 2
+    assert sink.histogram('keystroke.dash').count() == 2
+    assert sink.counter('keystroke.dash.applied') == 1
+    assert sink.histogram('EnhancedTextEdit.insertFromMimeData').count() == 1
+    assert sink.histogram('EnhancedTextEdit._cursorPositionChanged').count() >= 3
@@ -0,0 +1,114 @@
+import random
+
+from qtpy.QtGui import QTextCursor, QTextBlockFormat
+
+from qttextedit import EnhancedTextEdit, HeadingIndex, HeadingOutlineModel, OutlineHeading
+
+
+def prepare_textedit(qtbot, text: str, headings) -> EnhancedTextEdit:
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.setPlainText(text)
+    for number, level in headings:
+        set_heading(textedit, number, level)
+    return textedit
+
+
+def set_heading(textedit: EnhancedTextEdit, number: int, level: int):
+    blockFormat = QTextBlockFormat()
+    blockFormat.setHeadingLevel(level)
+    QTextCursor(textedit.document().findBlockByNumber(number)).mergeBlockFormat(blockFormat)
+
+
+def snapshot(index: HeadingIndex):
+    return [(heading.level, heading.title, heading.blockNumber) for heading in index.headings()]
+
+
+def test_outline_follows_edits(qtbot):
+    textedit = prepare_textedit(qtbot, 'Part\nIntro\nChapter\nText\nEnd', [(0, 1), (2, 2)])
+    outline = textedit.outline()
+    assert outline.headings() == [OutlineHeading(1, 'Part', 0, 0), OutlineHeading(2, 'Chapter', 2, 11)]
+
+    cursor = QTextCursor(textedit.document().findBlockByNumber(1))
+    cursor.insertText('Note\n')
+    assert snapshot(outline) == [(1, 'Part', 0), (2, 'Chapter', 3)]
+
+    titles = []
+    outline.headingChanged.connect(titles.append)
+    cursor = QTextCursor(textedit.document().findBlockByNumber(3))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    cursor.insertText(' One')
+    assert titles == [1]
+    assert outline.title(1) == 'Chapter One'
+
+    with qtbot.waitSignal(outline.headingsChanged):
+        set_heading(textedit, 5, 2)
+    assert snapshot(outline) == [(1, 'Part', 0), (2, 'Chapter One', 3), (2, 'End', 5)]
+
+    textedit.document().undo()
+    assert snapshot(outline) == [(1, 'Part', 0), (2, 'Chapter One', 3)]
+
+
+def test_outline_navigation(qtbot):
+    textedit = prepare_textedit(qtbot, 'Intro\nPart\nText\nChapter\nText\nMore', [(1, 1), (3, 2)])
+    outline = textedit.outline()
+    assert [outline.indexOfBlock(number) for number in range(6)] == [-1, 0, 0, 1, 1, 1]
+    assert outline.headingAt(outline.block(1).position() + 3) == 1
+    assert outline.nextHeading(1) == 1
+    assert outline.nextHeading(3) == -1
+    assert outline.previousHeading(3) == 0
+
+    textedit.goToHeading(1)
+    assert textedit.textCursor().blockNumber() == 3
+    assert textedit.currentHeading() == 1
+    textedit.setTextCursor(QTextCursor(textedit.document().findBlockByNumber(2)))
+    assert textedit.currentHeading() == 0
+
+
+def test_outline_matches_rebuild_after_random_edits(qtbot):
+    textedit = prepare_textedit(qtbot, '\n'.join(f'Line {i}' for i in range(60)),
+                                [(i, 1 + i % 3) for i in range(0, 60, 4)])
+    outline = textedit.outline()
+    rnd = random.Random(7)
+    for _ in range(200):
+        document = textedit.document()
+        cursor = QTextCursor(document)
+        cursor.setPosition(rnd.randrange(document.characterCount()))
+        action = rnd.random()
+        if action < 0.3:
+            cursor.insertText(rnd.choice(['word', '\n', 'a\nb', 'x\ny\nz']))
+        elif action < 0.6:
+            cursor.movePosition(QTextCursor.MoveOperation.NextCharacter, QTextCursor.MoveMode.KeepAnchor,
+                                rnd.randrange(1, 30))
+            cursor.removeSelectedText()
+        elif action < 0.8:
+            set_heading(textedit, cursor.blockNumber(), rnd.randrange(0, 4))
+        else:
+            document.undo()
+
+    fresh = HeadingIndex(textedit.document())
+    fresh.setActive(True)
+    assert snapshot(outline) == snapshot(fresh)
+
+
+def test_outline_model(qtbot):
+    textedit = prepare_textedit(qtbot, 'Part\nChapter\nScene\nChapter two\nPart two',
+                                [(0, 1), (1, 2), (2, 3), (3, 2), (4, 1)])
+    model = HeadingOutlineModel(textedit.outline())
+    assert model.rowCount() == 2
+    part = model.index(0, 0)
+    assert model.data(part) == 'Part'
+    assert model.rowCount(part) == 2
+    chapter = model.index(0, 0, part)
+    assert model.data(model.index(0, 0, chapter)) == 'Scene'
+    assert model.parent(chapter) == part
+    assert model.data(model.index(1, 0), HeadingOutlineModel.PositionRole) == textedit.document().findBlockByNumber(4).position()
+
+    with qtbot.waitSignal(model.modelReset):
+        set_heading(textedit, 2, 0)
+    assert model.rowCount(model.index(0, 0, model.index(0, 0))) == 0
+
+    with qtbot.waitSignal(model.dataChanged) as blocker:
+        QTextCursor(textedit.document().findBlockByNumber(3)).insertText('New ')
+    assert blocker.args[0] == model.index(1, 0, model.index(0, 0))
+    assert model.data(blocker.args[0]) == 'New Chapter two'
@@ -0,0 +1,163 @@
+import re
+
+from qtpy.QtGui import QTextCursor, QImage, QTextDocument
+from qtpy.QtPrintSupport import QPrinter
+from qtpy.QtWidgets import QTextEdit
+
+from qttextedit.ops import PrintOperation
+from qttextedit.preview import PrintPreview, PageImageCache, PrintPreviewWidget
+
+
+def prepare_document(paragraphs: int = 300) -> QTextDocument:
+    document = QTextDocument()
+    document.setPlainText('\n'.join(f'Paragraph {i % 10} ' * 20 for i in range(paragraphs)))
+    return document
+
+
+def render_pages(qtbot, preview: PrintPreview, pages):
+    with qtbot.waitSignal(preview.paginated, timeout=30000):
+        preview.setActive(True)
+    preview.requestPages(pages)
+    qtbot.waitUntil(lambda: all(page in preview.cache() for page in pages), timeout=30000)
+
+
+def test_page_image_cache():
+    cache = PageImageCache(2)
+    first, second, third = QImage(1, 1, QImage.Format.Format_RGB32), QImage(2, 2, QImage.Format.Format_RGB32), \
+        QImage(3, 3, QImage.Format.Format_RGB32)
+    cache.insert(0, first)
+    cache.insert(1, second)
+    assert cache.image(0) is first
+    cache.insert(2, third)
+    assert cache.pages() == [0, 2]
+    assert 1 not in cache
+
+    cache.setCapacity(1)
+    assert cache.pages() == [2]
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_paginate_once(qtbot):
+    document = prepare_document()
+    preview = PrintPreview(document)
+    render_pages(qtbot, preview, [0, 1])
+
+    pages = preview.pageCount()
+    assert pages > 3
+    assert preview.pageRange(0)[0] == 0
+    assert preview.pageRange(pages - 1)[1] == document.characterCount()
+    for page in range(1, pages):
+        assert preview.pageRange(page)[0] == preview.pageRange(page - 1)[1]
+    size = preview.imageSize()
+    image = preview.image(0)
+    assert (image.width(), image.height()) == (size.width(), size.height())
+
+    rendered = []
+    preview.pageRendered.connect(lambda page, img: rendered.append(page))
+    preview.setActive(False)
+    preview.setActive(True)
+    assert preview.isPaginated()
+    preview.requestPages([0, 1])
+    assert rendered == [0, 1]
+    assert not preview.isRendering()
+
+
+def test_edit_invalidates_affected_pages(qtbot):
+    document = prepare_document()
+    preview = PrintPreview(document)
+    pages = list(range(5))
+    render_pages(qtbot, preview, pages)
+    images = [preview.image(page) for page in pages]
+
+    start, end = preview.pageRange(2)
+    cursor = QTextCursor(document)
+    cursor.setPosition(start + (end - start) // 2)
+    cursor.insertText('Inserted text\n' * 10)
+
+    with qtbot.waitSignal(preview.paginated, timeout=30000):
+        pass
+    assert preview.image(0) is images[0]
+    assert preview.image(1) is images[1]
+    assert 2 not in preview.cache()
+
+    qtbot.waitUntil(lambda: all(page in preview.cache() for page in pages), timeout=30000)
+    assert preview.image(2) is not images[2]
+
+
+def test_edit_keeps_pages_with_unchanged_layout(qtbot):
+    document = prepare_document()
+    preview = PrintPreview(document)
+    pages = list(range(4))
+    render_pages(qtbot, preview, pages)
+    images = [preview.image(page) for page in pages]
+
+    start, _ = preview.pageRange(1)
+    cursor = QTextCursor(document)
+    cursor.setPosition(document.find('Paragraph', start).selectionStart())
+    cursor.movePosition(QTextCursor.MoveOperation.NextCharacter, QTextCursor.MoveMode.KeepAnchor)
+    cursor.insertText('p')
+
+    with qtbot.waitSignal(preview.paginated, timeout=30000):
+        pass
+    assert preview.image(0) is images[0]
+    assert 1 not in preview.cache()
+    assert preview.image(2) is images[2]
+    assert preview.image(3) is images[3]
+
+
+def test_preview_widget_renders_visible_pages(qtbot):
+    document = prepare_document(1000)
+    preview = PrintPreview(document)
+    widget = PrintPreviewWidget()
+    qtbot.addWidget(widget)
+    widget.resize(700, 500)
+    widget.setPreview(preview)
+
+    with qtbot.waitSignal(preview.paginated, timeout=30000):
+        widget.show()
+    assert widget.pageCount() == preview.pageCount()
+    qtbot.waitUntil(lambda: widget.pageLabel(0).pixmap() is not None and not widget.pageLabel(0).pixmap().isNull(),
+                    timeout=30000)
+    qtbot.waitUntil(lambda: not preview.isRendering(), timeout=30000)
+    assert widget.visiblePages() == [0]
+    assert 0 in preview.cache()
+    assert widget.pageCount() - 1 not in preview.cache()
+
+    widget.scrollToPage(widget.pageCount() - 1)
+    qtbot.waitUntil(lambda: widget.pageCount() - 1 in preview.cache(), timeout=30000)
+
+
+def test_print_operation_reuses_preview(qtbot):
+    textedit = QTextEdit()
+    qtbot.addWidget(textedit)
+    op = PrintOperation()
+    op.activateOperation(textedit)
+
+    preview = op.preview(textedit)
+    assert op.preview(textedit) is preview
+    textedit.setDocument(QTextDocument())
+    assert op.preview(textedit) is not preview
+
+
+def test_print_paginated_preview(qtbot, tmp_path):
+    document = prepare_document()
+    filename = tmp_path / 'printed.pdf'
+    printer = QPrinter(QPrinter.PrinterMode.HighResolution)
+    printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+    printer.setOutputFileName(str(filename))
+    preview = PrintPreview(document)
+    assert not preview.print(printer)
+
+    preview.setPageLayout(printer.pageLayout(), printer.resolution())
+    with qtbot.waitSignal(preview.paginated, timeout=30000):
+        preview.setActive(True)
+    with qtbot.waitSignal(preview.printed, timeout=30000) as blocker:
+        assert preview.print(printer)
+        assert preview.isPrinting()
+    assert blocker.args == [True]
+    assert not preview.isPrinting()
+    assert len(re.findall(rb'/Type\s*/Page\b', filename.read_bytes())) == preview.pageCount()
+
+    QTextCursor(document).insertText('Edited')
+    assert not preview.print(printer)
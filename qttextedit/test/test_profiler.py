@@ -0,0 +1,83 @@
+import time
+
+from qtpy.QtCore import QSize
+
+from qttextedit import EnhancedTextEdit
+
+
+def test_profiler_records_layout_and_paint_per_frame(qtbot):
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.setPlainText('\n'.join(f'Paragraph {i}' for i in range(50)))
+    textedit.resize(400, 300)
+    textedit.show()
+    qtbot.waitExposed(textedit)
+    textedit.setProfilingEnabled(True)
+    profiler = textedit.profiler()
+    assert textedit.isProfilingEnabled()
+
+    cursor = textedit.textCursor()
+    cursor.setPosition(textedit.document().findBlockByNumber(2).position())
+    cursor.insertText('Inserted\nlines\n')
+    qtbot.waitUntil(lambda: profiler.lastFrame() is not None and len(profiler.lastFrame().layoutRanges) > 0)
+
+    frame = profiler.lastFrame()
+    assert frame.layoutRanges[0] == (2, 4)
+    assert frame.relayoutBlocks() == 3
+    assert frame.layoutTime > 0
+    assert frame.paintTime > 0
+    assert frame.frameTime() >= frame.layoutTime + frame.paintTime
+    assert frame.paintedRange[0] >= 0
+    assert frame.paintedRange[0] <= frame.paintedRange[1]
+    assert profiler.hotspots(1)[0][0] == (2, 4)
+
+    frames = len(profiler.frames())
+    textedit.resize(QSize(420, 320))
+    qtbot.waitUntil(lambda: len(profiler.frames()) > frames)
+    assert any(frame.resizeTime > 0 for frame in profiler.frames()[frames:])
+
+    textedit.setProfilingEnabled(False)
+    frames = len(profiler.frames())
+    cursor.insertText('Not profiled')
+    textedit.repaint()
+    assert len(profiler.frames()) == frames
+
+
+def test_profiler_does_not_count_other_slots_as_layout(qtbot):
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.resize(400, 300)
+    textedit.show()
+    qtbot.waitExposed(textedit)
+    textedit.setProfilingEnabled(True)
+    profiler = textedit.profiler()
+    textedit.document().contentsChange.connect(lambda *args: time.sleep(0.05))
+
+    textedit.insertPlainText('First')
+    qtbot.waitUntil(lambda: profiler.lastFrame() is not None)
+    profiler.clear()
+    textedit.insertPlainText('Second')
+    qtbot.waitUntil(lambda: profiler.lastFrame() is not None)
+    assert profiler.lastFrame().layoutRanges
+    assert 0 < profiler.lastFrame().layoutTime < 0.05
+
+
+def test_profiler_overlay_does_not_profile_itself(qtbot):
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.resize(400, 300)
+    textedit.show()
+    qtbot.waitExposed(textedit)
+    textedit.setProfilingEnabled(True, overlay=True)
+    profiler = textedit.profiler()
+    assert profiler.isOverlayVisible()
+
+    textedit.insertPlainText('Frame')
+    qtbot.waitUntil(lambda: profiler.lastFrame() is not None)
+    qtbot.wait(100)
+    frames = len(profiler.frames())
+    qtbot.wait(200)
+    assert len(profiler.frames()) == frames
+
+    textedit.setProfilingEnabled(False)
+    assert not profiler.isOverlayVisible()
@@ -0,0 +1,102 @@
+from qtpy.QtGui import QTextDocument, QTextCursor
+
+from qttextedit import DocumentSearchIndex, RichTextEditor
+from qttextedit.search import tokenize
+
+
+def prepare_index():
+    index = DocumentSearchIndex()
+    first = QTextDocument()
+    first.setPlainText('The first chapter\nA dark night')
+    second = QTextDocument()
+    second.setPlainText('Chapter two\nThe night is dark\nThe end')
+    index.addDocument('first', first)
+    index.addDocument('second', second)
+    return index, first, second
+
+
+def test_tokenize():
+    assert tokenize('Dark, dark night') == {'dark': [0, 6], 'night': [11]}
+
+
+def test_search_across_documents():
+    index, first, second = prepare_index()
+
+    results = index.search('night')
+    assert [(result.key, result.blockNumber, result.position) for result in results] == [
+        ('first', 1, 25), ('second', 1, 16)]
+    assert [result.key for result in index.search('dark night')] == ['first']
+    assert [result.key for result in index.search('chapter')] == ['first', 'second']
+    assert index.search('nigh') == []
+    assert len(index.search('the', limit=2)) == 2
+
+
+def test_search_index_incremental_update():
+    index, first, second = prepare_index()
+
+    cursor = QTextCursor(first)
+    cursor.movePosition(QTextCursor.MoveOperation.End)
+    cursor.insertText('\nA stormy night')
+    assert [(result.key, result.blockNumber) for result in index.search('stormy night')] == [('first', 2)]
+
+    cursor = QTextCursor(second)
+    cursor.insertText('Prologue\n')
+    assert [(result.blockNumber, result.position) for result in index.search('two')] == [(1, 17)]
+
+    cursor = QTextCursor(second.findBlockByNumber(1))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+    cursor.movePosition(QTextCursor.MoveOperation.NextCharacter, QTextCursor.MoveMode.KeepAnchor)
+    cursor.removeSelectedText()
+    assert index.search('two') == []
+    assert [result.blockNumber for result in index.search('end')] == [2]
+
+    second.undo()
+    assert [result.blockNumber for result in index.search('two')] == [1]
+
+    index.removeDocument('first')
+    assert index.search('stormy') == []
+    assert [result.key for result in index.search('night')] == ['second']
+
+
+def test_search_index_persistence(tmp_path):
+    index, first, second = prepare_index()
+    path = str(tmp_path / 'index.json')
+    index.save(path)
+
+    restored = DocumentSearchIndex()
+    assert restored.load(path)
+    second.setPlainText('Something else')
+    restored.addDocument('first', first)
+    restored.addDocument('second', second)
+    assert [result.key for result in restored.search('dark')] == ['first']
+    assert [result.key for result in restored.search('something')] == ['second']
+
+
+def test_open_search_result(qtbot):
+    editor = RichTextEditor()
+    qtbot.addWidget(editor)
+    editor.show()
+    qtbot.waitExposed(editor)
+    editor.textEdit.setPlainText('The first chapter\nA dark night')
+
+    index = DocumentSearchIndex()
+    index.addDocument('first', editor.textEdit.document())
+    result = index.search('night')[0]
+    editor.openFindMatch('night', result.position, result.length)
+
+    assert editor.textEdit.textCursor().selectedText() == 'night'
+    assert editor.textEdit.textCursor().selectionStart() == 25
+    assert editor.findMatches() == [(25, 30)]
+
+
+def test_search_result_after_emoji():
+    document = QTextDocument()
+    document.setPlainText('Intro\n\U0001F600\U0001F600 a dark night')
+    index = DocumentSearchIndex()
+    index.addDocument('emoji', document)
+
+    result = index.search('night')[0]
+    cursor = QTextCursor(document)
+    cursor.setPosition(result.position)
+    cursor.setPosition(result.position + result.length, QTextCursor.MoveMode.KeepAnchor)
+    assert cursor.selectedText() == 'night'
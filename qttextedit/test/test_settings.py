@@ -1,5 +1,5 @@
 from qthandy import vbox
-from qtpy.QtWidgets import QWidget
+from qtpy.QtWidgets import QWidget, QSlider
 
 from qttextedit import RichTextEditor, TextEditorSettingsButton
 from qttextedit.ops import TextEditorSettingsSection, TextEditingSettingsOperation
@@ -57,3 +57,17 @@ def test_separate_settings_btn(qtbot):
     assert wdg.value() == 100
     wdg.setValue(50)
     assert editor.widthPercentage() == 50
+
+
+def test_font_size_slider_drag_is_coalesced(qtbot):
+    widget, editor, settings = prepare_richtext_editor(qtbot)
+    wdg = settings.section(TextEditorSettingsSection.FONT_SIZE)
+    slider = wdg.findChild(QSlider)
+    wdg.setValue(12)
+
+    slider.setSliderDown(True)
+    for size in range(13, 20):
+        wdg.setValue(size)
+    assert editor.textEdit.font().pointSize() == 13
+    slider.setSliderDown(False)
+    assert editor.textEdit.font().pointSize() == 19
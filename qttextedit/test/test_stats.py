@@ -0,0 +1,127 @@
+import random
+
+from qtpy.QtGui import QTextCursor, QTextBlockFormat, QTextCharFormat, QFont, QTextDocument
+
+from qttextedit import EnhancedTextEdit, DocumentStatistics, TextStatistics
+from qttextedit import stats
+from qttextedit.stats import count_text, text_statistics
+
+
+def prepare_textedit(qtbot, text: str) -> EnhancedTextEdit:
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    textedit.setPlainText(text)
+    return textedit
+
+
+def test_count_text():
+    assert count_text('') == (0, 0, 0, 0)
+    assert count_text('Hello world. How are you?') == (5, 25, 21, 2)
+    assert count_text("It's a well-known fact... Isn't it") == (6, 34, 29, 2)
+    assert count_text('Version 1.5 is out') == (4, 18, 15, 1)
+    assert text_statistics('One line.\n\nTwo lines!') == TextStatistics(4, 19, 17, 2, 2)
+
+
+def test_statistics_follow_edits(qtbot):
+    textedit = prepare_textedit(qtbot, 'First paragraph here.\nSecond one. With two sentences.')
+    statistics = textedit.statistics()
+    assert statistics.totals() == TextStatistics(8, 52, 46, 3, 2)
+    changes = []
+    statistics.statisticsChanged.connect(lambda: changes.append(statistics.wordCount()))
+
+    cursor = QTextCursor(textedit.document())
+    cursor.movePosition(QTextCursor.MoveOperation.End)
+    cursor.insertText('\nThird paragraph')
+    assert statistics.wordCount() == 10
+    assert statistics.totals().paragraphs == 3
+    assert changes == [10]
+
+    textedit.document().undo()
+    assert statistics.wordCount() == 8
+    assert statistics.readingTime() == 8 / stats.READING_WORDS_PER_MINUTE
+
+
+def test_statistics_match_full_scan_after_random_edits(qtbot):
+    textedit = prepare_textedit(qtbot, '\n'.join(f'Paragraph {i}. Some words here' for i in range(50)))
+    statistics = textedit.statistics()
+    rnd = random.Random(3)
+    for _ in range(200):
+        cursor = QTextCursor(textedit.document())
+        cursor.setPosition(rnd.randrange(textedit.document().characterCount()))
+        action = rnd.random()
+        if action < 0.4:
+            cursor.insertText(rnd.choice(['word ', 'two words. ', '\n', 'a\nb ', '!']))
+        elif action < 0.8:
+            cursor.movePosition(QTextCursor.MoveOperation.NextCharacter, QTextCursor.MoveMode.KeepAnchor,
+                                rnd.randrange(1, 20))
+            cursor.removeSelectedText()
+        else:
+            textedit.document().undo()
+
+    fresh = DocumentStatistics(textedit.document())
+    fresh.setActive(True)
+    assert statistics.totals() == fresh.totals()
+    assert statistics.totals() == text_statistics(textedit.toPlainText())
+
+
+def test_edits_recount_changed_blocks_only(qtbot, monkeypatch):
+    textedit = prepare_textedit(qtbot, '\n'.join(f'Paragraph {i}' for i in range(100)))
+    statistics = textedit.statistics()
+    counted = []
+    original = stats.count_text
+    monkeypatch.setattr(stats, 'count_text', lambda text: counted.append(text) or original(text))
+
+    cursor = QTextCursor(textedit.document().findBlockByNumber(50))
+    cursor.insertText('New ')
+    assert counted == ['New Paragraph 50']
+    assert statistics.wordCount() == 201
+
+    cursor = QTextCursor(textedit.document().findBlockByNumber(10))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+    charFormat = QTextCharFormat()
+    charFormat.setFontWeight(QFont.Weight.Bold)
+    cursor.mergeCharFormat(charFormat)
+    assert counted[1:] == ['Paragraph 10']
+    assert statistics.wordCount() == 201
+
+
+def test_statistics_follow_edits_without_undo(qtbot):
+    textedit = prepare_textedit(qtbot, 'Some words in here')
+    textedit.document().setUndoRedoEnabled(False)
+    statistics = textedit.statistics()
+
+    cursor = QTextCursor(textedit.document())
+    cursor.movePosition(QTextCursor.MoveOperation.End)
+    cursor.insertText(' more words here')
+    assert statistics.wordCount() == 7
+
+
+def test_section_statistics(qtbot):
+    textedit = prepare_textedit(qtbot, 'Intro text\nPart\nOne two three\nChapter\nFour five\nNext part\nSix')
+    for number, level in [(1, 1), (3, 2), (5, 1)]:
+        blockFormat = QTextBlockFormat()
+        blockFormat.setHeadingLevel(level)
+        QTextCursor(textedit.document().findBlockByNumber(number)).mergeBlockFormat(blockFormat)
+
+    sections = textedit.statistics().sectionStatistics()
+    assert [(section.blockNumber, section.level, section.title, section.statistics.words) for section in sections] == [
+        (1, 1, 'Part', 7), (3, 2, 'Chapter', 3), (5, 1, 'Next part', 3)]
+
+
+def test_selection_statistics(qtbot):
+    textedit = prepare_textedit(qtbot, 'One two. Three\nFour five six')
+    cursor = QTextCursor(textedit.document())
+    assert textedit.statistics().selectionStatistics(cursor) == TextStatistics()
+
+    cursor.setPosition(4)
+    cursor.setPosition(19, QTextCursor.MoveMode.KeepAnchor)
+    assert textedit.statistics().selectionStatistics(cursor) == TextStatistics(3, 14, 13, 3, 2)
+
+
+def test_statistics_follow_document_replacement(qtbot):
+    textedit = prepare_textedit(qtbot, 'One two')
+    assert textedit.statistics().wordCount() == 2
+    document = QTextDocument()
+    document.setPlainText('One two three')
+    textedit.setDocument(document)
+    assert textedit.statistics().wordCount() == 3
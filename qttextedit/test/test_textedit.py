@@ -1,7 +1,11 @@
-from qtpy.QtGui import QFont
+import time
 
-from qttextedit import EnhancedTextEdit, RichTextEditor, DashInsertionMode
-from qttextedit.api import AutoCapitalizationMode
+from qtpy.QtCore import Qt, QMimeData, QPoint, QPointF, QEvent
+from qtpy.QtGui import QFont, QTextCursor, QTextBlockFormat, QColor, QTextListFormat, QMouseEvent, QTextCharFormat
+from qtpy.QtWidgets import QTextEdit
+
+from qttextedit import EnhancedTextEdit, RichTextEditor, DashInsertionMode, KeystrokeRule, KeystrokeContext
+from qttextedit.api import AutoCapitalizationMode, EllipsisInsertionMode, TextBlockState
 from qttextedit.ops import BoldOperation, ItalicOperation, ColorOperation, UnderlineOperation, StrikethroughOperation
 from qttextedit.test.common import type_text, type_enter
 
@@ -43,10 +47,15 @@ def test_auto_capitalization(qtbot):
     assert textedit.toPlainText() == 'test. test'
 
 
-# def test_ellipsis(qtbot):
-#     textedit = prepare_textedit(qtbot)
-#     type_text(qtbot, textedit, '...')
-#     assert textedit.toPlainText() == '…'
+def test_ellipsis(qtbot):
+    textedit = prepare_textedit(qtbot)
+    type_text(qtbot, textedit, '...')
+    assert textedit.toPlainText() == '...'
+
+    textedit.clear()
+    textedit.setEllipsisInsertionMode(EllipsisInsertionMode.INSERT_ELLIPSIS)
+    type_text(qtbot, textedit, 'Test...')
+    assert textedit.toPlainText() == 'Test…'
 
 
 def test_dashes(qtbot):
@@ -90,6 +99,48 @@ def test_quotes(qtbot):
     assert textedit.toPlainText() == 'Test\n“”'
 
 
+def test_arrows(qtbot):
+    textedit = prepare_textedit(qtbot)
+    type_text(qtbot, textedit, '->')
+    assert textedit.toPlainText() == '➜'
+
+    textedit.clear()
+    type_text(qtbot, textedit, '<->')
+    assert textedit.toPlainText() == '⟷'
+
+
+def test_disable_keystroke_rule(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setDashInsertionMode(DashInsertionMode.INSERT_EN_DASH)
+    textedit.setKeystrokeRuleEnabled('dash', False)
+    type_text(qtbot, textedit, '--')
+    assert textedit.toPlainText() == '--'
+
+    textedit.clear()
+    textedit.setKeystrokeRuleEnabled('dash', True)
+    type_text(qtbot, textedit, '--')
+    assert textedit.toPlainText() == '–'
+
+
+def test_custom_keystroke_rule(qtbot):
+    class CopyrightRule(KeystrokeRule):
+        name = 'copyright'
+        keys = (Qt.Key_ParenRight,)
+
+        def apply(self, context: KeystrokeContext) -> bool:
+            if context.before(2) == '(c':
+                context.cursor.deletePreviousChar()
+                context.cursor.deletePreviousChar()
+                context.cursor.insertText('©')
+                return True
+            return False
+
+    textedit = prepare_textedit(qtbot)
+    textedit.addKeystrokeRule(CopyrightRule())
+    type_text(qtbot, textedit, 'Test (c)')
+    assert textedit.toPlainText() == 'Test ©'
+
+
 def test_rich_texteditor(qtbot):
     editor = prepare_richtext_editor(qtbot)
 
@@ -149,3 +200,609 @@ def test_width_percentage(qtbot):
 
     editor.setWidthPercentage(50)
     assert editor.textEdit.viewportMargins().left()
+
+
+def test_relayout_is_coalesced(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.resize(800, 400)
+    editor.flushRelayout()
+
+    editor.setWidthPercentage(80)
+    margin = editor.textEdit.viewportMargins().left()
+    assert margin == 800 * 20 // 100 // 2
+    for percentage in (70, 60, 50):
+        editor.setWidthPercentage(percentage)
+        assert editor.textEdit.viewportMargins().left() == margin
+    qtbot.waitUntil(lambda: editor.textEdit.viewportMargins().left() == 800 * 50 // 100 // 2)
+
+    editor.setCharacterWidth(40)
+    width = editor.width() - 2 * editor.textEdit.viewportMargins().left()
+    qtbot.wait(100)
+    editor.setCharacterWidth(60)
+    assert editor.width() - 2 * editor.textEdit.viewportMargins().left() > width
+
+
+def test_zoom_is_coalesced(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    zoomed = []
+    editor.textEdit.zoomChanged.connect(zoomed.append)
+    size = editor.textEdit.font().pointSize()
+
+    editor.textEdit.zoomIn()
+    assert editor.textEdit.font().pointSize() == size + 1
+    for _ in range(3):
+        editor.textEdit.zoomIn()
+    editor.textEdit.zoomOut()
+    assert editor.textEdit.font().pointSize() == size + 1
+    editor.flushRelayout()
+    assert editor.textEdit.font().pointSize() == size + 3
+    assert zoomed == [1, 2]
+
+
+def test_toolbar_format_updates_are_coalesced(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    type_text(qtbot, editor, 'Test text')
+    qtbot.wait(5)
+
+    skipped = editor.toolbar().skippedFormatUpdates()
+    for _ in range(5):
+        qtbot.keyPress(editor.textEdit, Qt.Key_Left)
+    qtbot.wait(5)
+    assert editor.toolbar().skippedFormatUpdates() > skipped
+
+    cursor = editor.textEdit.textCursor()
+    cursor.select(QTextCursor.SelectionType.Document)
+    editor.textEdit.setTextCursor(cursor)
+    editor.textEdit.setFontWeight(QFont.Bold)
+    qtbot.keyPress(editor.textEdit, Qt.Key_Left)
+    qtbot.wait(5)
+    assert editor.toolbar().textEditorOperation(BoldOperation).isChecked()
+
+
+def test_toolbar_toggle_without_selection(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    type_text(qtbot, editor, 'Test text')
+    qtbot.wait(5)
+    bold = editor.toolbar().textEditorOperation(BoldOperation)
+    assert not bold.isChecked()
+
+    bold.trigger()
+    assert bold.isChecked()
+    assert editor.textEdit.currentCharFormat().fontWeight() == QFont.Weight.Bold
+    qtbot.keyPress(editor.textEdit, Qt.Key_Left)
+    qtbot.wait(5)
+    assert not bold.isChecked()
+
+
+def test_apply_block_format(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('First\nSecond\nThird')
+    textedit.setBlockFormat(150, textIndent=20)
+
+    assert textedit.applyBlockFormat() == 3
+    assert textedit.applyBlockFormat() == 0
+    assert textedit.document().firstBlock().blockFormat().textIndent() == 0
+    assert textedit.document().lastBlock().blockFormat().textIndent() == 20
+
+    textedit.document().undo()
+    assert textedit.document().lastBlock().blockFormat().textIndent() == 0
+
+
+def test_apply_block_format_range(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('First\nSecond\nThird')
+    textedit.setBlockFormat(150, textIndent=20)
+
+    assert textedit.applyBlockFormat(1, 1) == 1
+    assert textedit.document().findBlockByNumber(1).blockFormat().textIndent() == 20
+    assert textedit.document().lastBlock().blockFormat().textIndent() == 0
+
+
+def prepare_uneditable_blocks(qtbot) -> EnhancedTextEdit:
+    textedit = prepare_textedit(qtbot)
+    textedit.setUneditableBlocksEnabled(True)
+    textedit.textCursor().insertText('First')
+    textedit.textCursor().insertBlock()
+    textedit.textCursor().insertText('----')
+    textedit.textCursor().block().setUserState(TextBlockState.UNEDITABLE.value)
+    textedit.textCursor().insertBlock()
+    textedit.textCursor().insertText('Second')
+
+    return textedit
+
+
+def test_uneditable_block_removal(qtbot):
+    textedit = prepare_uneditable_blocks(qtbot)
+
+    cursor = textedit.textCursor()
+    cursor.setPosition(len('First'))
+    textedit.setTextCursor(cursor)
+    qtbot.keyPress(textedit, Qt.Key_Delete)
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+    cursor.setPosition(len('First\n----\n'))
+    textedit.setTextCursor(cursor)
+    qtbot.keyPress(textedit, Qt.Key_Backspace)
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+
+def test_uneditable_block_state_set_directly(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setUneditableBlocksEnabled(True)
+    textedit.setPlainText('First\n----\nSecond')
+    textedit.document().findBlockByNumber(1).setUserState(TextBlockState.UNEDITABLE.value)
+
+    cursor = textedit.textCursor()
+    cursor.setPosition(len('First\n----\n'))
+    textedit.setTextCursor(cursor)
+    qtbot.keyPress(textedit, Qt.Key_Backspace)
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+    cursor.setPosition(len('First\n--'))
+    textedit.setTextCursor(cursor)
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+    cursor.setPosition(len('First\n--'))
+    cursor.setPosition(len('First\n----\nSec'), QTextCursor.MoveMode.KeepAnchor)
+    textedit.setTextCursor(cursor)
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+    textedit.selectAll()
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+
+def test_uneditable_block_inside_selection(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setUneditableBlocksEnabled(True)
+    textedit.setPlainText('First\n----\nSecond\nThird')
+    textedit.document().findBlockByNumber(1).setUserState(TextBlockState.UNEDITABLE.value)
+    textedit.refreshUneditableBlocks()
+
+    cursor = textedit.textCursor()
+    cursor.setPosition(len('Fi'))
+    cursor.setPosition(len('First\n----\nSecond\nTh'), QTextCursor.MoveMode.KeepAnchor)
+    textedit.setTextCursor(cursor)
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'First\n----\nSecond\nThird'
+
+    textedit.setBlockUneditable(textedit.document().findBlockByNumber(1), False)
+    textedit.setBlockUneditable(textedit.document().findBlockByNumber(2))
+    textedit.setTextCursor(cursor)
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'First\n----\nSecond\nThird'
+
+
+def test_uneditable_block_select_all(qtbot):
+    textedit = prepare_uneditable_blocks(qtbot)
+
+    textedit.selectAll()
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'First\n----\nSecond'
+
+    textedit.setBlockUneditable(textedit.document().findBlockByNumber(1), False)
+    textedit.selectAll()
+    type_text(qtbot, textedit, 'x')
+    assert textedit.toPlainText() == 'x'
+
+
+def test_paste_html(qtbot):
+    textedit = prepare_textedit(qtbot)
+    source = QMimeData()
+    source.setHtml('<!--StartFragment--><p style="font-family: Arial">Test <b>text</b></p><!--EndFragment-->')
+
+    textedit.insertFromMimeData(source)
+    assert textedit.toPlainText() == 'Test text'
+
+
+def test_paste_html_async(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setAsyncPasteThreshold(0)
+    source = QMimeData()
+    source.setHtml('<p>Test <b>text</b></p>')
+
+    with qtbot.waitSignal(textedit.pasteFinished) as blocker:
+        textedit.insertFromMimeData(source)
+        assert textedit.isPasteInProgress()
+    assert blocker.args == [True]
+    assert textedit.toPlainText() == 'Test text'
+    assert not textedit.isPasteInProgress()
+
+    type_text(qtbot, textedit, '!')
+    assert textedit.toPlainText() == 'Test text!'
+
+    textedit.setPlainText('Hello ')
+    textedit.moveCursor(QTextCursor.MoveOperation.End)
+    with qtbot.waitSignal(textedit.pasteFinished):
+        textedit.insertFromMimeData(source)
+        textedit.moveCursor(QTextCursor.MoveOperation.Start)
+    assert textedit.toPlainText() == 'Hello Test text'
+    assert textedit.textCursor().position() == 0
+    assert not textedit.textCursor().hasSelection()
+
+    textedit.clear()
+    with qtbot.waitSignal(textedit.pasteFinished) as blocker:
+        textedit.insertFromMimeData(source)
+        textedit.cancelPaste()
+    assert blocker.args == [False]
+    qtbot.wait(50)
+    assert textedit.toPlainText() == ''
+
+
+def test_replace_all(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.textEdit.setPlainText('Test text\nAnother test\ntesting')
+
+    assert editor.replaceAll('test', 'pass') == 3
+    assert editor.textEdit.toPlainText() == 'pass text\nAnother pass\npassing'
+    assert editor.replaceAll('test', 'pass') == 0
+
+    editor.textEdit.document().undo()
+    assert editor.textEdit.toPlainText() == 'Test text\nAnother test\ntesting'
+
+
+def test_replace_all_after_emoji(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.textEdit.setPlainText('I \U0001F600 love cats. cats are great')
+
+    assert editor.replaceAll('cats', 'dogs') == 2
+    assert editor.textEdit.toPlainText() == 'I \U0001F600 love dogs. dogs are great'
+
+
+def test_find_highlights_all_matches(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.textEdit.setPlainText('Test text\nAnother test\ntesting')
+
+    editor._wdgFind.setVisible(True)
+    editor._find('test')
+    assert editor.findMatches() == [(0, 4), (18, 22), (23, 27)]
+    assert len(editor.textEdit.extraSelections()) == 3
+    assert editor.textEdit.textCursor().selectedText() == 'Test'
+    assert editor._wdgFind._lblMatches.text() == '1 of 3'
+
+    editor._findNext('test')
+    assert editor._wdgFind._lblMatches.text() == '2 of 3'
+
+    editor._closeFind()
+    assert not editor.textEdit.extraSelections()
+
+
+def test_find_after_emoji_keeps_host_selections(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.textEdit.setPlainText('x \U0001F600 cat cat')
+    host = QTextEdit.ExtraSelection()
+    host.cursor = QTextCursor(editor.textEdit.document())
+    host.cursor.setPosition(0)
+    host.cursor.setPosition(1, QTextCursor.MoveMode.KeepAnchor)
+    host.format.setBackground(QColor('red'))
+    editor.textEdit.setExtraSelections([host])
+
+    editor._wdgFind.setVisible(True)
+    editor._find('cat')
+    assert editor.findMatches() == [(5, 8), (9, 12)]
+    assert editor.textEdit.textCursor().selectedText() == 'cat'
+    assert editor._wdgFind._lblMatches.text() == '1 of 2'
+    assert len(editor.textEdit.extraSelections()) == 3
+
+    editor._findNext('cat')
+    assert editor.textEdit.textCursor().selectionStart() == 9
+    assert editor._wdgFind._lblMatches.text() == '2 of 2'
+
+    editor._closeFind()
+    selections = editor.textEdit.extraSelections()
+    assert len(selections) == 1
+    assert selections[0].format.background().color() == QColor('red')
+
+
+def test_find_async(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.setSearchAsyncThreshold(0)
+    editor.textEdit.setPlainText('Test text\nAnother test\ntesting')
+
+    editor._wdgFind.setVisible(True)
+    editor._find('test')
+    qtbot.waitUntil(lambda: len(editor.findMatches()) == 3)
+    assert editor._wdgFind._lblMatches.text() == '1 of 3'
+
+
+def test_find_as_you_type_is_debounced(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.textEdit.setPlainText('Test text\nAnother test\ntesting')
+    editor._wdgFind.setVisible(True)
+
+    with qtbot.waitSignal(editor._wdgFind.find) as blocker:
+        editor._wdgFind.lineEditSearch().setText('t')
+        editor._wdgFind.lineEditSearch().setText('te')
+        editor._wdgFind.lineEditSearch().setText('tes')
+    assert blocker.args == ['tes']
+    assert len(editor.findMatches()) == 3
+
+    editor._wdgFind.lineEditSearch().setText('testi')
+    assert editor._wdgFind.flushFind()
+    assert editor.findMatches() == [(23, 28)]
+    assert editor.textEdit.textCursor().selectedText() == 'testi'
+
+
+def test_find_refines_previous_matches(qtbot):
+    editor = prepare_richtext_editor(qtbot)
+    editor.textEdit.setPlainText('Test text\nAnother test\ntesting')
+    editor._wdgFind.setVisible(True)
+
+    editor._find('te')
+    assert len(editor.findMatches()) == 4
+    editor._find('tex')
+    assert editor.findMatches() == [(5, 8)]
+
+    QTextCursor(editor.textEdit.document()).insertText('text ')
+    editor._find('text')
+    assert editor.findMatches() == [(0, 4), (10, 14)]
+
+    editor.textEdit.setPlainText('aaab')
+    editor._find('aa')
+    assert editor.findMatches() == [(0, 2)]
+    editor._find('aab')
+    assert editor.findMatches() == [(1, 4)]
+
+    editor.textEdit.document().setUndoRedoEnabled(False)
+    editor._find('a')
+    QTextCursor(editor.textEdit.document()).insertText('ab ')
+    editor._find('ab')
+    assert editor.findMatches() == [(0, 2), (5, 7)]
+
+
+def prepare_block_formats(textedit: EnhancedTextEdit):
+    textedit.setPlainText('Heading\nBanner\nFirst item\nSecond item\nPlain')
+    cursor = QTextCursor(textedit.document().findBlockByNumber(0))
+    blockFormat = QTextBlockFormat()
+    blockFormat.setHeadingLevel(2)
+    cursor.setBlockFormat(blockFormat)
+
+    cursor = QTextCursor(textedit.document().findBlockByNumber(1))
+    blockFormat = QTextBlockFormat()
+    blockFormat.setBackground(QColor('#ffe066'))
+    blockFormat.setAlignment(Qt.AlignmentFlag.AlignCenter)
+    cursor.setBlockFormat(blockFormat)
+
+    cursor = QTextCursor(textedit.document().findBlockByNumber(2))
+    cursor.setPosition(textedit.document().findBlockByNumber(3).position(), QTextCursor.MoveMode.KeepAnchor)
+    cursor.createList(QTextListFormat.Style.ListDisc)
+
+
+def block_summary(textedit: EnhancedTextEdit):
+    summary = []
+    block = textedit.document().begin()
+    while block.isValid():
+        blockFormat = block.blockFormat()
+        summary.append((block.text(), blockFormat.headingLevel(), blockFormat.background().color().name(),
+                        bool(blockFormat.alignment() & Qt.AlignmentFlag.AlignHCenter), block.textList() is not None))
+        block = block.next()
+    return summary
+
+
+def test_duplicate_blocks_keeps_formats(qtbot):
+    textedit = prepare_textedit(qtbot)
+    prepare_block_formats(textedit)
+    original = block_summary(textedit)
+
+    assert textedit.duplicateBlocks(0, 1)
+    assert block_summary(textedit) == original[:2] + original[:2] + original[2:]
+    assert textedit.textCursor().selectedText() == 'Heading Banner'
+
+    assert textedit.duplicateBlocks(5, 5)
+    assert textedit.document().findBlockByNumber(5).textList().count() == 3
+
+    textedit.document().undo()
+    textedit.document().undo()
+    assert block_summary(textedit) == original
+
+
+def test_move_blocks(qtbot):
+    textedit = prepare_textedit(qtbot)
+    prepare_block_formats(textedit)
+    original = block_summary(textedit)
+
+    assert textedit.moveBlocksDown(0, 1)
+    assert block_summary(textedit) == [original[2], original[0], original[1], original[3], original[4]]
+    assert textedit.moveBlocks(1, 2, 5)
+    assert block_summary(textedit) == [original[2], original[3], original[4], original[0], original[1]]
+    assert textedit.moveBlocksUp(3, 4)
+    assert block_summary(textedit) == [original[2], original[3], original[0], original[1], original[4]]
+    assert textedit.moveBlocks(2, 3, 0)
+    assert block_summary(textedit) == original
+    assert textedit.textCursor().selectedText() == 'Heading\u2029Banner'
+    assert textedit.document().findBlockByNumber(3).textList().count() == 2
+
+    assert not textedit.moveBlocksUp(0, 0)
+    assert not textedit.moveBlocksDown(4, 4)
+    assert not textedit.moveBlocks(1, 2, 2)
+
+    assert textedit.moveBlocks(4, 4, 0)
+    assert block_summary(textedit) == original[4:] + original[:4]
+
+    for _ in range(5):
+        textedit.document().undo()
+    assert block_summary(textedit) == original
+
+
+def test_move_blocks_large_list(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('\n'.join(f'Item {i}' for i in range(5000)))
+    cursor = QTextCursor(textedit.document())
+    cursor.select(QTextCursor.SelectionType.Document)
+    cursor.createList(QTextListFormat.Style.ListDecimal)
+
+    start = time.perf_counter()
+    assert textedit.moveBlocksDown(2500, 2500)
+    assert textedit.moveBlocks(100, 199, 4000)
+    assert textedit.duplicateBlocks(0, 99)
+    assert time.perf_counter() - start < 1
+    assert textedit.document().blockCount() == 5100
+    assert textedit.document().findBlockByNumber(2500).text() == 'Item 2501'
+    assert textedit.document().findBlockByNumber(4000).text() == 'Item 100'
+    assert textedit.document().begin().textList().count() == 5100
+
+
+def test_drag_blocks_with_sidebar_handle(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('First\nSecond\nThird\nFourth')
+    textedit._blockFormatPosition = 0
+    handle = textedit._btnBlockFormat
+    layout = textedit.document().documentLayout()
+    rect = layout.blockBoundingRect(textedit.document().findBlockByNumber(2))
+    dropPos = handle.mapFromGlobal(
+        textedit.viewport().mapToGlobal(QPoint(50, int(rect.bottom()) - 2 - textedit.verticalScrollBar().value())))
+
+    def send(type_: QEvent.Type, pos: QPoint):
+        event = QMouseEvent(type_, QPointF(pos), QPointF(handle.mapToGlobal(pos)), Qt.MouseButton.LeftButton,
+                            Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier)
+        return textedit.eventFilter(handle, event)
+
+    send(QEvent.Type.MouseButtonPress, QPoint(5, 5))
+    assert send(QEvent.Type.MouseMove, dropPos)
+    assert textedit._blockDropTarget == 3
+    assert send(QEvent.Type.MouseButtonRelease, dropPos)
+
+    assert textedit.toPlainText() == 'Second\nThird\nFirst\nFourth'
+    assert textedit._blockDropTarget == -1
+
+
+def select_blocks(textedit: EnhancedTextEdit, first: int, last: int):
+    cursor = QTextCursor(textedit.document().findBlockByNumber(first))
+    cursor.setPosition(textedit.document().findBlockByNumber(last).position() + 1, QTextCursor.MoveMode.KeepAnchor)
+    textedit.setTextCursor(cursor)
+
+
+def test_set_heading_on_selection(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('First\nSecond\nThird\nFourth')
+    changes = []
+    textedit.document().contentsChange.connect(lambda *args: changes.append(args))
+
+    select_blocks(textedit, 1, 2)
+    textedit.setHeading(2)
+    assert [textedit.document().findBlockByNumber(i).blockFormat().headingLevel() for i in range(4)] == [0, 2, 2, 0]
+    assert textedit.document().findBlockByNumber(2).charFormat().fontWeight() == QFont.Weight.Bold
+    assert len(changes) == 1
+
+    textedit.document().undo()
+    assert [textedit.document().findBlockByNumber(i).blockFormat().headingLevel() for i in range(4)] == [0, 0, 0, 0]
+
+
+def test_convert_blocks(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('Title\nFirst\nSecond\nThird')
+    select_blocks(textedit, 0, 0)
+    textedit.setHeading(1)
+    cursor = QTextCursor(textedit.document().findBlockByNumber(3))
+    cursor.select(QTextCursor.SelectionType.BlockUnderCursor)
+    boldFormat = QTextCharFormat()
+    boldFormat.setFontWeight(QFont.Weight.Bold)
+    cursor.mergeCharFormat(boldFormat)
+
+    select_blocks(textedit, 0, 3)
+    textedit.convertBlocks(listStyle=QTextListFormat.Style.ListDecimal)
+    blocks = [textedit.document().findBlockByNumber(i) for i in range(4)]
+    assert [block.blockFormat().headingLevel() for block in blocks] == [0, 0, 0, 0]
+    assert blocks[0].textList() is not None
+    assert blocks[0].textList().count() == 4
+    assert blocks[0].textList().format().style() == QTextListFormat.Style.ListDecimal
+    assert blocks[3].textFormats()[-1].format.fontWeight() == QFont.Weight.Bold
+
+    select_blocks(textedit, 1, 2)
+    textedit.convertBlocks(3)
+    blocks = [textedit.document().findBlockByNumber(i) for i in range(4)]
+    assert [block.blockFormat().headingLevel() for block in blocks] == [0, 3, 3, 0]
+    assert [block.textList() is not None for block in blocks] == [True, False, False, True]
+
+    textedit.document().undo()
+    assert blocks[0].textList().count() == 4
+
+
+def test_convert_blocks_keeps_current_char_format(qtbot):
+    textedit = prepare_textedit(qtbot)
+    textedit.setPlainText('First')
+    boldFormat = QTextCharFormat()
+    boldFormat.setFontWeight(QFont.Weight.Bold)
+    textedit.mergeCurrentCharFormat(boldFormat)
+
+    assert textedit.convertBlocks(listStyle=QTextListFormat.Style.ListDisc)
+    assert textedit.currentCharFormat().fontWeight() == QFont.Weight.Bold
+
+    assert textedit.setHeading(2)
+    assert textedit.setHeading(0)
+    assert textedit.currentCharFormat().fontWeight() == QFont.Weight.Normal
+
+
+def test_convert_locked_blocks(qtbot):
+    textedit = prepare_uneditable_blocks(qtbot)
+    select_blocks(textedit, 0, 2)
+
+    assert not textedit.setHeading(1)
+    assert not textedit.convertBlocks(listStyle=QTextListFormat.Style.ListDisc)
+    assert [textedit.document().findBlockByNumber(i).blockFormat().headingLevel() for i in range(3)] == [0, 0, 0]
+    assert textedit.document().findBlockByNumber(0).textList() is None
+
+
+def prepare_outline(textedit: EnhancedTextEdit, items: int = 6):
+    textedit.setPlainText('\n'.join(f'Item {i}' for i in range(items)))
+    cursor = QTextCursor(textedit.document())
+    cursor.select(QTextCursor.SelectionType.Document)
+    cursor.createList(QTextListFormat.Style.ListDecimal)
+
+
+def list_levels(textedit: EnhancedTextEdit):
+    levels = []
+    block = textedit.document().begin()
+    while block.isValid():
+        list_ = block.textList()
+        levels.append((list_.format().indent(), list_.itemNumber(block) + 1))
+        block = block.next()
+    return levels
+
+
+def test_indent_list_items(qtbot):
+    textedit = prepare_textedit(qtbot)
+    prepare_outline(textedit)
+
+    select_blocks(textedit, 1, 2)
+    qtbot.keyClick(textedit, Qt.Key.Key_Tab)
+    assert list_levels(textedit) == [(1, 1), (2, 1), (2, 2), (1, 2), (1, 3), (1, 4)]
+    first = textedit.document().findBlockByNumber(1).textList()
+    assert first == textedit.document().findBlockByNumber(2).textList()
+
+    select_blocks(textedit, 4, 4)
+    qtbot.keyClick(textedit, Qt.Key.Key_Tab)
+    qtbot.keyClick(textedit, Qt.Key.Key_Tab)
+    assert list_levels(textedit)[4] == (3, 1)
+
+    textedit.document().undo()
+    assert list_levels(textedit)[4] == (2, 1)
+    assert textedit.document().findBlockByNumber(4).textList() != first
+
+    select_blocks(textedit, 3, 3)
+    qtbot.keyClick(textedit, Qt.Key.Key_Tab)
+    assert textedit.document().findBlockByNumber(3).textList() == first
+    assert textedit.document().findBlockByNumber(4).textList() == first
+    assert list_levels(textedit) == [(1, 1), (2, 1), (2, 2), (2, 3), (2, 4), (1, 2)]
+
+
+def test_outdent_list_items(qtbot):
+    textedit = prepare_textedit(qtbot)
+    prepare_outline(textedit)
+    select_blocks(textedit, 1, 4)
+    textedit.indentListItems(1, 4)
+    assert list_levels(textedit) == [(1, 1), (2, 1), (2, 2), (2, 3), (2, 4), (1, 2)]
+
+    select_blocks(textedit, 3, 4)
+    qtbot.keyClick(textedit, Qt.Key.Key_Backtab, Qt.KeyboardModifier.ShiftModifier)
+    assert list_levels(textedit) == [(1, 1), (2, 1), (2, 2), (1, 2), (1, 3), (1, 4)]
+    assert textedit.document().findBlockByNumber(3).textList() == textedit.document().begin().textList()
+
+    textedit.indentListItems(3, 4)
+    assert textedit.outdentListItems(2, 2)
+    assert list_levels(textedit) == [(1, 1), (2, 1), (1, 2), (2, 1), (2, 2), (1, 3)]
+    assert textedit.document().findBlockByNumber(3).textList() != textedit.document().findBlockByNumber(1).textList()
+
+    assert not textedit.outdentListItems(0, 0)
@@ -0,0 +1,96 @@
+import json
+import time
+
+from qtpy.QtCore import QTimer, Qt
+
+from qttextedit import EnhancedTextEdit, RichTextEditor, TraceRecorder
+from qttextedit import instrumentation
+
+
+def test_trace_key_press_in_order(qtbot):
+    textedit = EnhancedTextEdit()
+    qtbot.addWidget(textedit)
+    recorder = TraceRecorder()
+    recorder.attach(textedit)
+    recorder.start()
+    try:
+        qtbot.keyClick(textedit, 'a')
+    finally:
+        recorder.stop()
+    assert not instrumentation.is_enabled()
+
+    names = [event['name'] for event in recorder.events()]
+    assert names.index('keyPress') < names.index('EnhancedTextEdit.keyPressEvent') < names.index('textChanged')
+    assert 'cursorPositionChanged' in names
+    assert 'EnhancedTextEdit._cursorPositionChanged' in names
+    keyPress = recorder.events()[names.index('keyPress')]
+    assert keyPress['ph'] == 'i'
+    assert keyPress['args'] == {'key': Qt.Key.Key_A.value, 'modifiers': 0}
+
+    count = len(recorder.events())
+    qtbot.keyClick(textedit, 'b')
+    assert len(recorder.events()) == count
+
+    recorder.setKeyTextRecorded(True)
+    recorder.start()
+    try:
+        qtbot.keyClick(textedit, 'c', Qt.KeyboardModifier.ShiftModifier)
+    finally:
+        recorder.stop()
+    keyPress = [event for event in recorder.events() if event['name'] == 'keyPress'][-1]
+    assert keyPress['args']['text'] == 'c'
+    assert keyPress['args']['modifiers'] == Qt.KeyboardModifier.ShiftModifier.value
+
+
+def test_trace_dump_chrome_format(qtbot, tmp_path):
+    editor = RichTextEditor()
+    qtbot.addWidget(editor)
+    recorder = TraceRecorder()
+    recorder.attach(editor)
+    editor.show()
+    recorder.start()
+    try:
+        editor.textEdit.setPlainText('Some text\n' * 100)
+        editor.textEdit.selectAll()
+        qtbot.wait(50)
+    finally:
+        recorder.stop()
+
+    path = recorder.dump(str(tmp_path / 'trace.json'))
+    with open(path) as f:
+        trace = json.load(f)
+    events = trace['traceEvents']
+    assert {'textChanged', 'selectionChanged', 'layout.documentSizeChanged'} <= {event['name'] for event in events}
+    assert [event['ts'] for event in events] == sorted(event['ts'] for event in events)
+    assert all('dur' in event for event in events if event['ph'] == 'X')
+
+
+def test_trace_ring_buffer_is_bounded():
+    recorder = TraceRecorder(capacity=10)
+    recorder.start()
+    try:
+        for i in range(50):
+            recorder.instant('event', {'i': i})
+    finally:
+        recorder.stop()
+    events = recorder.events()
+    assert len(events) == 10
+    assert [event['args']['i'] for event in events] == list(range(40, 50))
+
+
+def test_trace_dumps_event_loop_stalls(qtbot, tmp_path):
+    recorder = TraceRecorder()
+    recorder.setSlowTurnThreshold(0.05)
+    recorder.setDumpDirectory(str(tmp_path))
+    recorder.setAutoDumpEnabled(True)
+    recorder.start()
+    try:
+        with qtbot.waitSignal(recorder.dumped, timeout=5000) as blocker:
+            QTimer.singleShot(0, lambda: time.sleep(0.1))
+    finally:
+        recorder.stop()
+
+    with open(blocker.args[0]) as f:
+        events = json.load(f)['traceEvents']
+    stalls = [event for event in events if event['name'] == 'event loop stall']
+    assert stalls and stalls[-1]['dur'] >= 80_000
@@ -0,0 +1,213 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from timeit import default_timer as timer
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from qtpy.QtCore import QObject, Signal, QEvent, QTimer
+from qtpy.QtWidgets import QTextEdit
+
+from qttextedit import instrumentation
+from qttextedit.api import RichTextEditor
+from qttextedit.instrumentation import InstrumentationSink
+
+TRACE_BUFFER_SIZE = 20_000
+TRACE_SLOW_TURN_THRESHOLD = 0.1
+# the event loop is considered stalled when this heartbeat fires late
+TRACE_HEARTBEAT_INTERVAL = 0.01
+# stalls shorter than this are not recorded to keep idle typing from flooding the buffer
+TRACE_MIN_TURN = 0.002
+
+# phase, name, timestamp (us), duration (us), thread id, args
+_TraceEvent = Tuple[str, str, float, float, int, Optional[Dict]]
+
+
+class TraceRecorder(QObject, InstrumentationSink):
+    slowTurn = Signal(float)
+    dumped = Signal(str)
+
+    def __init__(self, parent=None, capacity: int = TRACE_BUFFER_SIZE):
+        super(TraceRecorder, self).__init__(parent)
+        self._events: Deque[_TraceEvent] = deque(maxlen=capacity)
+        self._counters: Dict[str, int] = {}
+        self._origin: float = timer()
+        self._recording: bool = False
+        self._wasEnabled: bool = False
+        self._lastBeat: Optional[float] = None
+        self._heartbeat = QTimer(self)
+        self._heartbeat.setInterval(int(TRACE_HEARTBEAT_INTERVAL * 1000))
+        self._heartbeat.timeout.connect(self._beat)
+        self._slowTurnThreshold: float = TRACE_SLOW_TURN_THRESHOLD
+        self._autoDump: bool = False
+        self._keyTextRecorded: bool = False
+        self._dumpDirectory: str = tempfile.gettempdir()
+        self._dumps: int = 0
+        self._textEdits: List[QTextEdit] = []
+
+    def isRecording(self) -> bool:
+        return self._recording
+
+    def start(self):
+        if self._recording:
+            return
+        self._recording = True
+        self._wasEnabled = instrumentation.is_enabled()
+        instrumentation.add_sink(self)
+        instrumentation.set_enabled(True)
+        self._lastBeat = timer()
+        self._heartbeat.start()
+
+    def stop(self):
+        if not self._recording:
+            return
+        self._recording = False
+        self._heartbeat.stop()
+        self._lastBeat = None
+        instrumentation.remove_sink(self)
+        instrumentation.set_enabled(self._wasEnabled)
+
+    def attach(self, editor: Union[QTextEdit, RichTextEditor]):
+        textEdit = editor.textEdit if isinstance(editor, RichTextEditor) else editor
+        if textEdit in self._textEdits:
+            return
+        self._textEdits.append(textEdit)
+        textEdit.installEventFilter(self)
+        textEdit.cursorPositionChanged.connect(self._cursorPositionChanged)
+        textEdit.textChanged.connect(self._textChanged)
+        textEdit.selectionChanged.connect(self._selectionChanged)
+        layout = textEdit.document().documentLayout()
+        layout.update.connect(self._layoutUpdated)
+        layout.documentSizeChanged.connect(self._documentSizeChanged)
+        textEdit.destroyed.connect(lambda: self._textEdits.remove(textEdit) if textEdit in self._textEdits else None)
+
+    def detach(self, editor: Union[QTextEdit, RichTextEditor]):
+        textEdit = editor.textEdit if isinstance(editor, RichTextEditor) else editor
+        if textEdit not in self._textEdits:
+            return
+        self._textEdits.remove(textEdit)
+        textEdit.removeEventFilter(self)
+        textEdit.cursorPositionChanged.disconnect(self._cursorPositionChanged)
+        textEdit.textChanged.disconnect(self._textChanged)
+        textEdit.selectionChanged.disconnect(self._selectionChanged)
+        layout = textEdit.document().documentLayout()
+        layout.update.disconnect(self._layoutUpdated)
+        layout.documentSizeChanged.disconnect(self._documentSizeChanged)
+
+    def slowTurnThreshold(self) -> float:
+        return self._slowTurnThreshold
+
+    def setSlowTurnThreshold(self, threshold: float):
+        self._slowTurnThreshold = threshold
+
+    def isAutoDumpEnabled(self) -> bool:
+        return self._autoDump
+
+    def setAutoDumpEnabled(self, enabled: bool):
+        self._autoDump = enabled
+
+    def isKeyTextRecorded(self) -> bool:
+        return self._keyTextRecorded
+
+    def setKeyTextRecorded(self, recorded: bool):
+        # typed text ends up in trace files, which may be shared or land in a world-readable directory
+        self._keyTextRecorded = recorded
+
+    def dumpDirectory(self) -> str:
+        return self._dumpDirectory
+
+    def setDumpDirectory(self, directory: str):
+        self._dumpDirectory = directory
+
+    def capacity(self) -> int:
+        return self._events.maxlen
+
+    def clear(self):
+        self._events.clear()
+        self._counters.clear()
+
+    def recordSpan(self, name: str, elapsed: float):
+        end = self._timestamp()
+        self._events.append(('X', name, end - elapsed * 1_000_000, elapsed * 1_000_000, threading.get_ident(), None))
+
+    def recordCount(self, name: str, value: int):
+        total = self._counters.get(name, 0) + value
+        self._counters[name] = total
+        self._events.append(('C', name, self._timestamp(), 0, threading.get_ident(), {'value': total}))
+
+    def instant(self, name: str, args: Optional[Dict] = None):
+        if self._recording:
+            self._events.append(('i', name, self._timestamp(), 0, threading.get_ident(), args))
+
+    def events(self) -> List[Dict]:
+        pid = os.getpid()
+        events = []
+        for phase, name, ts, dur, tid, args in sorted(self._events, key=lambda event: event[2]):
+            event = {'name': name, 'ph': phase, 'ts': round(ts, 3), 'pid': pid, 'tid': tid}
+            if phase == 'X':
+                event['dur'] = round(dur, 3)
+            elif phase == 'i':
+                event['s'] = 't'
+            if args:
+                event['args'] = args
+            events.append(event)
+        return events
+
+    def toJson(self) -> Dict:
+        return {'traceEvents': self.events(), 'displayTimeUnit': 'ms'}
+
+    def dump(self, path: Optional[str] = None) -> str:
+        if path is None:
+            self._dumps += 1
+            path = os.path.join(self._dumpDirectory,
+                                f'qttextedit-trace-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{self._dumps}.json')
+        with open(path, 'w') as f:
+            json.dump(self.toJson(), f)
+        self.dumped.emit(path)
+        return path
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if self._recording:
+            if event.type() == QEvent.Type.KeyPress:
+                args = {'key': event.key(), 'modifiers': event.modifiers().value}
+                if self._keyTextRecorded:
+                    args['text'] = event.text()
+                self.instant('keyPress', args)
+            elif event.type() == QEvent.Type.MouseButtonPress:
+                self.instant('mouseButtonPress')
+        return super(TraceRecorder, self).eventFilter(watched, event)
+
+    def _timestamp(self) -> float:
+        return (timer() - self._origin) * 1_000_000
+
+    def _beat(self):
+        now = timer()
+        if self._lastBeat is None:
+            return
+        # a blocked event loop delivers the heartbeat late; the delay is how long the loop was stalled
+        stall = now - self._lastBeat - TRACE_HEARTBEAT_INTERVAL
+        self._lastBeat = now
+        if stall < TRACE_MIN_TURN:
+            return
+        self.recordSpan('event loop stall', stall)
+        if stall >= self._slowTurnThreshold:
+            self.slowTurn.emit(stall)
+            if self._autoDump:
+                self.dump()
+
+    def _cursorPositionChanged(self):
+        self.instant('cursorPositionChanged', {'position': self.sender().textCursor().position()})
+
+    def _textChanged(self):
+        self.instant('textChanged')
+
+    def _selectionChanged(self):
+        self.instant('selectionChanged')
+
+    def _layoutUpdated(self, rect):
+        self.instant('layout.update', {'y': rect.y(), 'height': rect.height()})
+
+    def _documentSizeChanged(self, size):
+        self.instant('layout.documentSizeChanged', {'height': size.height()})
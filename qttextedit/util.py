@@ -1,13 +1,15 @@
 import re
 from timeit import default_timer as timer
-from typing import Optional
+from typing import Optional, Dict, Tuple
 
 import qtawesome
 from qthandy import pointy, transparent
-from qtpy.QtCore import QSize, Qt, QEvent, QObject
-from qtpy.QtGui import QTextCursor, QIcon, QAction
+from qtpy.QtCore import QSize, Qt, QEvent, QObject, QTimer, Signal
+from qtpy.QtGui import QTextCursor, QIcon, QAction, QFont, QFontMetricsF
 from qtpy.QtWidgets import QToolButton
 
+from qttextedit import instrumentation
+
 ELLIPSIS = u'\u2026'
 EN_DASH = u'\u2013'
 EM_DASH = u'\u2014'
@@ -27,6 +29,14 @@ ENDING_PUNCTUATIONS = ('.', '?', '!')
 
 OBJECT_REPLACEMENT_CHARACTER = u'\uFFFC'
 
+FONT_METRICS_CACHE_SIZE = 64
+
+FONT_DECLARATION_PATTERN = r'font-(?:family|size):(?:\'|"|\w|\s|-|,|%|\.|&quot;)*;'
+_FONT_DECLARATION = re.compile(FONT_DECLARATION_PATTERN)
+
+_fontMetrics: Dict[str, QFontMetricsF] = {}
+_characterWidths: Dict[Tuple[str, int], float] = {}
+
 
 def is_open_quotation(char: str) -> bool:
     return char in OPEN_QUOTATIONS
@@ -105,8 +115,28 @@ def qta_icon(name: str, color: str = 'black') -> QIcon:
     return qtawesome.icon(name, color=color)
 
 
+def font_metrics(font: QFont) -> QFontMetricsF:
+    key = font.key()
+    metrics = _fontMetrics.get(key)
+    if metrics is None:
+        if len(_fontMetrics) >= FONT_METRICS_CACHE_SIZE:
+            del _fontMetrics[next(iter(_fontMetrics))]
+        metrics = _fontMetrics[key] = QFontMetricsF(font)
+    return metrics
+
+
+def character_width(font: QFont, count: int) -> float:
+    key = (font.key(), count)
+    width = _characterWidths.get(key)
+    if width is None:
+        if len(_characterWidths) >= FONT_METRICS_CACHE_SIZE:
+            del _characterWidths[next(iter(_characterWidths))]
+        width = _characterWidths[key] = font_metrics(font).boundingRect('M' * count).width()
+    return width
+
+
 def remove_font(html: str) -> str:
-    return re.sub(r'font-(family|size):(\'|"|\w|\s|-|,|%|\.|&quot;)*;', '', html)
+    return _FONT_DECLARATION.sub('', html)
 
 
 def q_action(text: str, icon: Optional[QIcon] = None, slot=None, parent=None, checkable: bool = False,
@@ -147,6 +177,43 @@ class CloseButton(QToolButton):
         return super().eventFilter(watched, event)
 
 
+class CoalescingTimer(QTimer):
+    triggered = Signal()
+
+    def __init__(self, interval: int, parent=None):
+        super(CoalescingTimer, self).__init__(parent)
+        self.setSingleShot(True)
+        self.setInterval(interval)
+        self._pending: bool = False
+        self.timeout.connect(self._timeout)
+
+    def isPending(self) -> bool:
+        return self._pending
+
+    def trigger(self):
+        if self.isActive():
+            self._pending = True
+            self.start()
+        else:
+            self.start()
+            self.triggered.emit()
+
+    def cancel(self):
+        self._pending = False
+        self.stop()
+
+    def flush(self):
+        if self._pending:
+            self._pending = False
+            self.stop()
+            self.triggered.emit()
+
+    def _timeout(self):
+        if self._pending:
+            self._pending = False
+            self.triggered.emit()
+
+
 class Timer:
     def __init__(self, prefix: str = 'Elapsed', auto_start: bool = True):
         self._prefix = prefix
@@ -162,8 +229,10 @@ class Timer:
     def end(self, suffix: str = '') -> float:
         end = timer()
         self._elapsed = end - self._start
-        if suffix:
-            suffix = f'[{suffix}]'
-        print(f'{self._prefix}: {self._elapsed} {suffix}')
+        name = f'{self._prefix}[{suffix}]' if suffix else self._prefix
+        if instrumentation.is_enabled():
+            instrumentation.record_span(name, self._elapsed)
+        else:
+            instrumentation.logger.debug('%s: %s', name, self._elapsed)
 
         return self._elapsed
@@ -4,3 +4,9 @@
 set -e
 
 python -m pytest qttextedit  --cov=qttextedit --junitxml=report.xml --cov-report html:coverage --cov-report term -v --color=yes
+
+# performance gate against a recorded baseline, e.g. created with: ./bench.sh --sizes 1000 10000 --output benchmark-baseline.json
+if [ -f benchmark-baseline.json ]; then
+  QT_QPA_PLATFORM=offscreen python -m benchmarks.suite --sizes ${BENCHMARK_SIZES:-1000 10000} --output benchmark.json
+  python -m benchmarks.compare benchmark-baseline.json benchmark.json --threshold ${BENCHMARK_THRESHOLD:-0.10}
+fi